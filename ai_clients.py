@@ -0,0 +1,207 @@
+"""Process-wide keep-alive clients for the AI upstream (AIML/OpenAI-compatible API).
+
+``get_ai_reply()`` used to build a fresh ``OpenAI`` client and call a bare
+``requests.post`` per message, paying a TCP + TLS handshake on every chat turn.
+``UpstreamClients`` builds the SDK client and a pooled ``requests.Session``
+once per worker process and rebuilds them only when the configuration changes.
+"""
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import httpx  # type: ignore  # shipped with the openai SDK
+except Exception:
+    httpx = None  # type: ignore
+
+
+class _Generation:
+    """The clients built for one configuration and how many callers hold them."""
+
+    __slots__ = ('config', 'sdk_client', 'http_client', 'session', 'users', 'retired')
+
+    def __init__(self, config):
+        self.config = config
+        self.sdk_client = None
+        self.http_client = None
+        self.session = None
+        self.users = 0
+        self.retired = False
+
+    def close(self):
+        for client in (self.sdk_client, self.http_client, self.session):
+            if client is None:
+                continue
+            try:
+                client.close()
+            except Exception:
+                pass
+
+
+class UpstreamClients:
+    """Lazily built, reused SDK client + requests.Session with reuse counters.
+
+    The clients are handed out as context managers. When the configuration
+    changes, the old set is retired and closed once its last user leaves the
+    block, so a request still in flight on another thread keeps its sockets.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=16, keepalive_expiry=60.0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keepalive_expiry = keepalive_expiry
+        self._lock = threading.Lock()
+        self._pid = None
+        self._current = None
+        self._stats = {
+            'rebuilds': 0,
+            'retired': 0,
+            'retired_in_use': 0,
+            'sdk_requests': 0,
+            'sdk_connections': 0,
+            'sdk_tls_handshakes': 0,
+            'session_requests': 0,
+        }
+
+    # --- lifecycle ---
+    def _retire(self, generation):
+        """Mark ``generation`` superseded; returns it if it can be closed now (call with the lock held)."""
+        generation.retired = True
+        self._stats['retired'] += 1
+        if generation.users:
+            self._stats['retired_in_use'] += 1
+            return None
+        return generation
+
+    def _acquire(self, api_key, base_url, model):
+        config = (api_key, base_url, model, self.pool_connections, self.pool_maxsize)
+        unused = None
+        with self._lock:
+            if self._pid != os.getpid():
+                # forked child: never touch sockets inherited from the parent
+                self._current = None
+                self._pid = os.getpid()
+            generation = self._current
+            if generation is None or generation.config != config:
+                if generation is not None:
+                    unused = self._retire(generation)
+                generation = self._current = _Generation(config)
+                self._stats['rebuilds'] += 1
+            generation.users += 1
+        if unused is not None:
+            unused.close()
+        return generation
+
+    def _release(self, generation):
+        with self._lock:
+            generation.users -= 1
+            done = generation.retired and not generation.users
+        if done:
+            generation.close()
+
+    def close(self):
+        with self._lock:
+            generation, self._current = self._current, None
+            if generation is not None and self._pid == os.getpid():
+                generation = self._retire(generation)
+            else:
+                generation = None
+        if generation is not None:
+            generation.close()
+
+    # --- httpx trace hook: count new TCP connections / TLS handshakes ---
+    def _trace(self, event_name, info):
+        if event_name == 'connection.connect_tcp.complete':
+            with self._lock:
+                self._stats['sdk_connections'] += 1
+        elif event_name == 'connection.start_tls.complete':
+            with self._lock:
+                self._stats['sdk_tls_handshakes'] += 1
+
+    def _on_request(self, request):
+        request.extensions['trace'] = self._trace
+        with self._lock:
+            self._stats['sdk_requests'] += 1
+
+    # --- public API ---
+    @contextmanager
+    def openai_client(self, openai_cls, api_key, base_url, model=None):
+        """Shared OpenAI SDK client for this configuration, held for the ``with`` block."""
+        generation = self._acquire(api_key, base_url, model)
+        try:
+            with self._lock:
+                if generation.sdk_client is None:
+                    kwargs = {'api_key': api_key, 'base_url': base_url}
+                    if httpx is not None:
+                        generation.http_client = httpx.Client(
+                            limits=httpx.Limits(
+                                max_connections=self.pool_maxsize,
+                                max_keepalive_connections=self.pool_connections,
+                                keepalive_expiry=self.keepalive_expiry,
+                            ),
+                            timeout=30.0,
+                            event_hooks={'request': [self._on_request]},
+                        )
+                        kwargs['http_client'] = generation.http_client
+                    generation.sdk_client = openai_cls(**kwargs)
+            yield generation.sdk_client
+        finally:
+            self._release(generation)
+
+    @contextmanager
+    def session(self, requests_module, api_key, base_url, model=None):
+        """Shared keep-alive requests.Session for this configuration, held for the ``with`` block."""
+        generation = self._acquire(api_key, base_url, model)
+        try:
+            with self._lock:
+                if generation.session is None:
+                    session = requests_module.Session()
+                    adapter = requests_module.adapters.HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    generation.session = session
+                self._stats['session_requests'] += 1
+            yield generation.session
+        finally:
+            self._release(generation)
+
+    def _session_pool_stats(self):
+        connections = 0
+        requests_served = 0
+        generation = self._current
+        session = generation.session if generation is not None else None
+        if session is None:
+            return connections, requests_served
+        seen = set()
+        for adapter in session.adapters.values():
+            if id(adapter) in seen:
+                continue  # one adapter is mounted for both schemes
+            seen.add(id(adapter))
+            manager = getattr(adapter, 'poolmanager', None)
+            pools = getattr(manager, 'pools', None)
+            if pools is None:
+                continue
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                connections += getattr(pool, 'num_connections', 0)
+                requests_served += getattr(pool, 'num_requests', 0)
+        return connections, requests_served
+
+    def stats(self):
+        """Counters for confirming that connections are being reused."""
+        with self._lock:
+            snapshot = dict(self._stats)
+        connections, served = self._session_pool_stats()
+        snapshot['session_connections'] = connections
+        snapshot['session_pool_requests'] = served
+        sdk_req = snapshot['sdk_requests']
+        snapshot['sdk_reuse_ratio'] = (
+            1.0 - snapshot['sdk_connections'] / sdk_req if sdk_req else None
+        )
+        snapshot['session_reuse_ratio'] = (
+            1.0 - connections / served if served else None
+        )
+        return snapshot
@@ -1,5 +1,17 @@
+import atexit
+import hmac
+import json
 import os
-from flask import render_template, request, jsonify, redirect, url_for, Flask
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+import click
+from flask import (render_template, request, jsonify, redirect, url_for, Flask, Response,
+                   stream_with_context, g, before_render_template, template_rendered)
+from jinja2 import BaseLoader
+from markupsafe import Markup
 from flask_mail import Mail, Message
 try:
     import psycopg2
@@ -13,6 +25,16 @@ try:
 except Exception:  # module may be missing in test environment
     requests = None  # type: ignore
 
+# --- Structured logging (JSON lines from a background thread, see jsonlog.py) ---
+from jsonlog import get_logger, bind_request_id, stats as log_stats
+
+env_log = get_logger('env')
+theme_log = get_logger('theme')
+mail_log = get_logger('mail')
+db_log = get_logger('db')
+ai_log = get_logger('ai')
+inquiry_log = get_logger('inquiry')
+
 # karlab google pass qtmy xsok eegy leww
 
 # --- Load environment from .env (if present) ---
@@ -42,28 +64,222 @@ def _load_env():
                         if key and key not in os.environ:
                             os.environ[key] = value
             except Exception as e:
-                print(f"[ENV] Failed to load .env: {e}")
+                env_log.error("Failed to load .env", error=e)
 
 # Load env as early as possible
 _load_env()
 
 app = Flask(__name__)
 
+# Number of reverse proxies in front of the app that append X-Forwarded-For.
+# 0 (default) trusts no forwarding headers: request.remote_addr is the peer.
+TRUST_PROXY_HOPS = int(os.getenv('TRUST_PROXY_HOPS', '0'))
+if TRUST_PROXY_HOPS > 0:
+    from werkzeug.middleware.proxy_fix import ProxyFix
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUST_PROXY_HOPS, x_proto=TRUST_PROXY_HOPS)
+
+# --- Metrics (Prometheus text format at /metrics, see metrics.py) ---
+from metrics import REGISTRY as metrics_registry, observe_stage, timed
+
+metrics_registry.register_stats(
+    'karlab_log', log_stats, help_text='JSON log writer',
+    counters=('queued', 'written', 'dropped', 'sampled_out', 'write_errors'), gauges=('pending',))
+
+
+@app.before_request
+def _metrics_start_timer():
+    g._request_started = time.perf_counter()
+
+
+@app.after_request
+def _metrics_record_request(response):
+    # Registered first, so it runs after every other after_request hook
+    started = g.get('_request_started')
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics_registry.observe(
+            'karlab_http_request_duration_seconds',
+            time.perf_counter() - started,
+            route=route, method=request.method, status=str(response.status_code),
+        )
+    return response
+
+
+@app.before_request
+def _bind_request_id():
+    # correlation ID for log records; an upstream proxy's X-Request-ID is reused
+    g.request_id = bind_request_id(request.headers.get('X-Request-ID'))
+
+
+@app.after_request
+def _request_id_header(response):
+    if g.get('request_id'):
+        response.headers.setdefault('X-Request-ID', g.request_id)
+    return response
+
+
+def _metrics_before_render(sender, template, context, **extra):
+    g.setdefault('_render_started', []).append(time.perf_counter())
+
+
+def _metrics_after_render(sender, template, context, **extra):
+    stack = g.get('_render_started')
+    if stack:
+        observe_stage('template_render', time.perf_counter() - stack.pop())
+
+
+before_render_template.connect(_metrics_before_render, app)
+template_rendered.connect(_metrics_after_render, app)
+
+
+# --- Response compression (br/gzip negotiated per request, see compression.py) ---
+# Registered before the hooks that rewrite the body, so it compresses their final output
+from compression import Compression, parse_levels
+
+compression = Compression(
+    app,
+    min_size=int(os.getenv('COMPRESS_MIN_SIZE', '500')),
+    levels=parse_levels(os.getenv('COMPRESS_LEVELS', '')),
+    registry=metrics_registry,
+)
+compression.enabled = os.getenv('COMPRESSION', '1') != '0'
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus scrape endpoint (aggregated across workers when METRICS_DIR is set)."""
+    return Response(metrics_registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+# --- Fingerprinted static assets (built by `python3 assets.py` / `flask build-assets`) ---
+from assets import AssetManifest, build as build_assets
+
+asset_manifest = AssetManifest(app)
+
+
+@app.cli.command('build-assets')
+def _build_assets_command():
+    """Minify, fingerprint and precompress static assets, then reload the manifest."""
+    build_assets(app.static_folder)
+    asset_manifest.load()
+
+
 # --- Global CSS injection for dark mode ---
+# The link is added to template *source* by the Jinja loader (as a call to the
+# dark_css_link() global), so it is compiled into the layout once instead of
+# rewriting every response body. Works across {% extends %} chains.
+DARK_CSS_HREF = asset_manifest.url('dark.css', app.static_url_path)
+# Templates may still hard-code the unhashed path - treat both as "already linked"
+_DARK_CSS_MARKERS = tuple({'href="/static/dark.css"', f'href="{DARK_CSS_HREF}"'})
+_DARK_CSS_MARKERS_BYTES = tuple(m.encode('utf-8') for m in _DARK_CSS_MARKERS)
+_DARK_CSS_SOURCE_CALL = '\n{{ dark_css_link() }}\n'
+
+
+def _dark_css_tag():
+    return f'<link rel="stylesheet" href="{DARK_CSS_HREF}">'
+
+
+def inject_dark_css_source(source):
+    """Return template source with a dark_css_link() call before </head> (idempotent)."""
+    if ('</head>' in source and 'dark_css_link()' not in source
+            and not any(m in source for m in _DARK_CSS_MARKERS)):
+        return source.replace('</head>', f'{_DARK_CSS_SOURCE_CALL}</head>', 1)
+    return source
+
+
+class _DarkModeLoader(BaseLoader):
+    """Jinja loader wrapper that injects the dark.css link at template compile time."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = self.inner.get_source(environment, template)
+        return inject_dark_css_source(source), filename, uptodate
+
+    def list_templates(self):
+        return self.inner.list_templates()
+
+
+app.jinja_env.loader = _DarkModeLoader(app.jinja_env.loader)
+
+
+# --- Duplicate-submission suppression for the contact/inquiry forms ---
+from form_dedup import SubmissionGuard, TOKEN_FIELD, new_token
+
+# Templates whose POST forms get the hidden idempotency token
+_FORM_TOKEN_TEMPLATES = ('contact.html', 'inquiry.html')
+_POST_FORM_RE = re.compile(r'(<form\b[^>]*\bmethod\s*=\s*["\']?post["\']?[^>]*>)', re.I)
+
+
+class _FormTokenLoader(BaseLoader):
+    """Jinja loader wrapper adding a form_token_field() call inside POST forms."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def get_source(self, environment, template):
+        source, filename, uptodate = self.inner.get_source(environment, template)
+        if template in _FORM_TOKEN_TEMPLATES and 'form_token_field()' not in source:
+            source = _POST_FORM_RE.sub(r'\1\n{{ form_token_field() }}', source)
+        return source, filename, uptodate
+
+    def list_templates(self):
+        return self.inner.list_templates()
+
+
+app.jinja_env.loader = _FormTokenLoader(app.jinja_env.loader)
+
+
+def form_token_field():
+    """Hidden per-render token; repeats of the same rendered form are dropped."""
+    return Markup(f'<input type="hidden" name="{TOKEN_FIELD}" value="{new_token()}">')
+
+
+app.jinja_env.globals['form_token_field'] = form_token_field
+
+
+def dark_css_link():
+    """Jinja global emitted by the layout; tells the after_request fallback to skip."""
+    g._dark_css_in_template = True
+    return Markup(_dark_css_tag())
+
+
+app.jinja_env.globals['dark_css_link'] = dark_css_link
+_DARK_CSS_LINK_BYTES = f'\n{_dark_css_tag()}\n'.encode('utf-8')
+
+
+def inject_dark_css_bytes(body):
+    """Byte-level variant of inject_dark_css_source for already rendered HTML."""
+    idx = body.find(b'</head>')
+    if idx != -1 and not any(m in body for m in _DARK_CSS_MARKERS_BYTES):
+        return body[:idx] + _DARK_CSS_LINK_BYTES + body[idx:]
+    return body
+
+
 @app.after_request
 def _inject_dark_mode_css(response):
-    """Inject a link to dark mode stylesheet into HTML responses."""
+    """Inject the dark.css link into HTML responses not rendered from a template.
+    Template output already contains it; the fallback works on bytes (no decode/encode).
+    """
+    started = time.perf_counter()
+    error = False
     try:
-        ctype = response.headers.get('Content-Type', '')
-        if 'text/html' in ctype and not response.direct_passthrough:
-            html = response.get_data(as_text=True)
-            # Avoid duplicate injection
-            if '</head>' in html and 'href="/static/dark.css"' not in html:
-                link_tag = '\n<link rel="stylesheet" href="/static/dark.css">\n'
-                html = html.replace('</head>', f'{link_tag}</head>', 1)
-                response.set_data(html)
+        if g.get('_dark_css_in_template'):
+            return response
+        if response.direct_passthrough or response.is_streamed:
+            return response
+        if 'text/html' not in response.headers.get('Content-Type', ''):
+            return response
+        body = response.get_data()
+        injected = inject_dark_css_bytes(body)
+        if injected is not body:
+            response.set_data(injected)
     except Exception as e:
-        print(f"[THEME] Injection error: {e}")
+        error = True
+        theme_log.error("Injection error", error=e)
+    finally:
+        observe_stage('dark_css_hook', time.perf_counter() - started, error)
     return response
 
 # --- Mail configuration ---
@@ -76,6 +292,35 @@ app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')  # Hasło aplikacyjne
 app.config['MAIL_DEFAULT_SENDER'] = os.getenv('MAIL_DEFAULT_SENDER', app.config['MAIL_USERNAME'])
 mail = Mail(app)
 
+# --- Outbound mail queue (sends happen on a background thread) ---
+from mail_queue import MailDispatcher
+
+mail_dispatcher = MailDispatcher(
+    mail,
+    app,
+    spool_dir=os.getenv('MAIL_SPOOL_DIR', os.path.join(os.path.dirname(__file__), 'mail_spool')),
+    queue_size=int(os.getenv('MAIL_QUEUE_SIZE', '1000')),
+    workers=int(os.getenv('MAIL_WORKERS', '1')),
+    batch_size=int(os.getenv('MAIL_BATCH_SIZE', '20')),
+    max_retries=int(os.getenv('MAIL_MAX_RETRIES', '5')),
+)
+metrics_registry.register_stats(
+    'karlab_mail', mail_dispatcher.stats, help_text='Mail dispatcher',
+    counters=('submitted', 'sent', 'retried', 'failed', 'overflow', 'recovered', 'batches'),
+    gauges=('queued',))
+
+
+def send_mail_async(msg):
+    """Hand a Message to the background dispatcher; never blocks on SMTP."""
+    try:
+        return mail_dispatcher.submit(msg)
+    except Exception as e:
+        # Spool not writable - fall back to a synchronous send
+        mail_log.warning("Queue error, sending inline", error=e)
+        with timed('mail_send'):
+            mail.send(msg)
+        return None
+
 # --- Database configuration (PostgreSQL) ---
 DB_NAME = os.getenv('PGDATABASE', os.getenv('DB_NAME'))
 DB_USER = os.getenv('PGUSER', os.getenv('DB_USER'))
@@ -87,7 +332,7 @@ DB_PORT = int(os.getenv('PGPORT', os.getenv('DB_PORT', '5432')))
 def get_db_connection():
     """Return a new psycopg2 connection or None if connection fails or module missing."""
     if psycopg2 is None:
-        print("[DB] psycopg2 not installed; skipping DB connection.")
+        db_log.warning("psycopg2 not installed; skipping DB connection")
         return None
     try:
         conn = psycopg2.connect(
@@ -99,85 +344,254 @@ def get_db_connection():
         )
         return conn
     except Exception as e:
-        print(f"[DB] Connection error: {e}")
+        db_log.error("Connection error", error=e)
         return None
 
 
+import inquiry_queries
+import migrations
+import newsletter
+
+# --- Connection pool (reuses connections instead of connecting per request) ---
+DB_POOL_MIN = int(os.getenv('DB_POOL_MIN', '1'))
+DB_POOL_MAX = int(os.getenv('DB_POOL_MAX', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '5'))
+DB_POOL_MAX_LIFETIME = float(os.getenv('DB_POOL_MAX_LIFETIME', '1800'))
+
+_db_pool = None
+_db_pool_lock = threading.Lock()
+
+
+def get_db_pool():
+    """Return the process-wide ConnectionPool or None if psycopg2 is missing."""
+    global _db_pool
+    if psycopg2 is None:
+        return None
+    if _db_pool is None:
+        with _db_pool_lock:
+            if _db_pool is None:
+                from db_pool import ConnectionPool
+                _db_pool = ConnectionPool(
+                    get_db_connection,
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    timeout=DB_POOL_TIMEOUT,
+                    max_lifetime=DB_POOL_MAX_LIFETIME,
+                )
+    return _db_pool
+
+
+metrics_registry.register_stats(
+    'karlab_db_pool', lambda: _db_pool.stats() if _db_pool is not None else None,
+    help_text='PostgreSQL connection pool',
+    counters={'checkouts': 'checkouts', 'created': 'created', 'discarded': 'discarded',
+              'failed_connects': 'failed_connects', 'exhausted': 'exhausted', 'wait_time_total': 'wait_seconds'},
+    gauges={'size': 'size', 'idle': 'idle', 'in_use': 'in_use', 'max_size': 'max_size',
+            'wait_time_max': 'wait_seconds_max'},
+    aggregate={'max_size': 'max', 'wait_time_max': 'max'})
+
+
+@contextmanager
+def db_connection():
+    """Yield a pooled connection, or None if the DB is unavailable.
+
+    Usage: ``with db_connection() as conn: if conn: ...``
+    """
+    pool = get_db_pool()
+    if pool is None:
+        db_log.warning("psycopg2 not installed; skipping DB connection")
+        yield None
+        return
+    try:
+        conn = pool.getconn()
+    except Exception as e:
+        db_log.error("Pool checkout error", error=e)
+        yield None
+        return
+    if _schema_state['version'] is None:
+        _check_schema(conn)
+    broken = False
+    try:
+        yield conn
+    except Exception:
+        broken = bool(getattr(conn, 'closed', 0))
+        raise
+    finally:
+        pool.putconn(conn, discard=broken)
+
+
+# --- Storage backend for inquiries/newsletter/form claims (see storage.py) ---
+from storage import StorageUnavailable, open_storage
+
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'postgres').lower()
+storage = open_storage(
+    STORAGE_BACKEND,
+    connection_factory=db_connection,
+    sqlite_path=os.getenv('SQLITE_PATH', os.path.join(os.path.dirname(__file__), 'karlab.sqlite3')),
+)
+
+
 def init_db():
-    """Create inquiries and newsletter tables if they don't exist."""
-    conn = get_db_connection()
-    if not conn:
-        return False
+    """Apply pending schema migrations (see migrations.py). Returns True on success."""
+    _schema_state['version'] = 0  # skip the lazy check - we're about to migrate
     try:
-        with conn, conn.cursor() as cur:
-            # Business inquiries table
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS inquiries (
-                    id SERIAL PRIMARY KEY,
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    name TEXT NOT NULL,
-                    email TEXT NOT NULL,
-                    company TEXT,
-                    business_needs TEXT NOT NULL,
-                    service_type TEXT NOT NULL,
-                    budget_range TEXT NOT NULL,
-                    timeline TEXT,
-                    project_description TEXT NOT NULL,
-                    additional_info TEXT,
-                    client_ip TEXT,
-                    user_agent TEXT
-                );
-                """
-            )
-            # Newsletter subscriptions table
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS newsletter_subscriptions (
-                    id SERIAL PRIMARY KEY,
-                    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-                    email TEXT UNIQUE NOT NULL,
-                    source_page TEXT,
-                    client_ip TEXT,
-                    user_agent TEXT
-                );
-                """
-            )
+        storage.migrate()
+        _schema_state['version'] = migrations.LATEST_VERSION
         return True
+    except StorageUnavailable:
+        _schema_state['version'] = None
+        return False
     except Exception as e:
-        print(f"[DB] Init error: {e}")
+        _schema_state['version'] = None
+        db_log.error("Init error", error=e)
         return False
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 
-# Initialize database table on startup (best-effort)
-init_db()
+@app.cli.command('db-migrate')
+def _db_migrate_command():
+    """Create/upgrade the database schema. Run once per deploy."""
+    if not init_db():
+        raise click.ClickException("Migration failed")
+    db_log.info("Schema up to date", backend=storage.name)
+
+
+# Cheap, cached schema check done on the first pooled checkout (not at import)
+_schema_state = {'version': None}
+
+
+def _check_schema(conn):
+    try:
+        version = migrations.current_version(conn)
+    except Exception as e:
+        db_log.error("Schema version check failed", error=e)
+        version = -1
+    _schema_state['version'] = version
+    if version < migrations.LATEST_VERSION:
+        db_log.warning("Schema out of date - run `flask db-migrate`", version=version,
+                       expected=migrations.LATEST_VERSION)
+
+
+# In-memory index in front of the form_submissions table (migration 3)
+submission_guard = SubmissionGuard(
+    storage,
+    token_ttl=float(os.getenv('FORM_TOKEN_TTL', '86400')),
+    content_window=float(os.getenv('FORM_DEDUP_WINDOW', '600')),
+    max_entries=int(os.getenv('FORM_DEDUP_MAX_ENTRIES', '10000')),
+)
+
+
+def is_duplicate_submission(form, email, description):
+    """Claim the current POST; True (and counted) if it repeats a recent one."""
+    if submission_guard.claim(form, request.form.get(TOKEN_FIELD), email, description):
+        return False
+    metrics_registry.inc('karlab_form_duplicates_total', form=form)
+    return True
+
+
+# --- Write-behind buffer for inquiries (journal replayed on startup) ---
+from inquiry_writer import InquiryWriter
+
+inquiry_writer = InquiryWriter(
+    storage,
+    journal_dir=os.getenv('INQUIRY_JOURNAL_DIR', os.path.join(os.path.dirname(__file__), 'inquiry_journal')),
+    batch_size=int(os.getenv('INQUIRY_BATCH_SIZE', '50')),
+    flush_interval=float(os.getenv('INQUIRY_FLUSH_INTERVAL', '1.0')),
+)
+atexit.register(inquiry_writer.flush)
+metrics_registry.register_stats(
+    'karlab_inquiry_writer', inquiry_writer.stats, help_text='Inquiry write-behind buffer',
+    counters={'queued': 'queued', 'flushed': 'flushed', 'batches': 'batches', 'failures': 'failures',
+              'replayed': 'replayed', 'flush_time_total': 'flush_seconds'},
+    gauges={'buffered': 'buffered', 'flush_time_max': 'flush_seconds_max'},
+    aggregate={'flush_time_max': 'max'})
+
+
+# --- Per-page critical CSS (built by `flask build-critical-css`) ---
+from critical_css import CriticalCSS, build as build_critical_css
+
+critical_css = CriticalCSS(app, asset_manifest)
+critical_css.enabled = os.getenv('CRITICAL_CSS', '1') != '0'
+
+
+def _postprocess_page(body):
+    return critical_css.apply(inject_dark_css_bytes(body))
+
+
+# --- Rendered-page cache for pages that only change on deploy ---
+from page_cache import PageCache
+
+page_cache = PageCache(
+    app,
+    check_interval=float(os.getenv('PAGE_CACHE_CHECK_INTERVAL', '2')),
+    postprocess=_postprocess_page,
+)
+metrics_registry.register_stats(
+    'karlab_page_cache', page_cache.stats, help_text='Rendered page cache',
+    counters=('hits', 'misses', 'not_modified', 'invalidations'), gauges=('entries',))
+
+
+def _page_cached_routes():
+    return sorted(rule.rule for rule in app.url_map.iter_rules()
+                  if 'GET' in rule.methods and not rule.arguments
+                  and getattr(app.view_functions.get(rule.endpoint), 'page_cached', False))
+
+
+def _render_for_critical_css(route):
+    """Render ``route`` without critical CSS; returns (html, template names)."""
+    templates = []
+
+    def _record(sender, template, context, **extra):
+        templates.append(template.name)
+
+    template_rendered.connect(_record, app)
+    try:
+        response = app.test_client().get(route)
+    finally:
+        template_rendered.disconnect(_record, app)
+    if response.status_code != 200:
+        return None, templates
+    return response.get_data(as_text=True), templates
+
+
+@app.cli.command('build-critical-css')
+@click.option('--force', is_flag=True, help='Rebuild pages whose templates did not change.')
+def _build_critical_css_command(force):
+    """Extract per-page critical CSS for every cached page and report bytes saved."""
+    enabled, critical_css.enabled = critical_css.enabled, False
+    page_cache.clear()
+    try:
+        build_critical_css(app, _page_cached_routes(), _render_for_critical_css, force=force)
+    finally:
+        critical_css.enabled = enabled
+        critical_css.load()
+        page_cache.clear()
 
 
 @app.route('/base.html')
+@page_cache.cached
 def hello():
     return render_template('base.html')
 
 
 @app.route('/about.html')
+@page_cache.cached
 def about():
     return render_template('about.html')
 
 
 @app.route('/references.html')
+@page_cache.cached
 def references():
     return render_template('references.html')
 
 
 @app.route('/certs.html')
+@page_cache.cached
 def certs():
     return render_template('certs.html')
 
 @app.route('/projects.html')
+@page_cache.cached
 def projects():
     return render_template('projects.html')
 
@@ -185,10 +599,64 @@ def projects():
 def newsletter_thanks():
     """Thank-you page after newsletter subscription."""
     status = (request.args.get('status') or 'subscribed').lower()
+    if status == 'invalid':
+        return NEWSLETTER_INVALID_MESSAGE, 400
     duplicate = status in ('exists', 'duplicate')
     return render_template('subscribe_thanks.html', duplicate=duplicate)
 
 
+NEWSLETTER_INVALID_MESSAGE = "Podany adres e-mail jest nieprawidłowy. Wróć i spróbuj ponownie."
+
+
+@app.route('/newsletter/subscribe', methods=['POST'])
+def newsletter_subscribe():
+    """Subscribe an email (one INSERT ... ON CONFLICT DO NOTHING round trip).
+    Form posts are redirected to the thank-you page with status=subscribed|exists
+    (an invalid address gets a 400 error page instead); JSON/AJAX callers get
+    {ok: bool, status: str}.
+    """
+    data = request.get_json(silent=True) or request.form
+    wants_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+    email = newsletter.normalize_email(data.get('email'))
+    if email is None:
+        if wants_json:
+            return jsonify({"ok": False, "status": "invalid"}), 400
+        return NEWSLETTER_INVALID_MESSAGE, 400
+
+    source_page = (data.get('source_page') or request.referrer or '')[:500]
+    client_ip = request.remote_addr  # resolved by ProxyFix when TRUST_PROXY_HOPS > 0
+    user_agent = request.headers.get('User-Agent', '')
+    created = None
+    try:
+        created = storage.subscribe(email, source_page, client_ip, user_agent)
+    except StorageUnavailable:
+        pass
+    except Exception as e:
+        db_log.error("Newsletter insert error", error=e)
+    if created is None:
+        if wants_json:
+            return jsonify({"ok": False, "status": "unavailable"}), 503
+        return "Zapis do newslettera jest chwilowo niedostępny. Spróbuj ponownie później.", 503
+
+    status = 'subscribed' if created else 'exists'
+    if wants_json:
+        return jsonify({"ok": True, "status": status}), 200
+    return redirect(url_for('newsletter_thanks', status=status))
+
+
+@app.cli.command('import-newsletter')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--source', default='import', help='Value stored in source_page.')
+def _import_newsletter_command(csv_path, source):
+    """Bulk-import newsletter emails from CSV (COPY into staging + merge)."""
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        try:
+            counters = storage.import_newsletter(f, source_page=source)
+        except StorageUnavailable:
+            raise click.ClickException("No database connection")
+    db_log.info("Newsletter import", **counters)
+
+
 @app.route('/contact.html', methods=['GET', 'POST'])
 def contact():
     submitted = False
@@ -198,6 +666,10 @@ def contact():
         email = request.form.get('email')
         message_content = request.form.get('message')
 
+        if is_duplicate_submission('contact', email, message_content):
+            mail_log.info("Duplicate contact submission suppressed", email=email)
+            return render_template('contact.html', submitted=True)
+
         # 1) Wiadomość do Ciebie
         msg_to_you = Message(
             subject="Nowa wiadomość z formularza kontaktowego",
@@ -230,9 +702,9 @@ Pozdrawiam,
 KARLAB Software
         """
 
-        # wysyłka
-        mail.send(msg_to_you)
-        mail.send(msg_to_user)
+        # wysyłka (w tle, przez kolejkę)
+        send_mail_async(msg_to_you)
+        send_mail_async(msg_to_user)
 
         submitted = True
 
@@ -250,10 +722,174 @@ except Exception:
     _HAS_OPENAI_V1 = False
 
 
-def get_ai_reply(message: str, history):
-    """Return AI-generated reply if OPENAI/AIMLAPI key is configured; otherwise None.
-    Uses a concise, safe system prompt with site context (Polish by default).
+AI_SYSTEM_PROMPT = (
+    "Jesteś profesjonalnym asystentem KARLAB Software. Odpowiadasz uprzejmie i konkretnie, po polsku,"
+    " chyba że użytkownik używa innego języka. Zakres: rozwój oprogramowania, Python, AI/ML,"
+    " automatyzacje, analityka danych, konsulting techniczny. Jeśli pytanie wykracza poza te tematy,"
+    " odpowiadasz krótko i rzeczowo. Kiedy ma to sens, zaproponuj dalsze kroki (np. wycenę, rozmowę)."
+    " Dane kontaktowe: +48 690 125 306, contact@karlab.com, formularz Kontakt na stronie."
+    " Unikaj wrażliwych danych i nie podawaj niezweryfikowanych informacji."
+)
+
+AI_FALLBACK_REPLY = (
+    "Dziękuję za wiadomość! Aktualnie moduł AI jest niedostępny na serwerze. "
+    "Możesz opisać krótko swój projekt lub pytanie – odpiszemy mailowo. "
+    "Kontakt: contact@karlab.com lub formularz Kontakt na stronie."
+)
+# Upstream calls slower than this give up and use the local fallback
+AI_TIMEOUT = float(os.getenv('AI_TIMEOUT', '30'))
+
+
+# Shared keep-alive clients for the AI upstream (one set per worker process)
+from ai_clients import UpstreamClients
+
+ai_clients = UpstreamClients(
+    pool_connections=int(os.getenv('AI_HTTP_POOL_CONNECTIONS', '4')),
+    pool_maxsize=int(os.getenv('AI_HTTP_POOL_MAXSIZE', '16')),
+)
+metrics_registry.register_stats(
+    'karlab_ai_clients', ai_clients.stats, help_text='AI upstream keep-alive clients',
+    counters=('rebuilds', 'retired', 'retired_in_use', 'sdk_requests', 'sdk_connections', 'sdk_tls_handshakes',
+              'session_requests'),
+    gauges=('session_connections', 'sdk_reuse_ratio', 'session_reuse_ratio'),
+    aggregate={'sdk_reuse_ratio': 'pid', 'session_reuse_ratio': 'pid'})
+
+
+# Reply cache for repeated questions (CHAT_CACHE_SIZE=0 disables it)
+from chat_cache import ReplyCache, make_key as make_cache_key, prompt_fingerprint
+
+CHAT_CACHE_SIZE = int(os.getenv('CHAT_CACHE_SIZE', '256'))
+reply_cache = ReplyCache(
+    max_entries=CHAT_CACHE_SIZE,
+    ttl=float(os.getenv('CHAT_CACHE_TTL', '3600')),
+    sqlite_path=os.getenv('CHAT_CACHE_DB') or None,
+    fingerprint=prompt_fingerprint(AI_SYSTEM_PROMPT),
+) if CHAT_CACHE_SIZE > 0 else None
+if reply_cache is not None:
+    metrics_registry.register_stats(
+        'karlab_reply_cache', reply_cache.stats, help_text='Chat reply cache',
+        counters=('hits', 'sqlite_hits', 'misses', 'stores', 'evictions', 'coalesced', 'purges'),
+        gauges=('entries', 'in_flight', 'hit_ratio'), aggregate={'hit_ratio': 'pid'})
+
+
+def purge_reply_cache():
+    """Drop cached chatbot replies, e.g. after editing AI_SYSTEM_PROMPT."""
+    if reply_cache is not None:
+        reply_cache.purge()
+
+
+@app.cli.command('purge-chat-cache')
+def _purge_chat_cache_command():
+    """Clear the chatbot reply cache (memory and SQLite tiers)."""
+    purge_reply_cache()
+    ai_log.info("Reply cache purged")
+
+
+# Server-side chat history, keyed by session ID
+from conversation_store import ConversationStore
+
+CHAT_HISTORY_WINDOW = 8
+conversation_store = ConversationStore(
+    max_sessions=int(os.getenv('CHAT_MAX_SESSIONS', '2000')),
+    max_turns=20,
+    ttl=float(os.getenv('CHAT_SESSION_TTL', '86400')),
+    # shared by all workers; CHAT_STORE_DB= (empty) keeps history per process
+    sqlite_path=os.getenv('CHAT_STORE_DB', os.path.join(app.root_path, 'chat_store.sqlite3')) or None,
+)
+
+
+# Local retrieval index over the static pages (build with `flask build-site-index`)
+from site_index import SiteIndex, build as build_site_index, snippet as site_snippet
+
+site_index = SiteIndex(
+    os.getenv('SITE_INDEX_PATH', os.path.join(app.root_path, 'site_index.npz')),
+    threshold=float(os.getenv('SITE_INDEX_THRESHOLD', '0.6')),
+)
+
+
+@app.cli.command('build-site-index')
+def _build_site_index_command():
+    """Index about/projects/references/certs for the chatbot."""
+    build_site_index(os.path.join(app.root_path, app.template_folder), site_index.path)
+    site_index.reload()
+    purge_reply_cache()  # cached replies may have been built on the old context
+
+
+def site_answer(message: str):
+    """Reply straight from the site index if it is confident, else None."""
+    passage = site_index.answer(message)
+    if passage is None:
+        return None
+    metrics_registry.inc('karlab_chat_local_answers_total', source='site_index')
+    # pages are served under their template names (/about.html, ...); also called
+    # from chat_asgi worker threads, where url_for() has no app context
+    return f"{site_snippet(passage['text'], message)}\n\nWięcej: /{passage['page']}"
+
+
+# Local fallback bot (train with `flask train-local-bot` or chatbotr.py), warm-loaded per worker
+from local_bot import LocalBot, DEFAULT_CONVERSATIONS, load_conversations
+
+local_bot = LocalBot(
+    os.getenv('LOCAL_BOT_PATH', os.path.join(app.root_path, 'local_bot.json')),
+    min_similarity=float(os.getenv('LOCAL_BOT_MIN_SIMILARITY', '0.5')),
+)
+
+
+@app.cli.command('train-local-bot')
+@click.argument('paths', nargs=-1, type=click.Path(exists=True, dir_okay=False))
+def _train_local_bot_command(paths):
+    """Add new statement/response pairs from PATHS (JSON or text) to the local bot."""
+    conversations = list(DEFAULT_CONVERSATIONS)
+    for path in paths:
+        conversations.extend(load_conversations(path))
+    added = sum(local_bot.train(conversation) for conversation in conversations)
+    ai_log.info("Local bot trained", added=added, pairs=local_bot.stats()['pairs'])
+
+
+_background_pid = None
+
+
+def start_background_workers():
+    """Start the mail dispatcher and inquiry writer and warm the local bot, once per process.
+
+    Call it from the server's startup hook (gunicorn ``post_fork``; chat_asgi
+    does it on lifespan startup); otherwise it runs before the first request.
+    Never at import, so CLI commands and tests that import this module don't
+    start SMTP workers or replay spooled mail.
     """
+    global _background_pid
+    if _background_pid == os.getpid():
+        return
+    _background_pid = os.getpid()
+    # replay mail spooled before a restart now rather than on the next submission
+    try:
+        mail_dispatcher.start()
+    except OSError as e:
+        mail_log.warning("Mail spool unavailable, sending inline", error=e)
+    try:
+        inquiry_writer.start()
+    except Exception as e:
+        db_log.error("Inquiry writer start error", error=e)
+    local_bot.load()
+
+
+@app.before_request
+def _start_background_workers():
+    if _background_pid != os.getpid():
+        start_background_workers()
+
+
+def fallback_reply(message: str):
+    """Reply used when the upstream is missing, failing, slow or over capacity."""
+    reply = local_bot.reply(message)
+    if reply:
+        metrics_registry.inc('karlab_chat_local_answers_total', source='local_bot')
+        return reply
+    return AI_FALLBACK_REPLY
+
+
+def _prepare_ai_request(message: str, history):
+    """Return (api_key, base_url, model, messages) or None if no API key is configured."""
     # Prefer AIMLAPI creds if provided, fall back to OPENAI_API_KEY for compatibility
     api_key = os.getenv('AIMLAPI_API_KEY') or os.getenv('OPENAI_API_KEY')
     base_url = os.getenv('AIMLAPI_BASE_URL', 'https://api.aimlapi.com/v1')
@@ -264,66 +900,101 @@ def get_ai_reply(message: str, history):
     trimmed = []
     try:
         # convert history [[role, content], ...] to OpenAI format
-        for role, content in history[-8:]:
+        for role, content in history[-CHAT_HISTORY_WINDOW:]:
             if role in ("user", "assistant") and isinstance(content, str):
                 trimmed.append({"role": role, "content": content[:2000]})
     except Exception:
         trimmed = []
 
-    system_prompt = (
-        "Jesteś profesjonalnym asystentem KARLAB Software. Odpowiadasz uprzejmie i konkretnie, po polsku,"
-        " chyba że użytkownik używa innego języka. Zakres: rozwój oprogramowania, Python, AI/ML,"
-        " automatyzacje, analityka danych, konsulting techniczny. Jeśli pytanie wykracza poza te tematy,"
-        " odpowiadasz krótko i rzeczowo. Kiedy ma to sens, zaproponuj dalsze kroki (np. wycenę, rozmowę)."
-        " Dane kontaktowe: +48 690 125 306, contact@karlab.com, formularz Kontakt na stronie."
-        " Unikaj wrażliwych danych i nie podawaj niezweryfikowanych informacji."
-    )
-
     # Domyślnie użyj modelu gpt-4 (zgodnie z przykładem AIML API); można nadpisać przez ENV
     model = os.getenv('AIMLAPI_MODEL', os.getenv('OPENAI_MODEL', 'gpt-4'))
 
-    messages = [{"role": "system", "content": system_prompt}] + trimmed + [
-        {"role": "user", "content": message[:4000]}
-    ]
+    messages = [{"role": "system", "content": AI_SYSTEM_PROMPT}]
+    context = site_index.context(message)
+    if context:
+        messages.append({"role": "system", "content": f"Kontekst ze strony:\n{context}"})
+    messages += trimmed + [{"role": "user", "content": message[:4000]}]
+    return api_key, base_url, model, messages
+
+
+def _get_requests_module():
+    try:
+        import requests as _requests  # lokalny import na wypadek braku globalnego
+    except Exception:
+        _requests = requests  # użyj modułu importowanego globalnie
+    return _requests
+
+
+def get_ai_reply(message: str, history=None, session_id=None):
+    """Return AI-generated reply if OPENAI/AIMLAPI key is configured; otherwise None.
+    Uses a concise, safe system prompt with site context (Polish by default).
+    With ``session_id`` the history window is read from conversation_store.
+    Identical questions are served from reply_cache; concurrent duplicates share one upstream call.
+    Questions the site index answers confidently never reach the upstream.
+    """
+    local = site_answer(message)
+    if local:
+        return local
+    if session_id:
+        history = conversation_store.window(session_id, CHAT_HISTORY_WINDOW)
+    prepared = _prepare_ai_request(message, history or [])
+    if prepared is None:
+        return None
+    api_key, base_url, model, messages = prepared
+    if reply_cache is None:
+        return _gated_fetch_ai_reply(api_key, base_url, model, messages)
+    key = make_cache_key(messages, model)
+    return reply_cache.get_or_compute(key, lambda: _gated_fetch_ai_reply(api_key, base_url, model, messages))
+
+
+def _gated_fetch_ai_reply(api_key, base_url, model, messages):
+    """_fetch_ai_reply behind the upstream concurrency cap; raises UpstreamBusy when full."""
+    with upstream_gate.slot() as acquired:
+        if not acquired:
+            raise UpstreamBusy()
+        return _fetch_ai_reply(api_key, base_url, model, messages)
+
+
+def _fetch_ai_reply(api_key, base_url, model, messages):
+    """Call the upstream API (SDK first, raw requests as fallback)."""
 
     # Najpierw spróbuj SDK kompatybilnego z OpenAI, jeśli dostępny
     if _HAS_OPENAI_V1:
         try:
-            client = OpenAI(api_key=api_key, base_url=base_url)
-            resp = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=0.3,
-                max_tokens=512
-            )
+            with ai_clients.openai_client(OpenAI, api_key, base_url, model) as client, timed('ai_upstream'):
+                resp = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=512,
+                    timeout=AI_TIMEOUT,
+                )
             return resp.choices[0].message.content.strip() if resp and resp.choices else None
         except Exception as e:
-            print(f"[AI] OpenAI SDK error (fallback to requests): {e}")
+            ai_log.error("OpenAI SDK error (fallback to requests)", error=e)
 
     # Fallback: bezpośrednie wywołanie AIML API przez requests
     try:
-        try:
-            import requests as _requests  # lokalny import na wypadek braku globalnego
-        except Exception:
-            _requests = requests  # użyj modułu importowanego globalnie
+        _requests = _get_requests_module()
         if _requests is None:
             return None
 
-        resp = _requests.post(
-            f"{base_url}/chat/completions",
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {api_key}",
-            },
-            json={
-                "model": model,
-                "messages": messages,
-                "temperature": 0.3,
-                "max_tokens": 512,
-            },
-            timeout=30,
-        )
-        data = resp.json()
+        with ai_clients.session(_requests, api_key, base_url, model) as session, timed('ai_upstream'):
+            resp = session.post(
+                f"{base_url}/chat/completions",
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": f"Bearer {api_key}",
+                },
+                json={
+                    "model": model,
+                    "messages": messages,
+                    "temperature": 0.3,
+                    "max_tokens": 512,
+                },
+                timeout=AI_TIMEOUT,
+            )
+            data = resp.json()
         choices = data.get("choices") or []
         if choices:
             msg = choices[0].get("message") or {}
@@ -331,38 +1002,305 @@ def get_ai_reply(message: str, history):
             return content.strip() if content else None
         return None
     except Exception as e:
-        print(f"[AI] AIML API error: {e}")
+        ai_log.error("AIML API error", error=e)
+        return None
+
+
+def stream_ai_reply(message: str, history=None, session_id=None):
+    """Yield reply text fragments as the upstream produces them.
+    Yields nothing if no API key is configured or both transports fail
+    before the first token. Time to the first upstream token is recorded
+    in the karlab_chat_ttft_seconds histogram (local/cached replies are not).
+    """
+    started = time.perf_counter()
+    local = site_answer(message)
+    if local:
+        yield local
+        return
+    if session_id:
+        history = conversation_store.window(session_id, CHAT_HISTORY_WINDOW)
+    prepared = _prepare_ai_request(message, history or [])
+    if prepared is None:
+        return
+    api_key, base_url, model, messages = prepared
+
+    cache_key = make_cache_key(messages, model) if reply_cache is not None else None
+    if cache_key is not None:
+        cached = reply_cache.get(cache_key)
+        if cached:
+            yield cached
+            return
+
+    parts = []
+    upstream_started = time.perf_counter()
+    with upstream_gate.slot() as acquired:
+        if not acquired:
+            return  # over capacity - caller sends the fallback reply
+        for text in _stream_upstream(api_key, base_url, model, messages):
+            if not parts:
+                metrics_registry.observe('karlab_chat_ttft_seconds', time.perf_counter() - started)
+            parts.append(text)
+            yield text
+    observe_stage('ai_upstream', time.perf_counter() - upstream_started, error=not parts)
+    if cache_key is not None and parts:
+        reply_cache.put(cache_key, ''.join(parts).strip())
+
+
+def _stream_upstream(api_key, base_url, model, messages):
+    if _HAS_OPENAI_V1:
+        emitted = False
+        try:
+            with ai_clients.openai_client(OpenAI, api_key, base_url, model) as client:
+                stream = client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,
+                    max_tokens=512,
+                    stream=True,
+                    timeout=AI_TIMEOUT,
+                )
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    text = getattr(chunk.choices[0].delta, 'content', None)
+                    if text:
+                        emitted = True
+                        yield text
+            return
+        except Exception as e:
+            if emitted:
+                # Part of the reply already went out - can't restart it
+                ai_log.error("OpenAI SDK stream interrupted", error=e)
+                return
+            ai_log.error("OpenAI SDK stream error (fallback to requests)", error=e)
+
+    # Fallback: strumień SSE z AIML API przez requests
+    try:
+        _requests = _get_requests_module()
+        if _requests is None:
+            return
+        with ai_clients.session(_requests, api_key, base_url, model) as session:
+            resp = session.post(
+                f"{base_url}/chat/completions",
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "text/event-stream",
+                    "Authorization": f"Bearer {api_key}",
+                },
+                json={
+                    "model": model,
+                    "messages": messages,
+                    "temperature": 0.3,
+                    "max_tokens": 512,
+                    "stream": True,
+                },
+                timeout=AI_TIMEOUT,
+                stream=True,
+            )
+            with resp:
+                for line in resp.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith('data:'):
+                        continue
+                    payload = line[5:].strip()
+                    if payload == '[DONE]':
+                        break
+                    try:
+                        choices = json.loads(payload).get("choices") or []
+                    except ValueError:
+                        continue
+                    if choices:
+                        text = (choices[0].get("delta") or {}).get("content")
+                        if text:
+                            yield text
+    except Exception as e:
+        ai_log.error("AIML API stream error", error=e)
+
+
+# --- Admission control for the chat endpoints ---
+from rate_limit import TokenBucketLimiter, ConcurrencyGate, client_ip as _client_ip
+
+
+class UpstreamBusy(Exception):
+    """All upstream AI slots are taken (see AI_MAX_CONCURRENT)."""
+
+
+chat_limiter = TokenBucketLimiter(
+    rate=float(os.getenv('CHAT_RATE_PER_SEC', '0.5')),
+    burst=float(os.getenv('CHAT_RATE_BURST', '10')),
+    sqlite_path=os.getenv('CHAT_RATE_LIMIT_DB') or None,
+)
+# Per worker process; 0 disables the cap
+upstream_gate = ConcurrencyGate(int(os.getenv('AI_MAX_CONCURRENT', '8')))
+# 'fallback' answers with fallback_reply() when over capacity, '429' rejects
+CHAT_OVERLOAD_MODE = os.getenv('CHAT_OVERLOAD_MODE', 'fallback').lower()
+
+
+def _rate_limited_response():
+    """Return a 429 response if the client is over its chat budget, else None."""
+    wait = chat_limiter.check(_client_ip(request))
+    if not wait:
         return None
+    resp = jsonify({"ok": False, "reply": "Zbyt wiele wiadomości. Spróbuj ponownie za chwilę."})
+    resp.status_code = 429
+    resp.headers['Retry-After'] = str(max(1, int(wait + 0.999)))
+    return resp
+
+
+def _overloaded_response():
+    resp = jsonify({"ok": False, "reply": "Asystent jest teraz przeciążony. Spróbuj ponownie za chwilę."})
+    resp.status_code = 429
+    resp.headers['Retry-After'] = '5'
+    return resp
+
+
+def _chat_session(data):
+    """Resolve the chat session for a request body; seed it from a legacy client history."""
+    session_id = data.get('session_id')
+    if not conversation_store.is_valid_session_id(session_id):
+        session_id = conversation_store.new_session_id()
+    history = data.get('history')
+    if history and isinstance(history, list) and not conversation_store.has(session_id):
+        conversation_store.seed(session_id, history)
+    return session_id
 
 
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     """Chatbot backend endpoint used by static/chatbot.js
-    Accepts JSON: {message: str, history: [[role, content], ...]}
-    Returns JSON: {ok: bool, reply: str, history: same_format}
+    Accepts JSON: {message: str, session_id?: str}
+    (a legacy ``history: [[role, content], ...]`` is used only to seed a new session)
+    Returns JSON: {ok: bool, reply: str, session_id: str, history: [[role, content], ...]}
     """
+    limited = _rate_limited_response()
+    if limited is not None:
+        return limited
     data = request.get_json(silent=True) or {}
     message = str((data.get('message') or '')).strip()
-    history = data.get('history') or []
     if not message:
         return jsonify({"ok": False, "reply": "Brak wiadomości do przetworzenia."}), 400
+    session_id = _chat_session(data)
 
     # Try to get AI reply; fall back to a deterministic message if unavailable
-    reply = get_ai_reply(message, history)  # may be None if no API key or error
+    try:
+        reply = get_ai_reply(message, session_id=session_id)  # may be None if no API key or error
+    except UpstreamBusy:
+        if CHAT_OVERLOAD_MODE == '429':
+            return _overloaded_response()
+        reply = None
     if not reply:
-        reply = (
-            "Dziękuję za wiadomość! Aktualnie moduł AI jest niedostępny na serwerze. "
-            "Możesz opisać krótko swój projekt lub pytanie – odpiszemy mailowo. "
-            "Kontakt: contact@karlab.com lub formularz Kontakt na stronie."
-        )
+        reply = fallback_reply(message)
+
+    conversation_store.append(session_id, ('user', message), ('assistant', reply))
+    history = conversation_store.window(session_id, conversation_store.max_turns)
+    return jsonify({"ok": True, "reply": reply, "session_id": session_id, "history": history}), 200
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """Streaming variant of /api/chat (NDJSON, one object per line).
+    Accepts the same JSON as /api/chat. Emits:
+      {"type": "token", "text": "..."}  for every fragment,
+      {"type": "done", "ok": true, "reply": str, "session_id": str,
+       "history": [[role, content], ...]}  at the end.
+    """
+    limited = _rate_limited_response()
+    if limited is not None:
+        return limited
+    data = request.get_json(silent=True) or {}
+    message = str((data.get('message') or '')).strip()
+    if not message:
+        return jsonify({"ok": False, "reply": "Brak wiadomości do przetworzenia."}), 400
+    session_id = _chat_session(data)
+
+    def generate():
+        parts = []
+        metrics_registry.inc('karlab_chat_streams_total')
+        for text in stream_ai_reply(message, session_id=session_id):
+            parts.append(text)
+            yield json.dumps({"type": "token", "text": text}, ensure_ascii=False) + "\n"
+        reply = ''.join(parts).strip()
+        if not reply:
+            reply = fallback_reply(message)
+            yield json.dumps({"type": "token", "text": reply}, ensure_ascii=False) + "\n"
+        conversation_store.append(session_id, ('user', message), ('assistant', reply))
+        yield json.dumps({
+            "type": "done",
+            "ok": True,
+            "reply": reply,
+            "session_id": session_id,
+            "history": conversation_store.window(session_id, conversation_store.max_turns),
+        }, ensure_ascii=False) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
-    # Update history on the server side for convenience to keep UI simple
-    try:
-        history = (history + [['user', message], ['assistant', reply]])[-20]
-    except Exception:
-        history = [['user', message], ['assistant', reply]]
 
-    return jsonify({"ok": True, "reply": reply, "history": history}), 200
+# --- Admin read API over inquiries ---
+ADMIN_API_TOKEN = os.getenv('ADMIN_API_TOKEN', '')
+
+
+def require_admin_token(view):
+    """Allow only requests with ``Authorization: Bearer $ADMIN_API_TOKEN``."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else ''
+        if not ADMIN_API_TOKEN or not hmac.compare_digest(token.encode(), ADMIN_API_TOKEN.encode()):
+            return jsonify({"ok": False, "error": "unauthorized"}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@app.route('/api/inquiries', methods=['GET'])
+@require_admin_token
+def api_inquiries():
+    """Keyset-paginated inquiries, newest first.
+    Query: limit (1-200), cursor, service_type, budget_range, email
+    Returns JSON: {ok: bool, items: [...], next_cursor: str|null}
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    try:
+        items, next_cursor = storage.fetch_inquiries(request.args, cursor=request.args.get('cursor'), limit=limit)
+    except StorageUnavailable:
+        return jsonify({"ok": False, "error": "database unavailable"}), 503
+    except inquiry_queries.InvalidCursor as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, "items": items, "next_cursor": next_cursor}), 200
+
+
+@app.route('/api/inquiries/export', methods=['GET'])
+@require_admin_token
+def api_inquiries_export():
+    """Stream all matching inquiries as CSV (default) or NDJSON (?format=ndjson)."""
+    fmt = (request.args.get('format') or 'csv').lower()
+    filters = {key: request.args.get(key) for key in inquiry_queries.FILTERS}
+
+    def generate():
+        rows = storage.iter_inquiries(filters)
+        chunks = inquiry_queries.iter_ndjson(rows) if fmt == 'ndjson' else inquiry_queries.iter_csv(rows)
+        try:
+            for chunk in chunks:
+                yield chunk
+        except StorageUnavailable:
+            return
+        except Exception as e:
+            db_log.error("Export error", error=e)
+
+    if fmt == 'ndjson':
+        mimetype, filename = 'application/x-ndjson', 'inquiries.ndjson'
+    else:
+        mimetype, filename = 'text/csv', 'inquiries.csv'
+    return Response(
+        stream_with_context(generate()),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'},
+    )
 
 
 @app.route('/inquiry.html', methods=['GET', 'POST'])
@@ -395,30 +1333,21 @@ def business_inquiry():
             errors.append('Brak opisu projektu.')
 
         if not errors:
+            if is_duplicate_submission('inquiry', email, project_description):
+                inquiry_log.info("Duplicate submission suppressed", email=email)
+                return render_template('inquiry.html', submitted=True)
+
             # Zapis do bazy danych (best-effort)
-            client_ip = request.headers.get('X-Forwarded-For', request.remote_addr)
+            client_ip = request.remote_addr  # resolved by ProxyFix when TRUST_PROXY_HOPS > 0
             user_agent = request.headers.get('User-Agent', '')
-            conn = get_db_connection()
-            if conn:
-                try:
-                    with conn, conn.cursor() as cur:
-                        cur.execute(
-                            """
-                            INSERT INTO inquiries
-                            (name, email, company, business_needs, service_type, budget_range, timeline,
-                             project_description, additional_info, client_ip, user_agent)
-                            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                            """,
-                            (name, email, company, business_needs, service_type, budget_range,
-                             timeline, project_description, additional_info, client_ip, user_agent)
-                        )
-                except Exception as e:
-                    print(f"[DB] Insert error: {e}")
-                finally:
-                    try:
-                        conn.close()
-                    except Exception:
-                        pass
+            try:
+                # journaled + batched INSERT (see inquiry_writer.py)
+                with timed('inquiry_enqueue'):
+                    inquiry_writer.add((name, email, company, business_needs, service_type, budget_range,
+                                        timeline, project_description, additional_info, client_ip,
+                                        user_agent))
+            except Exception as e:
+                db_log.error("Insert error", error=e)
 
             # 1) Mail do Ciebie (admina)
             try:
@@ -441,10 +1370,10 @@ def business_inquiry():
                     recipients=[app.config['MAIL_USERNAME']],
                     body=body,
                 )
-                mail.send(msg_to_admin)
+                send_mail_async(msg_to_admin)
 
             except Exception as e:
-                print(f"[MAIL] Send error: {e}")
+                mail_log.error("Send error", error=e)
 
             # 2) Mail potwierdzający do użytkownika
             try:
@@ -465,16 +1394,16 @@ def business_inquiry():
                     recipients=[email],
                     body=confirmation_body,
                 )
-                mail.send(msg_to_user)
+                send_mail_async(msg_to_user)
 
             except Exception as e:
-                print(f"[MAIL] User confirmation error: {e}")
+                mail_log.error("User confirmation error", error=e)
 
             submitted = True
 
         else:
-            print(f"[INQUIRY] Validation errors: {errors}")
+            inquiry_log.info("Validation errors", errors=errors, email=email)
 
-        print(f"Nowe zapytanie od: {name} ({email}) | Firma: {company} | Usługa: {service_type} | Budżet: {budget_range}")
+        inquiry_log.info("Nowe zapytanie", email=email, company=company, service_type=service_type, budget_range=budget_range)
 
     return render_template('inquiry.html', submitted=submitted)
@@ -0,0 +1,13 @@
+"""ASGI entry point: async /api/chat (chat_asgi.py) in front of the Flask app.
+
+    uvicorn asgi:application --workers 2
+
+Needs ``asgiref`` (installed with ``flask[async]``) to run the Flask app
+under ASGI.
+"""
+from asgiref.wsgi import WsgiToAsgi
+
+from app import app as flask_app
+from chat_asgi import ChatASGI
+
+application = ChatASGI(fallback=WsgiToAsgi(flask_app))
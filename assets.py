@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Fingerprinted, minified, precompressed static assets.
+
+Build step (run after ``tsc`` has compiled TypeScript into static/):
+
+    python3 assets.py            # or: flask build-assets
+
+For every asset it writes ``static/dist/<name>.<hash>.<ext>`` plus ``.gz``
+and (if the brotli module is installed) ``.br`` siblings, and records the
+mapping in ``static/dist/manifest.json``.
+
+At runtime ``AssetManifest`` makes ``url_for('static', filename='styles.css')``
+resolve to the hashed file and serves ``/static/dist/...`` with
+``Cache-Control: immutable`` and the precompressed variant picked from
+Accept-Encoding. Without a manifest everything falls back to plain files.
+"""
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+
+try:
+    import brotli  # type: ignore
+except Exception:  # optional dependency
+    brotli = None  # type: ignore
+
+try:
+    import rjsmin  # type: ignore
+except Exception:  # optional dependency
+    rjsmin = None  # type: ignore
+
+from jsonlog import get_logger
+
+log = get_logger('assets')
+
+DEFAULT_ASSETS = ('styles.css', 'dark.css', 'darkmode.js', 'chatbot.js')
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# string | comment | whitespace | punctuation | anything else (a lone quote or slash included)
+_CSS_TOKEN_RE = re.compile(
+    r'''("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')'''
+    r'|(/\*.*?\*/)'
+    r'|(\s+)'
+    r'|([{};,>])'
+    r'''|([^"'/\s{};,>]+|["'/])''', re.S)
+# whitespace is dropped after these and before the punctuation; only the space
+# *after* a colon goes - "a :hover" and "a:hover" are different selectors
+_CSS_TIGHT_AFTER = frozenset('{};,>:')
+_CSS_TIGHT_BEFORE = frozenset('{};,>')
+
+
+# --- build ---
+def minify_css(text):
+    """Conservative CSS minifier (comments, whitespace, last semicolons); strings are left alone."""
+    out = []
+    space = False
+    for string, comment, blank, punct, other in _CSS_TOKEN_RE.findall(text):
+        if comment:
+            continue
+        if blank:
+            space = True
+            continue
+        token = string or punct or other
+        if space and out and out[-1][-1] not in _CSS_TIGHT_AFTER and token[0] not in _CSS_TIGHT_BEFORE:
+            out.append(' ')
+        space = False
+        if token == '}' and out and out[-1] == ';':
+            out.pop()
+        out.append(token)
+    return ''.join(out)
+
+
+def minify_js(text):
+    """Use rjsmin when installed; otherwise only strip trailing whitespace."""
+    if rjsmin is not None:
+        return rjsmin.jsmin(text)
+    return '\n'.join(line.rstrip() for line in text.splitlines() if line.strip()) + '\n'
+
+
+def _minify(name, text):
+    if name.endswith('.css'):
+        return minify_css(text)
+    if name.endswith('.js'):
+        return minify_js(text)
+    return text
+
+
+def fingerprint(data, length=10):
+    return hashlib.sha256(data).hexdigest()[:length]
+
+
+def hashed_name(name, digest):
+    root, ext = os.path.splitext(name)
+    return f'{root}.{digest}{ext}'
+
+
+def build(static_dir, names=DEFAULT_ASSETS):
+    """Minify, fingerprint and precompress assets; return the manifest dict."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    os.makedirs(dist, exist_ok=True)
+    manifest = {}
+    for name in names:
+        src = os.path.join(static_dir, name)
+        if not os.path.exists(src):
+            log.warning("Skipping missing asset", name=name)
+            continue
+        with open(src, 'r', encoding='utf-8') as f:
+            data = _minify(name, f.read()).encode('utf-8')
+        target = hashed_name(name, fingerprint(data))
+        out = os.path.join(dist, target)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, 'wb') as f:
+            f.write(data)
+        with open(out + '.gz', 'wb') as f:
+            f.write(gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None:
+            with open(out + '.br', 'wb') as f:
+                f.write(brotli.compress(data, quality=11))
+        manifest[name] = f'{DIST_DIR}/{target}'
+        with open(src, 'rb') as f:
+            original = len(f.read())
+        log.info("Asset built", name=name, target=manifest[name], bytes_in=original, bytes_out=len(data))
+    tmp = os.path.join(dist, MANIFEST_NAME + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, os.path.join(dist, MANIFEST_NAME))
+    return manifest
+
+
+# --- runtime ---
+class AssetManifest:
+    """Maps logical static filenames to fingerprinted ones and serves them."""
+
+    def __init__(self, app=None):
+        self.mapping = {}
+        self.static_dir = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_dir = app.static_folder
+        self.load()
+        app.url_defaults(self._url_defaults)
+        app.add_url_rule(f'{app.static_url_path}/{DIST_DIR}/<path:filename>',
+                         'hashed_static', self.serve)
+
+    def load(self):
+        path = os.path.join(self.static_dir or '', DIST_DIR, MANIFEST_NAME)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.mapping = json.load(f)
+        except FileNotFoundError:
+            self.mapping = {}
+        except Exception as e:
+            log.error("Manifest load error", error=e)
+            self.mapping = {}
+        return self.mapping
+
+    def resolve(self, filename):
+        """Logical static filename -> filename actually served (relative to static/)."""
+        return self.mapping.get(filename, filename)
+
+    def url(self, filename, static_url_path='/static'):
+        return f'{static_url_path}/{self.resolve(filename)}'
+
+    def _url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.resolve(values['filename'])
+
+    def serve(self, filename):
+        from flask import abort, request, send_from_directory
+        import mimetypes
+
+        directory = os.path.join(self.static_dir, DIST_DIR)
+        mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        accepted = request.accept_encodings
+        chosen, encoding = filename, None
+        for enc, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if accepted[enc] and os.path.exists(os.path.join(directory, filename + suffix)):
+                chosen, encoding = filename + suffix, enc
+                break
+        if not os.path.exists(os.path.join(directory, filename)):
+            abort(404)
+        # manifest.json keeps its name across builds, so it must be revalidated
+        immutable = filename != MANIFEST_NAME
+        response = send_from_directory(directory, chosen, mimetype=mimetype,
+                                       max_age=31536000 if immutable else 0)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = IMMUTABLE if immutable else 'no-cache'
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+if __name__ == '__main__':
+    static = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    build(static, sys.argv[1:] or DEFAULT_ASSETS)
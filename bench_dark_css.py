@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: per-response cost of the dark-mode CSS injection.
+
+Compares the old after_request hook (decode body -> str.replace -> encode)
+with the current pipeline (link compiled into the template + byte-level
+fallback hook) on the real templates served by app.py.
+
+Usage: python3 bench_dark_css.py [iterations]
+"""
+import os
+import re
+import sys
+import time
+
+os.environ.setdefault('MAIL_PORT', '587')
+
+import app as app_module  # noqa: E402
+from flask import Response  # noqa: E402
+
+ROUTES = ['/base.html', '/about.html', '/references.html', '/certs.html', '/projects.html',
+          '/contact.html', '/inquiry.html']
+
+
+def legacy_inject(response):
+    """The original _inject_dark_mode_css body, kept here for comparison."""
+    ctype = response.headers.get('Content-Type', '')
+    if 'text/html' in ctype and not response.direct_passthrough:
+        html = response.get_data(as_text=True)
+        if '</head>' in html and 'href="/static/dark.css"' not in html:
+            link_tag = '\n<link rel="stylesheet" href="/static/dark.css">\n'
+            html = html.replace('</head>', f'{link_tag}</head>', 1)
+            response.set_data(html)
+    return response
+
+
+# the link as emitted now (fingerprinted manifest URL) or as it was before the manifest
+_DARK_LINK_RE = re.compile(
+    rb'\n?<link rel="stylesheet" href="(?:'
+    + b'|'.join(re.escape(href.encode('utf-8')) for href in {'/static/dark.css', app_module.DARK_CSS_HREF})
+    + rb')">\n?')
+
+
+def strip_link(body):
+    """Rendered body as the old pipeline saw it (before injection)."""
+    return _DARK_LINK_RE.sub(b'', body, count=1)
+
+
+def bench(fn, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6  # microseconds
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    flask_app = app_module.app
+    client = flask_app.test_client()
+
+    print(f"{'route':<20}{'bytes':>9}{'old us':>10}{'new us':>10}{'speedup':>10}")
+    for route in ROUTES:
+        resp = client.get(route)
+        if resp.status_code != 200:
+            print(f"{route:<20} skipped (status {resp.status_code})")
+            continue
+        body = resp.get_data()
+        raw = strip_link(body)
+        if raw == body:
+            print(f"{route:<20} skipped (dark.css link not found)")
+            continue
+
+        def run_old():
+            legacy_inject(Response(raw, mimetype='text/html'))
+
+        def run_new():
+            # Template output already carries the link; the hook only checks g.
+            with flask_app.test_request_context(route):
+                app_module.dark_css_link()
+                app_module._inject_dark_mode_css(Response(body, mimetype='text/html'))
+
+        def run_ctx():
+            with flask_app.test_request_context(route):
+                Response(body, mimetype='text/html')
+
+        def run_resp():
+            Response(raw, mimetype='text/html')
+
+        # subtract the Response construction both paths share
+        old_us = max(bench(run_old, iterations) - bench(run_resp, iterations), 0.0)
+        # subtract the request-context setup the new path needs for g
+        new_us = max(bench(run_new, iterations) - bench(run_ctx, iterations), 0.0)
+        speedup = old_us / new_us if new_us else float('inf')
+        print(f"{route:<20}{len(body):>9}{old_us:>10.2f}{new_us:>10.2f}{speedup:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
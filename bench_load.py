@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Offline load test for app.py with local stand-ins (see bench_standins.py).
+
+Everything app.py talks to is replaced by a local service: SMTP goes to a sink,
+the AI API to a mock with a configurable latency distribution, and the
+database to the embedded SQLite backend (default) or a local PostgreSQL
+(--db postgres, DB_*/PG* env; see storage.py). Two modes:
+
+    micro  Flask test client, no sockets - per-request framework/app cost
+    load   real threaded HTTP server on 127.0.0.1 - end-to-end throughput
+
+Reports p50/p95/p99 latency and requests/s per route. Baselines are JSON:
+
+    python3 bench_load.py micro --save micro            # -> bench_baselines/micro.json
+    python3 bench_load.py load -c 32 -n 2000 --ai-latency lognormal:-1.6,0.4
+    python3 bench_load.py micro --compare bench_baselines/micro.json
+"""
+import argparse
+import http.client
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from bench_standins import SMTPSink, MockAIServer
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_baselines')
+ADMIN_TOKEN = 'bench-admin-token'
+SKIP_ENDPOINTS = {'static', 'hashed_static', 'metrics_endpoint'}
+RUN_ID = str(int(time.time()))  # keeps newsletter emails unique across runs
+
+
+def configure_env(workdir, smtp, ai, args):
+    """Wire app.py to the stand-ins; must run before ``import app``."""
+    os.environ.update({
+        'MAIL_SERVER': smtp.address[0],
+        'MAIL_PORT': str(smtp.address[1]),
+        'MAIL_USE_TLS': 'false',
+        'MAIL_USERNAME': 'inbox@bench.local',
+        'MAIL_PASSWORD': '',
+        'MAIL_DEFAULT_SENDER': 'noreply@bench.local',
+        'MAIL_SPOOL_DIR': os.path.join(workdir, 'mail_spool'),
+        'INQUIRY_JOURNAL_DIR': os.path.join(workdir, 'inquiry_journal'),
+        'AIMLAPI_API_KEY': 'bench',
+        'AIMLAPI_BASE_URL': ai.base_url,
+        'ADMIN_API_TOKEN': ADMIN_TOKEN,
+        # measure the upstream path, not the local shortcuts
+        'SITE_INDEX_PATH': os.path.join(workdir, 'site_index.npz'),
+        'LOCAL_BOT_PATH': os.path.join(workdir, 'local_bot.json'),
+        'CHAT_RATE_PER_SEC': '1000000',
+        'CHAT_RATE_BURST': '1000000',
+        'AI_MAX_CONCURRENT': str(args.ai_concurrency),
+        'STORAGE_BACKEND': args.db,
+        'SQLITE_PATH': os.path.join(workdir, 'bench.sqlite3'),
+    })
+
+
+# --- scenarios ---
+def _get(path, headers=None):
+    return lambda i: ('GET', path, dict(headers or {}), None)
+
+
+def _post_form(path, fields):
+    def make(i):
+        body = urlencode({k: v.format(i=i, run=RUN_ID) for k, v in fields.items()}).encode()
+        return 'POST', path, {'Content-Type': 'application/x-www-form-urlencoded'}, body
+    return make
+
+
+def _post_json(path, payload):
+    def make(i):
+        body = json.dumps({k: v.format(i=i, run=RUN_ID) if isinstance(v, str) else v
+                           for k, v in payload.items()}).encode()
+        return 'POST', path, {'Content-Type': 'application/json'}, body
+    return make
+
+
+POST_SCENARIOS = {
+    'POST /api/chat': _post_json('/api/chat', {'message': 'Pytanie testowe {i} o automatyzację'}),
+    'POST /api/chat (repeat)': _post_json('/api/chat', {'message': 'Ile kosztuje strona internetowa?'}),
+    'POST /api/chat/stream': _post_json('/api/chat/stream', {'message': 'Strumień testowy {i}'}),
+    'POST /newsletter/subscribe': _post_json('/newsletter/subscribe',
+                                             {'email': 'bench{run}-{i}@bench.local', 'source_page': '/bench'}),
+    'POST /contact.html': _post_form('/contact.html', {
+        'name': 'Bench {i}', 'email': 'bench{run}-{i}@bench.local', 'message': 'Wiadomość testowa {i}',
+    }),
+    'POST /inquiry.html': _post_form('/inquiry.html', {
+        'name': 'Bench {i}', 'email': 'bench{run}-{i}@bench.local', 'company': 'Bench',
+        'business_needs': 'Automatyzacja', 'service_type': 'python', 'budget_range': '10-20k',
+        'timeline': '1m', 'project_description': 'Opis projektu {i}', 'additional_info': '',
+    }),
+    'GET /api/inquiries': _get('/api/inquiries?limit=50', {'Authorization': f'Bearer {ADMIN_TOKEN}'}),
+    'GET /metrics': _get('/metrics'),
+}
+
+
+def discover_scenarios(flask_app):
+    """Every argument-free GET route, plus the POST/API scenarios above."""
+    scenarios = {}
+    for rule in sorted(flask_app.url_map.iter_rules(), key=lambda r: r.rule):
+        if rule.endpoint in SKIP_ENDPOINTS or rule.arguments or 'GET' not in rule.methods:
+            continue
+        if rule.rule.startswith('/api/'):
+            continue  # token-protected, listed explicitly
+        scenarios[f'GET {rule.rule}'] = _get(rule.rule)
+    scenarios.update(POST_SCENARIOS)
+    return scenarios
+
+
+# --- transports ---
+class TestClientTransport:
+    def __init__(self, flask_app):
+        self.app = flask_app
+        self._local = threading.local()
+
+    def __call__(self, method, path, headers, body):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        resp = client.open(path, method=method, headers=headers, data=body, buffered=True)
+        resp.get_data()
+        return resp.status_code
+
+
+class HTTPTransport:
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self._local = threading.local()
+
+    def __call__(self, method, path, headers, body):
+        for attempt in (0, 1):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                if resp.will_close:
+                    conn.close()
+                    self._local.conn = None
+                return resp.status
+            except (ConnectionError, http.client.HTTPException):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def start_server(flask_app):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'  # keep-alive between requests
+    server = make_server('127.0.0.1', 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-http', daemon=True).start()
+    return server
+
+
+# --- measurement ---
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def run_scenario(transport, make_request, requests, concurrency, warmup):
+    for i in range(warmup):
+        transport(*make_request(-1 - i))
+    counter = itertools.count()
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def worker():
+        local, local_status = [], {}
+        while True:
+            i = next(counter)
+            if i >= requests:
+                break
+            req = make_request(i)
+            started = time.perf_counter()
+            try:
+                status = transport(*req)
+            except Exception:
+                status = 'error'
+            local.append(time.perf_counter() - started)
+            local_status[status] = local_status.get(status, 0) + 1
+        with lock:
+            latencies.extend(local)
+            for status, n in local_status.items():
+                statuses[status] = statuses.get(status, 0) + n
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    ms = lambda v: round(v * 1000, 3) if v is not None else None  # noqa: E731
+    errors = sum(n for s, n in statuses.items() if s == 'error' or s >= 500)
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'status': {str(k): v for k, v in sorted(statuses.items(), key=lambda kv: str(kv[0]))},
+        'rps': round(len(latencies) / wall, 1) if wall else None,
+        'mean_ms': ms(sum(latencies) / len(latencies)) if latencies else None,
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'max_ms': ms(latencies[-1] if latencies else None),
+    }
+
+
+# --- reporting ---
+def _cell(value):
+    """Table cell text; routes with no completed requests have None stats."""
+    return '-' if value is None else value
+
+
+def print_report(results):
+    print(f"{'route':<34}{'n':>6}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results['routes'].items():
+        print(f"{name:<34}{r['requests']:>6}{r['errors']:>5}{_cell(r['rps']):>9}"
+              f"{_cell(r['p50_ms']):>10}{_cell(r['p95_ms']):>10}{_cell(r['p99_ms']):>10}")
+    extra = results.get('standins', {})
+    print(f"\nSMTP messages received: {extra.get('smtp_messages')}, AI upstream calls: {extra.get('ai_calls')}")
+
+
+def compare(results, baseline_path, threshold):
+    """Print p95/rps deltas against a saved baseline; return the regressed routes."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    print(f"\nvs {baseline_path} ({baseline.get('created')}), threshold {threshold:.0%}")
+    print(f"{'route':<34}{'p95 base':>10}{'p95 now':>10}{'Δ':>8}{'rps base':>10}{'rps now':>10}")
+    for name, now in results['routes'].items():
+        base = baseline.get('routes', {}).get(name) or {}
+        if not base.get('p95_ms') or now['p95_ms'] is None:
+            print(f"{name:<34}{_cell(base.get('p95_ms')):>10}{_cell(now['p95_ms']):>10}{'-':>8}"
+                  f"{_cell(base.get('rps')):>10}{_cell(now['rps']):>10}")
+            continue
+        delta = now['p95_ms'] / base['p95_ms'] - 1
+        flag = ''
+        if delta > threshold:
+            flag = '  REGRESSION'
+            regressions.append(name)
+        print(f"{name:<34}{base['p95_ms']:>10}{now['p95_ms']:>10}{delta:>+8.0%}"
+              f"{_cell(base.get('rps')):>10}{_cell(now['rps']):>10}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('mode', choices=('micro', 'load'))
+    parser.add_argument('-n', '--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('-c', '--concurrency', type=int, default=None,
+                        help='parallel clients (default: 1 for micro, 16 for load)')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--routes', default='', help='comma-separated substrings to select routes')
+    parser.add_argument('--ai-latency', default='lognormal:-1.6,0.4',
+                        help='mock AI latency spec (default median ~0.2s)')
+    parser.add_argument('--ai-concurrency', type=int, default=8, help='AI_MAX_CONCURRENT for the app')
+    parser.add_argument('--db', choices=('sqlite', 'postgres'), default='sqlite')
+    parser.add_argument('--save', metavar='NAME', help=f'write {BASELINE_DIR}/NAME.json')
+    parser.add_argument('--compare', metavar='FILE', help='baseline JSON to diff against')
+    parser.add_argument('--threshold', type=float, default=0.10, help='p95 regression threshold')
+    args = parser.parse_args(argv)
+    concurrency = args.concurrency or (1 if args.mode == 'micro' else 16)
+
+    workdir = tempfile.mkdtemp(prefix='karlab-bench-')
+    smtp = SMTPSink().start()
+    ai = MockAIServer(latency=args.ai_latency).start()
+    configure_env(workdir, smtp, ai, args)
+
+    import app as app_module
+    if not app_module.init_db():
+        raise SystemExit(f"[BENCH] {args.db} storage is not available")
+    flask_app = app_module.app
+
+    server = None
+    if args.mode == 'micro':
+        transport = TestClientTransport(flask_app)
+    else:
+        server = start_server(flask_app)
+        transport = HTTPTransport(*server.server_address[:2])
+
+    scenarios = discover_scenarios(flask_app)
+    if args.routes:
+        wanted = [w.strip() for w in args.routes.split(',') if w.strip()]
+        scenarios = {k: v for k, v in scenarios.items() if any(w in k for w in wanted)}
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'mode': args.mode,
+        'config': {'requests': args.requests, 'concurrency': concurrency, 'warmup': args.warmup,
+                   'ai_latency': args.ai_latency, 'ai_concurrency': args.ai_concurrency, 'db': args.db,
+                   'python': sys.version.split()[0]},
+        'routes': {},
+    }
+    for name, make_request in scenarios.items():
+        print(f"[BENCH] {name} ...", file=sys.stderr)
+        results['routes'][name] = run_scenario(transport, make_request, args.requests, concurrency, args.warmup)
+
+    app_module.mail_dispatcher.stop(timeout=1.0)
+    results['standins'] = {'smtp_messages': smtp.count, 'ai_calls': ai.calls}
+    if server is not None:
+        server.shutdown()
+    smtp.stop()
+    ai.stop()
+
+    print_report(results)
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f'{args.save}.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"[BENCH] Baseline saved to {path}")
+    if args.compare:
+        return 1 if compare(results, args.compare, args.threshold) else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,178 @@
+"""Local stand-ins for the services app.py talks to, used by bench_load.py.
+
+- ``SMTPSink``: minimal threaded SMTP server that accepts and counts messages.
+- ``MockAIServer``: OpenAI-compatible ``/chat/completions`` (plain and SSE
+  streaming) with a configurable latency distribution.
+
+Latency specs: ``fixed:0.2``, ``uniform:0.1,0.5``, ``normal:0.3,0.05``,
+``lognormal:-1.5,0.5`` (mu, sigma of ln seconds), ``exp:0.3`` (mean).
+"""
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# --- SMTP ---
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    def _reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        self._reply('220 bench-smtp ready')
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line in (b'.\r\n', b'.\n'):
+                    in_data = False
+                    self.server.sink._delivered()
+                    self._reply('250 OK queued')
+                continue
+            verb = line.strip().split(b' ', 1)[0].upper()
+            if verb == b'EHLO':
+                self.wfile.write(b'250-bench-smtp\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif verb == b'DATA':
+                in_data = True
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+            elif verb == b'QUIT':
+                self._reply('221 Bye')
+                return
+            elif verb in (b'HELO', b'MAIL', b'RCPT', b'RSET', b'NOOP'):
+                self._reply('250 OK')
+            else:
+                self._reply('502 Command not implemented')
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """Accepts every message and drops it; ``count`` is the number delivered."""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self._server = _ThreadingTCPServer((host, port), _SMTPHandler)
+        self._server.sink = self
+        self._lock = threading.Lock()
+        self.count = 0
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def _delivered(self):
+        with self._lock:
+            self.count += 1
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='bench-smtp', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# --- OpenAI-compatible API ---
+def latency_sampler(spec):
+    """Return a function producing delays (seconds) for a latency spec."""
+    kind, _, args = (spec or 'fixed:0').partition(':')
+    values = [float(v) for v in args.split(',') if v.strip()] or [0.0]
+    if kind == 'fixed':
+        return lambda: values[0]
+    if kind == 'uniform':
+        return lambda: random.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda: max(0.0, random.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda: random.lognormvariate(values[0], values[1])
+    if kind == 'exp':
+        return lambda: random.expovariate(1.0 / values[0]) if values[0] > 0 else 0.0
+    raise ValueError(f"unknown latency spec: {spec}")
+
+
+class _AIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = {}
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_error(404)
+            return
+        server = self.server.mock
+        server._called()
+        delay = server.sample()
+        words = server.reply.split(' ')
+        if body.get('stream'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Connection', 'close')
+            self.end_headers()
+            # time to first token = delay; the rest is spread over the reply
+            time.sleep(delay)
+            for i, word in enumerate(words):
+                chunk = {'choices': [{'delta': {'content': word if i == 0 else ' ' + word}}]}
+                self.wfile.write(f'data: {json.dumps(chunk)}\n\n'.encode('utf-8'))
+                self.wfile.flush()
+                time.sleep(server.token_interval)
+            self.wfile.write(b'data: [DONE]\n\n')
+            self.close_connection = True
+            return
+        time.sleep(delay)
+        data = json.dumps({
+            'id': 'bench',
+            'object': 'chat.completion',
+            'model': body.get('model', 'bench'),
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': server.reply},
+                         'finish_reason': 'stop'}],
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockAIServer:
+    """Local OpenAI-compatible endpoint; point AIMLAPI_BASE_URL at ``base_url``."""
+
+    def __init__(self, latency='fixed:0.2', reply='To jest odpowiedź testowa serwera benchmarku.',
+                 token_interval=0.005, host='127.0.0.1', port=0):
+        self.sample = latency_sampler(latency)
+        self.reply = reply
+        self.token_interval = token_interval
+        self._server = ThreadingHTTPServer((host, port), _AIHandler)
+        self._server.daemon_threads = True
+        self._server.mock = self
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}/v1'
+
+    def _called(self):
+        with self._lock:
+            self.calls += 1
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name='bench-ai', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Insert throughput and latency of the storage backends (see storage.py).
+
+Runs the same write paths app.py uses against each backend:
+
+    inquiry x1     one inquiry per transaction (write-behind flush of a single row)
+    inquiry xB     batches of --batch rows (inquiry_writer under load)
+    subscribe      newsletter upsert, new email every time
+    subscribe dup  newsletter upsert hitting the unique constraint
+    claim          form_submissions claim (duplicate-submission guard)
+
+SQLite runs in a temporary file. PostgreSQL uses the DB_*/PG* env and is
+skipped when unreachable - point it at a scratch database; rows written by the
+benchmark (``@bench.local`` emails, ``bench`` claims) are deleted afterwards.
+
+    python3 bench_storage.py -n 2000 -c 4
+    python3 bench_storage.py --backends sqlite --batch 100 --json out.json
+"""
+import argparse
+import itertools
+import json
+import math
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import PostgresStorage, SQLiteStorage, StorageUnavailable
+
+RUN_ID = str(int(time.time()))
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return None
+    # nearest-rank
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _inquiry(i):
+    return (f'Bench {i}', f'bench{RUN_ID}-{i}@bench.local', 'Bench', 'Automatyzacja', 'python', '10-20k',
+            '1m', f'Opis projektu {i}', '', '127.0.0.1', 'bench_storage')
+
+
+def postgres_storage():
+    """PostgresStorage over a small pool built from the same env app.py reads, or None."""
+    try:
+        import psycopg2
+        from db_pool import ConnectionPool
+    except Exception:
+        return None
+
+    def connect():
+        return psycopg2.connect(
+            dbname=os.getenv('PGDATABASE', os.getenv('DB_NAME')),
+            user=os.getenv('PGUSER', os.getenv('DB_USER')),
+            password=os.getenv('PGPASSWORD', os.getenv('DB_PASSWORD', '')),
+            host=os.getenv('PGHOST', os.getenv('DB_HOST', 'localhost')),
+            port=int(os.getenv('PGPORT', os.getenv('DB_PORT', '5432'))),
+        )
+
+    try:
+        pool = ConnectionPool(connect, min_size=1, max_size=16)
+        storage = PostgresStorage(pool.connection)
+        storage.migrate()
+    except Exception as e:
+        print(f"[BENCH] PostgreSQL skipped: {e}", file=sys.stderr)
+        return None
+    storage.pool = pool
+    return storage
+
+
+def cleanup_postgres(storage):
+    with storage.connection_factory() as conn:
+        with conn, conn.cursor() as cur:
+            cur.execute("DELETE FROM inquiries WHERE email LIKE %s", ('%@bench.local',))
+            cur.execute("DELETE FROM newsletter_subscriptions WHERE email LIKE %s", ('%@bench.local',))
+            cur.execute("DELETE FROM form_submissions WHERE form = 'bench'")
+    storage.pool.closeall()
+
+
+def run(fn, operations, rows_per_op, concurrency):
+    """Time ``fn(i)`` for i in range(operations); returns latency/throughput stats."""
+    latencies = []
+
+    def one(i):
+        started = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    if concurrency <= 1:
+        latencies = [one(i) for i in range(operations)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(one, range(operations)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'ops': operations,
+        'rows_per_sec': operations * rows_per_op / elapsed if elapsed else None,
+        'ops_per_sec': operations / elapsed if elapsed else None,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+def bench_backend(storage, n, batch, concurrency):
+    counter = itertools.count()
+    results = {}
+    results['inquiry x1'] = run(lambda i: storage.insert_inquiries([_inquiry(next(counter))]),
+                                n, 1, concurrency)
+    results[f'inquiry x{batch}'] = run(
+        lambda i: storage.insert_inquiries([_inquiry(next(counter)) for _ in range(batch)]),
+        max(1, n // batch), batch, concurrency)
+    results['subscribe'] = run(
+        lambda i: storage.subscribe(f'news{RUN_ID}-{i}@bench.local', '/bench', '127.0.0.1', 'bench_storage'),
+        n, 1, concurrency)
+    results['subscribe dup'] = run(
+        lambda i: storage.subscribe(f'news{RUN_ID}-{i % 10}@bench.local', '/bench'), n, 1, concurrency)
+    results['claim'] = run(lambda i: storage.claim_submission([(f'h:bench:{RUN_ID}-{i}', 600.0)], 'bench'),
+                           n, 1, concurrency)
+    return results
+
+
+def print_report(report):
+    print(f"{'backend':<10}{'operation':<16}{'ops':>7}{'rows/s':>11}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for backend, results in report['backends'].items():
+        for name, r in results.items():
+            print(f"{backend:<10}{name:<16}{r['ops']:>7}{r['rows_per_sec']:>11.0f}"
+                  f"{r['p50_ms']:>9.3f}{r['p95_ms']:>9.3f}{r['p99_ms']:>9.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--operations', type=int, default=1000, help='operations per scenario')
+    parser.add_argument('-c', '--concurrency', type=int, default=1, help='writer threads')
+    parser.add_argument('--batch', type=int, default=50, help='rows per batched inquiry insert')
+    parser.add_argument('--backends', default='sqlite,postgres')
+    parser.add_argument('--json', metavar='FILE', help='also write the results as JSON')
+    args = parser.parse_args(argv)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {'operations': args.operations, 'concurrency': args.concurrency, 'batch': args.batch,
+                   'python': sys.version.split()[0]},
+        'backends': {},
+    }
+    for backend in [b.strip() for b in args.backends.split(',') if b.strip()]:
+        if backend == 'sqlite':
+            workdir = tempfile.mkdtemp(prefix='karlab-storage-')
+            storage = SQLiteStorage(os.path.join(workdir, 'bench.sqlite3'))
+        elif backend == 'postgres':
+            storage = postgres_storage()
+            if storage is None:
+                continue
+        else:
+            parser.error(f"unknown backend {backend!r}")
+        print(f"[BENCH] {backend} ...", file=sys.stderr)
+        try:
+            report['backends'][backend] = bench_backend(storage, args.operations, args.batch, args.concurrency)
+        except StorageUnavailable as e:
+            print(f"[BENCH] {backend} unavailable: {e}", file=sys.stderr)
+        finally:
+            if backend == 'postgres':
+                cleanup_postgres(storage)
+            storage.close()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
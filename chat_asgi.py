@@ -0,0 +1,257 @@
+"""Async (ASGI) implementation of POST /api/chat.
+
+A sync Flask worker sits idle for seconds while the LLM answers. This module
+serves the chat endpoint from an asyncio event loop instead, with an
+``httpx.AsyncClient`` talking to the same AIML/OpenAI-compatible API, so one
+process can hold hundreds of in-flight conversations. Every other path is
+forwarded to the Flask app (see asgi.py):
+
+    uvicorn asgi:application --workers 2
+
+Request/response JSON is identical to ``app.api_chat()``. The shared sync
+pieces (rate limiter, conversation store and reply cache, which may be SQLite;
+site index scoring, local bot, compression) run in worker threads via
+``asyncio.to_thread`` so a slow lock or scoring pass never stalls the loop.
+"""
+import asyncio
+import json
+import os
+import time
+
+try:
+    import httpx  # type: ignore
+except Exception:  # module may be missing in test environment
+    httpx = None  # type: ignore
+
+import app as flask_module
+from metrics import REGISTRY as metrics_registry, observe_stage
+from jsonlog import bind_request_id, get_logger
+from rate_limit import forwarded_addr
+
+log = get_logger('ai')
+
+MAX_BODY = 64 * 1024
+CHAT_PATHS = ('/api/chat',)
+
+
+class _AsyncUpstream:
+    """One keep-alive AsyncClient per event loop + single-flight per cache key."""
+
+    def __init__(self, max_concurrent=200):
+        self.max_concurrent = max_concurrent
+        self._client = None
+        self._semaphore = None
+        self._flights = {}
+
+    def _ensure(self):
+        if self._client is None and httpx is not None:
+            self._client = httpx.AsyncClient(
+                timeout=flask_module.AI_TIMEOUT,
+                limits=httpx.Limits(max_connections=self.max_concurrent,
+                                    max_keepalive_connections=min(self.max_concurrent, 32)),
+            )
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _complete(self, api_key, base_url, model, messages):
+        self._ensure()
+        if self._client is None:
+            return None
+        if self._semaphore.locked():
+            raise flask_module.UpstreamBusy()
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                resp = await self._client.post(
+                    f"{base_url}/chat/completions",
+                    headers={"Authorization": f"Bearer {api_key}"},
+                    json={"model": model, "messages": messages, "temperature": 0.3, "max_tokens": 512},
+                )
+                data = resp.json()
+                # a 200 with an unexpected body (list, string, null) is an upstream error too
+                choices = (data.get("choices") if isinstance(data, dict) else None) or []
+                content = ""
+                if choices:
+                    content = ((choices[0].get("message") or {}).get("content") or "").strip()
+            except Exception as e:
+                observe_stage('ai_upstream', time.perf_counter() - started, error=True)
+                log.error("Async AIML API error", error=e)
+                return None
+            observe_stage('ai_upstream', time.perf_counter() - started)
+        return content or None
+
+    async def reply(self, message, session_id):
+        """Async counterpart of app.get_ai_reply()."""
+        local = await asyncio.to_thread(flask_module.site_answer, message)
+        if local:
+            return local
+        history = await asyncio.to_thread(flask_module.conversation_store.window, session_id,
+                                          flask_module.CHAT_HISTORY_WINDOW)
+        prepared = await asyncio.to_thread(flask_module._prepare_ai_request, message, history)
+        if prepared is None:
+            return None
+        api_key, base_url, model, messages = prepared
+        cache = flask_module.reply_cache
+        if cache is None:
+            return await self._complete(api_key, base_url, model, messages)
+
+        key = flask_module.make_cache_key(messages, model)
+        cached = await asyncio.to_thread(cache.get, key)
+        if cached is not None:
+            return cached
+        flight = self._flights.get(key)
+        if flight is not None:
+            return await asyncio.shield(flight)
+        flight = asyncio.get_running_loop().create_future()
+        self._flights[key] = flight
+        try:
+            result = await self._complete(api_key, base_url, model, messages)
+            await asyncio.to_thread(cache.put, key, result)
+            flight.set_result(result)
+            return result
+        except BaseException:
+            flight.set_result(None)
+            raise
+        finally:
+            self._flights.pop(key, None)
+
+
+class _BodyTooLarge(Exception):
+    """Request body over MAX_BODY."""
+
+
+async def _read_body(receive, content_length=None):
+    """Request body bytes, or None if the client went away; raises _BodyTooLarge."""
+    if content_length is not None and content_length > MAX_BODY:
+        raise _BodyTooLarge()
+    body = b''
+    while True:
+        event = await receive()
+        if event['type'] == 'http.disconnect':
+            return None
+        body += event.get('body', b'')
+        if len(body) > MAX_BODY:
+            raise _BodyTooLarge()
+        if not event.get('more_body'):
+            return body
+
+
+async def _send_json(send, status, payload, extra_headers=(), accept_encoding=None):
+    data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    compression = flask_module.compression
+    if accept_encoding and len(data) >= compression.min_size:
+        data, encoding_headers = await asyncio.to_thread(compression.encode, data, 'application/json',
+                                                         accept_encoding)
+    else:
+        data, encoding_headers = compression.encode(data, 'application/json', accept_encoding)
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(data)).encode())]
+    headers.extend((name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in encoding_headers)
+    headers.extend(extra_headers)
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': data})
+
+
+class _ScopeRequest:
+    """Just enough of flask.request for rate_limit.client_ip()."""
+
+    def __init__(self, scope):
+        self.headers = {k.decode('latin-1').title(): v.decode('latin-1') for k, v in scope.get('headers', [])}
+        client = scope.get('client')
+        self.remote_addr = forwarded_addr(self.headers.get('X-Forwarded-For'), client[0] if client else None,
+                                          flask_module.TRUST_PROXY_HOPS)
+
+    @property
+    def content_length(self):
+        try:
+            return int(self.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return None
+
+
+class ChatASGI:
+    """ASGI app: async /api/chat, everything else goes to ``fallback`` (the Flask app)."""
+
+    def __init__(self, fallback=None, max_concurrent=None):
+        if max_concurrent is None:
+            max_concurrent = int(os.getenv('ASYNC_AI_MAX_CONCURRENT', '200'))
+        self.fallback = fallback
+        self.upstream = _AsyncUpstream(max_concurrent)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['path'] in CHAT_PATHS:
+            if scope['method'] != 'POST':
+                return await _send_json(send, 405, {"ok": False, "reply": "Method not allowed"})
+            started = time.perf_counter()
+            bind_request_id(_ScopeRequest(scope).headers.get('X-Request-Id'))
+            status = await self._chat(scope, receive, send)
+            metrics_registry.observe('karlab_http_request_duration_seconds', time.perf_counter() - started,
+                                     route=scope['path'], method='POST', status=str(status))
+            return
+        if self.fallback is None:
+            return await _send_json(send, 404, {"ok": False})
+        return await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            event = await receive()
+            if event['type'] == 'lifespan.startup':
+                await asyncio.to_thread(flask_module.start_background_workers)
+                await send({'type': 'lifespan.startup.complete'})
+            elif event['type'] == 'lifespan.shutdown':
+                await self.upstream.aclose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _chat(self, scope, receive, send):
+        req = _ScopeRequest(scope)
+        wait = await asyncio.to_thread(flask_module.chat_limiter.check, flask_module._client_ip(req))
+        if wait:
+            await _send_json(send, 429, {"ok": False, "reply": "Zbyt wiele wiadomości. Spróbuj ponownie za chwilę."},
+                             [(b'retry-after', str(max(1, int(wait + 0.999))).encode())])
+            return 429
+        try:
+            body = await _read_body(receive, req.content_length)
+        except _BodyTooLarge:
+            await _send_json(send, 413, {"ok": False, "reply": "Wiadomość jest zbyt długa."})
+            return 413
+        try:
+            data = json.loads(body or b'{}') if body is not None else {}
+        except ValueError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        message = str((data.get('message') or '')).strip()
+        if not message:
+            await _send_json(send, 400, {"ok": False, "reply": "Brak wiadomości do przetworzenia."})
+            return 400
+        session_id = await asyncio.to_thread(flask_module._chat_session, data)
+
+        try:
+            reply = await self.upstream.reply(message, session_id)
+        except flask_module.UpstreamBusy:
+            if flask_module.CHAT_OVERLOAD_MODE == '429':
+                await _send_json(send, 429, {"ok": False,
+                                             "reply": "Asystent jest teraz przeciążony. Spróbuj ponownie za chwilę."},
+                                 [(b'retry-after', b'5')])
+                return 429
+            reply = None
+        if not reply:
+            reply = await asyncio.to_thread(flask_module.fallback_reply, message)
+
+        history = await asyncio.to_thread(_record_turn, session_id, message, reply)
+        await _send_json(send, 200, {"ok": True, "reply": reply, "session_id": session_id, "history": history},
+                         accept_encoding=req.headers.get('Accept-Encoding'))
+        return 200
+
+
+def _record_turn(session_id, message, reply):
+    store = flask_module.conversation_store
+    store.append(session_id, ('user', message), ('assistant', reply))
+    return store.window(session_id, store.max_turns)
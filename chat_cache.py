@@ -0,0 +1,224 @@
+"""Reply cache for the chatbot with single-flight deduplication.
+
+Keys are built from the normalized user message, the trimmed history and the
+model (plus the system prompt, so a prompt change never serves stale answers).
+Entries live in an in-process LRU with a TTL and, optionally, in a SQLite file
+shared by all worker processes on the host.
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from jsonlog import get_logger
+
+log = get_logger('ai')
+
+_WS_RE = re.compile(r'\s+')
+
+
+def normalize_message(text):
+    """Lower-case, collapse whitespace and drop trailing punctuation."""
+    text = _WS_RE.sub(' ', (text or '').strip().lower())
+    return text.rstrip(' ?!.…')
+
+
+def make_key(messages, model):
+    """Cache key for an OpenAI-style message list (last entry = user message)."""
+    if messages:
+        last = dict(messages[-1])
+        last['content'] = normalize_message(last.get('content'))
+        messages = list(messages[:-1]) + [last]
+    raw = json.dumps({'model': model, 'messages': messages}, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def prompt_fingerprint(system_prompt):
+    return hashlib.sha256((system_prompt or '').encode('utf-8')).hexdigest()[:16]
+
+
+class _Flight:
+    __slots__ = ('event', 'result')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class ReplyCache:
+    """LRU + TTL cache with an optional shared SQLite tier."""
+
+    def __init__(self, max_entries=256, ttl=3600.0, sqlite_path=None, fingerprint=None,
+                 flight_timeout=60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self.flight_timeout = flight_timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, reply)
+        self._flights = {}              # key -> _Flight
+        self._local = threading.local()
+        self._stats = {
+            'hits': 0, 'sqlite_hits': 0, 'misses': 0,
+            'stores': 0, 'evictions': 0, 'coalesced': 0, 'purges': 0,
+        }
+        if sqlite_path:
+            self._init_sqlite(fingerprint)
+
+    # --- SQLite tier ---
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, timeout=5.0)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_sqlite(self, fingerprint):
+        try:
+            db = self._db()
+            with db:
+                db.execute('CREATE TABLE IF NOT EXISTS reply_cache ('
+                           'key TEXT PRIMARY KEY, reply TEXT NOT NULL, expires_at REAL NOT NULL)')
+                db.execute('CREATE TABLE IF NOT EXISTS reply_cache_meta ('
+                           'name TEXT PRIMARY KEY, value TEXT)')
+            if fingerprint is not None:
+                row = db.execute("SELECT value FROM reply_cache_meta WHERE name = 'prompt'").fetchone()
+                if row is None or row[0] != fingerprint:
+                    # System prompt changed since the cache was filled
+                    self.purge()
+                    with db:
+                        db.execute("INSERT OR REPLACE INTO reply_cache_meta (name, value) "
+                                   "VALUES ('prompt', ?)", (fingerprint,))
+        except Exception as e:
+            log.warning("Reply cache SQLite disabled", error=e)
+            self.sqlite_path = None
+
+    def _sqlite_get(self, key):
+        if not self.sqlite_path:
+            return None
+        try:
+            row = self._db().execute(
+                'SELECT reply, expires_at FROM reply_cache WHERE key = ?', (key,)).fetchone()
+        except Exception as e:
+            log.error("Reply cache read error", error=e)
+            return None
+        if row is None or row[1] < time.time():
+            return None
+        return row
+
+    def _sqlite_put(self, key, reply, expires_at):
+        if not self.sqlite_path:
+            return
+        try:
+            db = self._db()
+            with db:
+                db.execute('INSERT OR REPLACE INTO reply_cache (key, reply, expires_at) VALUES (?, ?, ?)',
+                           (key, reply, expires_at))
+                if self._stats['stores'] % 100 == 0:
+                    db.execute('DELETE FROM reply_cache WHERE expires_at < ?', (time.time(),))
+        except Exception as e:
+            log.error("Reply cache write error", error=e)
+
+    # --- memory tier ---
+    def _mem_get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return item[1]
+
+    def _mem_put(self, key, reply, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, reply)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    # --- public API ---
+    def get(self, key):
+        reply = self._mem_get(key)
+        if reply is not None:
+            with self._lock:
+                self._stats['hits'] += 1
+            return reply
+        row = self._sqlite_get(key)
+        if row is not None:
+            self._mem_put(key, row[0], row[1])
+            with self._lock:
+                self._stats['hits'] += 1
+                self._stats['sqlite_hits'] += 1
+            return row[0]
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, reply):
+        if not reply or self.max_entries <= 0:
+            return
+        expires_at = time.time() + self.ttl
+        self._mem_put(key, reply, expires_at)
+        with self._lock:
+            self._stats['stores'] += 1
+        self._sqlite_put(key, reply, expires_at)
+
+    def get_or_compute(self, key, compute):
+        """Return a cached reply or call ``compute()`` once for all concurrent callers.
+
+        ``None`` results are not cached (e.g. upstream error) but are still
+        shared with requests that were waiting on the same flight.
+        """
+        reply = self.get(key)
+        if reply is not None:
+            return reply
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._stats['coalesced'] += 1
+        if not leader:
+            flight.event.wait(self.flight_timeout)
+            return flight.result
+        try:
+            flight.result = compute()
+            self.put(key, flight.result)
+            return flight.result
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.event.set()
+
+    def purge(self):
+        """Drop every entry (call after changing the system prompt)."""
+        with self._lock:
+            self._entries.clear()
+            self._stats['purges'] += 1
+        if self.sqlite_path:
+            try:
+                db = self._db()
+                with db:
+                    db.execute('DELETE FROM reply_cache')
+            except Exception as e:
+                log.error("Reply cache purge error", error=e)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['entries'] = len(self._entries)
+            snapshot['in_flight'] = len(self._flights)
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_ratio'] = snapshot['hits'] / lookups if lookups else None
+        return snapshot
@@ -1,22 +1,22 @@
-from chatterbot import ChatBot
-from chatterbot.trainers import ListTrainer
+import os
+import sys
 
-chatbot = ChatBot('Bot')
+from local_bot import LocalBot, DEFAULT_CONVERSATIONS, load_conversations
+from jsonlog import get_logger
 
+log = get_logger('ai')
 
-conversation = [
-    "Hello",
-    "Hi there!",
-    "How are you doing?",
-    "I'm doing great.",
-    "That is good to hear",
-    "Thank you.",
-    "You're welcome."
-]
+INDEX_PATH = os.getenv('LOCAL_BOT_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'local_bot.json'))
 
-trainer = ListTrainer(chatbot)
+chatbot = LocalBot(INDEX_PATH)
 
-trainer.train(conversation)
+conversations = DEFAULT_CONVERSATIONS
+if len(sys.argv) > 1:
+    conversations = conversations + load_conversations(sys.argv[1])
+
+# Only pairs not already in the index are processed
+added = sum(chatbot.train(conversation) for conversation in conversations)
+log.info("Local bot trained", added=added, pairs=chatbot.stats()['pairs'])
 
 response = chatbot.get_response("Good morning!")
-print(response)
\ No newline at end of file
+print(response[1] if response else "(no similar statement yet)")
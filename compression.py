@@ -0,0 +1,224 @@
+"""Negotiated response compression (brotli / gzip / identity).
+
+``Compression(app)`` registers an after_request hook that compresses text-like
+responses according to the client's ``Accept-Encoding``:
+
+* bodies under ``min_size`` bytes and non-text types (images, fonts, archives)
+  are sent as-is; responses that already carry ``Content-Encoding`` (page
+  cache, precompressed assets) or ``Cache-Control: no-transform`` are skipped;
+* the level is chosen per content type (``levels``, or ``COMPRESS_LEVELS`` like
+  ``text/html=6:5,application/json=5:4`` - gzip level : brotli quality);
+* streamed responses are compressed chunk by chunk with a sync flush after
+  every chunk, so NDJSON tokens still reach the client immediately;
+* ``Vary: Accept-Encoding`` is added whenever the body depended on the header.
+
+Bytes in/out and the CPU time spent compressing are counted per encoding
+(``stats()`` and the karlab_compression_* metrics).
+"""
+import gzip
+import threading
+import time
+import zlib
+
+from flask import request
+
+try:
+    import brotli  # type: ignore
+except Exception:  # optional dependency
+    brotli = None  # type: ignore
+
+from jsonlog import get_logger
+
+log = get_logger('http')
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/x-ndjson', 'application/javascript', 'application/xml',
+    'application/manifest+json', 'image/svg+xml',
+}
+# (gzip level, brotli quality); dynamic responses favour speed over the last few percent
+DEFAULT_LEVELS = {
+    'text/html': (6, 5),
+    'application/json': (5, 4),
+    'application/x-ndjson': (1, 1),
+    'text/csv': (6, 5),
+}
+DEFAULT_LEVEL = (6, 4)
+
+
+def parse_levels(spec):
+    """'text/html=6:5,application/json=5:4' -> {mimetype: (gzip, brotli)}."""
+    levels = {}
+    for item in (spec or '').split(','):
+        if '=' not in item:
+            continue
+        mimetype, value = item.split('=', 1)
+        gzip_level, _, br_quality = value.partition(':')
+        try:
+            levels[mimetype.strip().lower()] = (int(gzip_level), int(br_quality or gzip_level))
+        except ValueError:
+            continue
+    return levels
+
+
+def negotiate(accept_encoding, available):
+    """Best of ``available`` (in preference order) for an Accept-Encoding header, or None."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        for param in params.split(';'):
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            weights[name] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def is_compressible(mimetype):
+    mimetype = (mimetype or '').lower()
+    return mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES or mimetype.endswith('+json')
+
+
+class Compression:
+    """Response compression for a Flask app (and bodies built elsewhere, e.g. chat_asgi)."""
+
+    def __init__(self, app=None, min_size=500, levels=None, registry=None):
+        self.min_size = min_size
+        self.levels = dict(DEFAULT_LEVELS)
+        self.levels.update(levels or {})
+        self.registry = registry
+        self.encodings = ('br', 'gzip') if brotli is not None else ('gzip',)
+        self.enabled = True
+        self._lock = threading.Lock()
+        self._stats = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.after_request(self._after_request)
+
+    # --- encoders ---
+    def _level(self, mimetype, encoding):
+        gzip_level, br_quality = self.levels.get((mimetype or '').lower(), DEFAULT_LEVEL)
+        return br_quality if encoding == 'br' else gzip_level
+
+    def _record(self, encoding, size_in, size_out, cpu, responses=0):
+        with self._lock:
+            row = self._stats.setdefault(encoding, {'responses': 0, 'bytes_in': 0, 'bytes_out': 0,
+                                                    'cpu_seconds': 0.0})
+            row['responses'] += responses
+            row['bytes_in'] += size_in
+            row['bytes_out'] += size_out
+            row['cpu_seconds'] += cpu
+        if self.registry is not None:
+            self.registry.inc('karlab_compression_bytes_total', size_in, encoding=encoding, direction='in')
+            self.registry.inc('karlab_compression_bytes_total', size_out, encoding=encoding, direction='out')
+            self.registry.inc('karlab_compression_cpu_seconds_total', cpu, encoding=encoding)
+
+    def compress(self, data, encoding, mimetype):
+        level = self._level(mimetype, encoding)
+        started = time.thread_time()
+        if encoding == 'br':
+            out = brotli.compress(data, quality=level)
+        else:
+            out = gzip.compress(data, compresslevel=level, mtime=0)
+        self._record(encoding, len(data), len(out), time.thread_time() - started, responses=1)
+        return out
+
+    def compress_stream(self, chunks, encoding, mimetype):
+        """Compress an iterable of chunks, flushing after each so nothing is held back."""
+        level = self._level(mimetype, encoding)
+        if encoding == 'br':
+            compressor = brotli.Compressor(quality=level)
+            process, flush, finish = compressor.process, compressor.flush, compressor.finish
+        else:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+            process, finish = compressor.compress, compressor.flush
+
+            def flush():
+                return compressor.flush(zlib.Z_SYNC_FLUSH)
+
+        responses = 1
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                if not chunk:
+                    continue
+                started = time.thread_time()
+                out = process(chunk) + flush()
+                self._record(encoding, len(chunk), len(out), time.thread_time() - started, responses)
+                responses = 0
+                yield out
+            started = time.thread_time()
+            out = finish()
+            self._record(encoding, 0, len(out), time.thread_time() - started, responses)
+            yield out
+        finally:
+            close = getattr(chunks, 'close', None)
+            if close is not None:
+                close()
+
+    def encode(self, data, mimetype, accept_encoding):
+        """(body, extra headers) for an already built body; used outside Flask (ASGI)."""
+        if not self.enabled or len(data) < self.min_size or not is_compressible(mimetype):
+            return data, []
+        encoding = negotiate(accept_encoding, self.encodings)
+        if encoding is None:
+            return data, [('Vary', 'Accept-Encoding')]
+        return self.compress(data, encoding, mimetype), [('Content-Encoding', encoding),
+                                                         ('Vary', 'Accept-Encoding')]
+
+    # --- Flask hook ---
+    def _after_request(self, response):
+        if not self.enabled or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return response
+        if not is_compressible(response.mimetype):
+            return response
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return response
+        streamed = response.is_streamed
+        if not streamed and len(response.get_data()) < self.min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate(request.headers.get('Accept-Encoding'), self.encodings)
+        if encoding is None:
+            return response
+        try:
+            if streamed:
+                response.response = self.compress_stream(response.response, encoding, response.mimetype)
+                response.headers.pop('Content-Length', None)
+            else:
+                response.set_data(self.compress(response.get_data(), encoding, response.mimetype))
+        except Exception as e:
+            log.error("Compression error", error=e)
+            return response
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag:
+            response.set_etag(f'{etag}-{"br" if encoding == "br" else "gz"}', weak)
+        return response
+
+    def stats(self):
+        with self._lock:
+            snapshot = {encoding: dict(row) for encoding, row in self._stats.items()}
+        for row in snapshot.values():
+            row['ratio'] = row['bytes_out'] / row['bytes_in'] if row['bytes_in'] else None
+            mb = row['bytes_in'] / 1e6
+            row['cpu_ms_per_mb'] = row['cpu_seconds'] * 1000 / mb if mb else None
+        return snapshot
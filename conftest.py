@@ -0,0 +1,16 @@
+import os
+
+import pytest
+
+import css_index
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+STYLESHEET = os.path.join(ROOT, 'static', 'styles.css')
+
+
+@pytest.fixture(scope='session')
+def css():
+    """static/styles.css parsed once (see css_index.py)."""
+    if not os.path.exists(STYLESHEET):
+        pytest.skip('static/styles.css not found')
+    return css_index.load(STYLESHEET)
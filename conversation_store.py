@@ -0,0 +1,247 @@
+"""Server-side conversation store for the chatbot.
+
+Conversations are kept per session ID as a bounded list of compact
+``(role, content)`` tuples. With ``sqlite_path`` (the default in app.py) the
+SQLite file is the source of truth and is read on every access, so every
+worker process sees the same history; the in-memory LRU is then only a
+fallback for when the file cannot be read. The browser only has to send the
+new message and its session ID.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from jsonlog import get_logger
+
+log = get_logger('ai')
+
+_ROLES = ('user', 'assistant')
+
+
+class ConversationStore:
+    """Bounded per-session turn history (memory LRU + optional SQLite)."""
+
+    def __init__(self, max_sessions=2000, max_turns=20, max_chars=2000, ttl=86400.0,
+                 sqlite_path=None, prune_every=500):
+        self.max_sessions = max_sessions
+        self.max_turns = max_turns
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._db_writes = 0
+        self._sessions = OrderedDict()   # session_id -> (touched_at, deque[(role, content)])
+        self._local = threading.local()
+        if sqlite_path:
+            self._init_sqlite()
+
+    # --- SQLite tier ---
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            # isolation_level=None: no implicit BEGIN, transactions are explicit below
+            conn = sqlite3.connect(self.sqlite_path, timeout=5.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @contextmanager
+    def _transaction(self, conn):
+        # IMMEDIATE takes the write lock up front, so a concurrent append waits for
+        # this read-modify-write instead of reading the row before it is rewritten
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def _init_sqlite(self):
+        try:
+            db = self._db()
+            with self._transaction(db):
+                db.execute('CREATE TABLE IF NOT EXISTS conversations ('
+                           'session_id TEXT PRIMARY KEY, turns TEXT NOT NULL, updated_at REAL NOT NULL)')
+            self._prune()
+        except Exception as e:
+            log.warning("Conversation store SQLite disabled", error=e)
+            self.sqlite_path = None
+
+    def _prune(self):
+        db = self._db()
+        with self._transaction(db):
+            deleted = db.execute('DELETE FROM conversations WHERE updated_at < ?',
+                                 (time.time() - self.ttl,)).rowcount
+        if deleted:
+            log.info("Pruned expired conversations", count=deleted)
+        return deleted
+
+    def _maybe_prune(self):
+        with self._lock:
+            self._db_writes += 1
+            due = self.prune_every and self._db_writes % self.prune_every == 0
+        if due:
+            try:
+                self._prune()
+            except Exception as e:
+                log.error("Conversation prune error", error=e)
+
+    def _sqlite_load(self, session_id):
+        if not self.sqlite_path:
+            return None
+        try:
+            row = self._db().execute(
+                'SELECT turns, updated_at FROM conversations WHERE session_id = ?',
+                (session_id,)).fetchone()
+        except Exception as e:
+            log.error("Conversation read error", error=e)
+            return None
+        return self._row_turns(row)
+
+    def _row_turns(self, row):
+        if row is None or row[1] < time.time() - self.ttl:
+            return None
+        return deque((tuple(t) for t in json.loads(row[0])), maxlen=self.max_turns)
+
+    def _sqlite_save(self, session_id, turns):
+        if not self.sqlite_path:
+            return
+        try:
+            db = self._db()
+            with self._transaction(db):
+                db.execute('INSERT OR REPLACE INTO conversations (session_id, turns, updated_at) '
+                           'VALUES (?, ?, ?)',
+                           (session_id, json.dumps(list(turns), ensure_ascii=False), time.time()))
+        except Exception as e:
+            log.error("Conversation write error", error=e)
+            return
+        self._maybe_prune()
+
+    def _sqlite_append(self, session_id, new_turns):
+        """Append to the stored row in one write transaction; the new turns, or None if SQLite failed."""
+        if not self.sqlite_path:
+            return None
+        try:
+            db = self._db()
+            with self._transaction(db):
+                row = db.execute('SELECT turns, updated_at FROM conversations WHERE session_id = ?',
+                                 (session_id,)).fetchone()
+                turns = self._row_turns(row) or deque(maxlen=self.max_turns)
+                turns.extend(new_turns)
+                db.execute('INSERT OR REPLACE INTO conversations (session_id, turns, updated_at) '
+                           'VALUES (?, ?, ?)',
+                           (session_id, json.dumps(list(turns), ensure_ascii=False), time.time()))
+        except Exception as e:
+            log.error("Conversation write error", error=e)
+            return None
+        self._maybe_prune()
+        return turns
+
+    # --- helpers ---
+    @staticmethod
+    def new_session_id():
+        return secrets.token_urlsafe(16)
+
+    @staticmethod
+    def is_valid_session_id(session_id):
+        return isinstance(session_id, str) and 8 <= len(session_id) <= 64 and \
+            all(c.isalnum() or c in '-_' for c in session_id)
+
+    def _compact(self, role, content):
+        if role not in _ROLES or not isinstance(content, str):
+            return None
+        return (role, content[:self.max_chars])
+
+    def _turns(self, session_id):
+        """Return the live deque for a session (caller must hold the lock)."""
+        item = self._sessions.get(session_id)
+        now = time.time()
+        if item is not None and item[0] >= now - self.ttl:
+            self._sessions[session_id] = (now, item[1])
+            self._sessions.move_to_end(session_id)
+            return item[1]
+        return None
+
+    def _load(self, session_id):
+        """Current turns for a session: the shared SQLite row, else this process's copy."""
+        turns = self._sqlite_load(session_id)
+        with self._lock:
+            if turns is not None:
+                self._remember(session_id, turns)
+                return turns
+            return self._turns(session_id)
+
+    def _remember(self, session_id, turns):
+        self._sessions[session_id] = (time.time(), turns)
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    # --- public API ---
+    def window(self, session_id, size=8):
+        """Last ``size`` turns as [[role, content], ...] (oldest first)."""
+        turns = self._load(session_id)
+        if turns is None:
+            return []
+        with self._lock:
+            items = list(turns)[-size:] if size else list(turns)
+        return [[role, content] for role, content in items]
+
+    def has(self, session_id):
+        return bool(self.window(session_id, 1))
+
+    def seed(self, session_id, history):
+        """Import a client-side [[role, content], ...] history (legacy clients)."""
+        turns = deque(maxlen=self.max_turns)
+        try:
+            for role, content in history[-self.max_turns:]:
+                turn = self._compact(role, content)
+                if turn:
+                    turns.append(turn)
+        except Exception:
+            return
+        if not turns:
+            return
+        with self._lock:
+            self._remember(session_id, turns)
+        self._sqlite_save(session_id, turns)
+
+    def append(self, session_id, *pairs):
+        """Append (role, content) pairs and persist the session."""
+        new_turns = [turn for turn in (self._compact(role, content) for role, content in pairs) if turn]
+        # read-modify-write of the shared row, so appends from other workers aren't lost
+        stored = self._sqlite_append(session_id, new_turns)
+        with self._lock:
+            if stored is not None:
+                self._remember(session_id, stored)
+                return
+            turns = self._turns(session_id)
+            if turns is None:
+                turns = deque(maxlen=self.max_turns)
+                self._remember(session_id, turns)
+            turns.extend(new_turns)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        if self.sqlite_path:
+            try:
+                db = self._db()
+                with self._transaction(db):
+                    db.execute('DELETE FROM conversations WHERE session_id = ?', (session_id,))
+            except Exception as e:
+                log.error("Conversation delete error", error=e)
+
+    def stats(self):
+        with self._lock:
+            return {'sessions': len(self._sessions), 'max_sessions': self.max_sessions,
+                    'max_turns': self.max_turns}
@@ -0,0 +1,419 @@
+"""Per-page critical CSS: inline what a page uses, load the full sheets async.
+
+Build (after editing templates or stylesheets):
+
+    flask build-critical-css
+
+renders every page-cached route, collects the elements it contains and keeps
+the rules of styles.css / dark.css whose selectors can match one of them
+(both data-theme variants, all @media blocks; dynamic pseudo-classes such as
+``:hover`` are assumed to match). Results go to ``static/dist/critical.json``
+keyed by a hash of the page's templates and the stylesheets, so unchanged
+pages are skipped on the next build.
+
+At runtime ``CriticalCSS.apply()`` (a page_cache postprocess step, so it runs
+once per cached page) puts the subset in a ``<style>`` block and turns the
+blocking ``<link rel="stylesheet">`` tags into ``rel="preload"`` ones that
+switch to stylesheets on load. An entry whose key no longer matches the
+current templates and stylesheets (deployed without rebuilding) is skipped,
+so the page falls back to the normal blocking links.
+"""
+import hashlib
+import json
+import os
+import re
+from html.parser import HTMLParser
+
+import css_index
+from jsonlog import get_logger
+
+log = get_logger('assets')
+
+DEFAULT_SHEETS = ('styles.css', 'dark.css')
+CACHE_NAME = 'critical.json'
+CACHE_VERSION = 1
+
+_VOID_TAGS = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta',
+              'param', 'source', 'track', 'wbr'}
+# Assumed to match: they depend on state, position or arguments we don't evaluate
+_UNCONSTRAINED_PSEUDO = re.compile(r'::?[\w-]+(\((?:[^()]|\([^()]*\))*\))?')
+_COMPOUND_RE = re.compile(r'(\*|[a-zA-Z][\w-]*)|#([\w-]+)|\.([\w-]+)|'
+                          r'\[\s*([\w-]+)\s*(?:([~|^$*]?=)\s*["\']?([^"\'\]]*)["\']?\s*)?\]')
+_LINK_RE = re.compile(rb'<link\b[^>]*>', re.I)
+_ATTR_RE = re.compile(rb'([\w-]+)\s*=\s*("([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+
+
+# --- page DOM ---
+class _Node:
+    __slots__ = ('tag', 'id', 'classes', 'attrs', 'parent')
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = {k: (v or '') for k, v in attrs}
+        self.id = self.attrs.get('id')
+        self.classes = frozenset(self.attrs.get('class', '').split())
+        self.parent = parent
+
+
+class _DOMBuilder(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.nodes = []
+        self._stack = []
+
+    def handle_starttag(self, tag, attrs):
+        node = _Node(tag, attrs, self._stack[-1] if self._stack else None)
+        self.nodes.append(node)
+        if tag not in _VOID_TAGS:
+            self._stack.append(node)
+
+    def handle_startendtag(self, tag, attrs):
+        self.nodes.append(_Node(tag, attrs, self._stack[-1] if self._stack else None))
+
+    def handle_endtag(self, tag):
+        for i in range(len(self._stack) - 1, -1, -1):
+            if self._stack[i].tag == tag:
+                del self._stack[i:]
+                return
+
+
+class PageDOM:
+    """Elements of one rendered page, plus tag/class/id sets for quick rejects."""
+
+    def __init__(self, html):
+        builder = _DOMBuilder()
+        builder.feed(html)
+        builder.close()
+        self.nodes = builder.nodes
+        self.tags = {n.tag for n in self.nodes}
+        self.ids = {n.id for n in self.nodes if n.id}
+        self.classes = set().union(*(n.classes for n in self.nodes)) if self.nodes else set()
+
+
+# --- selector matching ---
+def _parse_compound(compound):
+    """Compound selector -> (tag, id, classes, attrs) or None if it can never match."""
+    compound = _UNCONSTRAINED_PSEUDO.sub(lambda m: '' if m.group(0) != ':root' else 'html', compound)
+    tag, ident, classes, attrs = None, None, set(), []
+    for m in _COMPOUND_RE.finditer(compound):
+        if m.group(1):
+            tag = None if m.group(1) == '*' else m.group(1).lower()
+        elif m.group(2):
+            ident = m.group(2)
+        elif m.group(3):
+            classes.add(m.group(3))
+        elif m.group(4):
+            if m.group(4) == 'data-theme':
+                continue  # set on <html> by darkmode.js - keep both themes
+            attrs.append((m.group(4), m.group(5), m.group(6)))
+    return tag, ident, frozenset(classes), tuple(attrs)
+
+
+def _attr_ok(value, op, expected):
+    if value is None:
+        return False
+    if op is None:
+        return True
+    if op == '=':
+        return value == expected
+    if op == '~=':
+        return expected in value.split()
+    if op == '|=':
+        return value == expected or value.startswith(expected + '-')
+    if op == '^=':
+        return value.startswith(expected)
+    if op == '$=':
+        return value.endswith(expected)
+    return expected in value  # *=
+
+
+def _node_matches(node, compound):
+    tag, ident, classes, attrs = compound
+    if tag is not None and node.tag != tag:
+        return False
+    if ident is not None and node.id != ident:
+        return False
+    if classes and not classes <= node.classes:
+        return False
+    return all(_attr_ok(node.attrs.get(name), op, value) for name, op, value in attrs)
+
+
+def _split_selector(selector):
+    """'a > b c' -> [(compound, combinator-to-the-left), ...] right to left."""
+    parts = css_index.compounds(selector)
+    tokens = [t for t in css_index._split_top_level(selector, ' ') if t]
+    combinators, last = [], ' '
+    for token in tokens:
+        if token in ('>', '+', '~'):
+            last = token
+        else:
+            combinators.append(last)
+            last = ' '
+    return list(zip(reversed([_parse_compound(p) for p in parts]), reversed(combinators)))
+
+
+def _match_from(node, chain, i):
+    compound, combinator = chain[i]
+    if not _node_matches(node, compound):
+        return False
+    if i + 1 == len(chain):
+        return True
+    if combinator == '>':
+        return node.parent is not None and _match_from(node.parent, chain, i + 1)
+    if combinator in ('+', '~'):
+        return True  # siblings aren't tracked - keep the rule
+    parent = node.parent
+    while parent is not None:
+        if _match_from(parent, chain, i + 1):
+            return True
+        parent = parent.parent
+    return False
+
+
+def selector_matches(selector, dom):
+    """True if ``selector`` (normalized) can match an element of ``dom``."""
+    try:
+        chain = _split_selector(selector)
+    except Exception:
+        return True  # unparseable - keep it
+    if not chain:
+        return True
+    tag, ident, classes, _ = chain[0][0]
+    if (tag is not None and tag not in dom.tags) or (ident is not None and ident not in dom.ids) \
+            or not classes <= dom.classes:
+        return False
+    return any(_match_from(node, chain, 0) for node in dom.nodes)
+
+
+# --- extraction ---
+def _declarations_text(declarations):
+    return ';'.join(f"{d.property}:{d.value}{'!important' if d.important else ''}" for d in declarations)
+
+
+def extract(sheet, dom):
+    """Critical CSS text for ``dom`` from a parsed css_index.Stylesheet."""
+    out, open_media = [], ()
+    for rule in sheet.rules:
+        texts = [s.text for s in rule.selectors]
+        if texts[0].startswith('@'):
+            if not texts[0].lower().startswith('@font-face'):
+                continue
+            selectors = texts[:1]
+        else:
+            selectors = [t for t in texts if selector_matches(t, dom)]
+            if not selectors:
+                continue
+        if rule.media != open_media:
+            out.append('}' * len(open_media))
+            out.extend(f'{m}{{' for m in rule.media)
+            open_media = rule.media
+        out.append(f"{','.join(selectors)}{{{_declarations_text(rule.declarations)}}}")
+    out.append('}' * len(open_media))
+    return ''.join(out)
+
+
+def _template_closure(env, names):
+    """Source text of the given templates and everything they extend/include/import."""
+    from jinja2 import meta
+    seen, sources, pending = set(), [], list(names)
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        try:
+            source = env.loader.get_source(env, name)[0]
+        except Exception:
+            continue
+        sources.append(f'{name}\0{source}')
+        try:
+            pending.extend(n for n in meta.find_referenced_templates(env.parse(source)) if n)
+        except Exception:
+            pass
+    return sorted(sources)
+
+
+def _cache_key(env, templates, sheet_data):
+    digest = hashlib.sha256(f'v{CACHE_VERSION}'.encode())
+    for source in _template_closure(env, templates):
+        digest.update(source.encode('utf-8'))
+    for name in sorted(sheet_data):
+        digest.update(name.encode() + b'\0' + sheet_data[name])
+    return digest.hexdigest()
+
+
+def _read_sheets(static_dir, sheets):
+    """{name: bytes} for the stylesheets that exist."""
+    sheet_data = {}
+    for name in sheets:
+        path = os.path.join(static_dir, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                sheet_data[name] = f.read()
+    return sheet_data
+
+
+def build(app, routes, render, static_dir=None, sheets=DEFAULT_SHEETS, force=False):
+    """Compute critical CSS for ``routes``; ``render(route)`` -> (html, [template names]).
+
+    Returns {route: entry} and writes static/dist/critical.json.
+    """
+    from assets import DIST_DIR
+    static_dir = static_dir or app.static_folder
+    out_path = os.path.join(static_dir, DIST_DIR, CACHE_NAME)
+    try:
+        with open(out_path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (FileNotFoundError, ValueError):
+        cache = {}
+
+    sheet_data = _read_sheets(static_dir, sheets)
+    parsed = {name: css_index.load(os.path.join(static_dir, name)) for name in sheet_data}
+    if not parsed:
+        log.warning("Critical CSS: no stylesheets found")
+        return cache
+
+    full_bytes = sum(len(data) for data in sheet_data.values())
+    result = {}
+    for route in routes:
+        previous = cache.get(route)
+        if previous and not force and previous.get('key') == _cache_key(app.jinja_env, previous['templates'],
+                                                                         sheet_data):
+            result[route] = previous
+            log.info("Critical CSS unchanged", route=route)
+            continue
+        html, templates = render(route)
+        if html is None:
+            log.warning("Critical CSS render failed, skipped", route=route)
+            continue
+        dom = PageDOM(html)
+        css = ''.join(extract(parsed[name], dom) for name in sheets if name in parsed)
+        entry = {
+            'key': _cache_key(app.jinja_env, templates, sheet_data),
+            'templates': sorted(set(templates)),
+            'sheets': sorted(parsed),
+            'css': css,
+            'full_bytes': full_bytes,
+            'critical_bytes': len(css.encode('utf-8')),
+        }
+        result[route] = entry
+        saved = entry['full_bytes'] - entry['critical_bytes']
+        log.info("Critical CSS built", route=route, inline_bytes=entry['critical_bytes'],
+                 saved_bytes=saved, saved_ratio=round(saved / full_bytes, 3))
+
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    tmp = out_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, out_path)
+    return result
+
+
+# --- runtime ---
+def _preload_tag(tag):
+    """``<link rel="stylesheet" ...>`` -> async preload link with the tag's other attributes.
+
+    media, integrity, crossorigin, id etc. are kept, so a print sheet stays print-only
+    once onload turns it into a stylesheet.
+    """
+    parts = [b'<link rel="preload" as="style"']
+    parts.extend(b' ' + m.group(0) for m in _ATTR_RE.finditer(tag)
+                 if m.group(1).lower() not in (b'rel', b'as', b'onload'))
+    parts.append(b' onload="this.onload=null;this.rel=\'stylesheet\'">')
+    return b''.join(parts)
+
+
+class CriticalCSS:
+    """Inlines built critical CSS and defers the full stylesheets."""
+
+    def __init__(self, app=None, manifest=None, sheets=DEFAULT_SHEETS):
+        self.manifest = manifest
+        self.sheets = sheets
+        self.entries = {}
+        self.enabled = True
+        self.static_dir = None
+        self.static_url_path = '/static'
+        self.jinja_env = None
+        self._stale = set()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.static_dir = app.static_folder
+        self.static_url_path = app.static_url_path
+        self.jinja_env = app.jinja_env
+        self.load()
+
+    def load(self):
+        from assets import DIST_DIR
+        path = os.path.join(self.static_dir or '', DIST_DIR, CACHE_NAME)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        except Exception as e:
+            log.error("Critical CSS load error", error=e)
+            self.entries = {}
+        self._stale = set()
+        return self.entries
+
+    def is_current(self, path, entry):
+        """True if ``entry`` was built from the templates and stylesheets on disk now."""
+        if self.jinja_env is None:
+            return True
+        try:
+            key = _cache_key(self.jinja_env, entry.get('templates', ()), _read_sheets(self.static_dir, self.sheets))
+        except Exception as e:
+            log.error("Critical CSS key error", route=path, error=e)
+            return False
+        if key == entry.get('key'):
+            return True
+        if path not in self._stale:
+            self._stale.add(path)
+            log.warning("Critical CSS out of date, not inlined (run flask build-critical-css)", route=path)
+        return False
+
+    def _hrefs(self):
+        hrefs = set()
+        for name in self.sheets:
+            hrefs.add(f'{self.static_url_path}/{name}')
+            if self.manifest is not None:
+                hrefs.add(self.manifest.url(name, self.static_url_path))
+        return {h.encode('utf-8') for h in hrefs}
+
+    def rewrite(self, body, css):
+        """Inline ``css`` before the first deferred stylesheet link."""
+        hrefs = self._hrefs()
+        out, last, inlined = [], 0, False
+        for match in _LINK_RE.finditer(body):
+            tag = match.group(0)
+            attrs = {m.group(1).lower(): (m.group(3) or m.group(4) or m.group(5) or b'')
+                     for m in _ATTR_RE.finditer(tag)}
+            href = attrs.get(b'href', b'').split(b'?', 1)[0]
+            if attrs.get(b'rel', b'').lower() != b'stylesheet' or href not in hrefs:
+                continue
+            out.append(body[last:match.start()])
+            if not inlined:
+                # '</' inside a CSS string or comment would otherwise end the <style> element
+                safe = css.replace('</', '<\\/').encode('utf-8')
+                out.append(b'<style id="critical-css">' + safe + b'</style>\n')
+                inlined = True
+            out.append(_preload_tag(tag) + b'<noscript>' + tag + b'</noscript>')
+            last = match.end()
+        if not inlined:
+            return body
+        out.append(body[last:])
+        return b''.join(out)
+
+    def apply(self, body, path=None):
+        """page_cache postprocess hook: rewrite ``body`` for the current request path."""
+        if not self.enabled or not self.entries:
+            return body
+        if path is None:
+            from flask import request
+            path = request.path
+        entry = self.entries.get(path)
+        if not entry or not entry.get('css') or not self.is_current(path, entry):
+            return body
+        return self.rewrite(body, entry['css'])
@@ -0,0 +1,415 @@
+"""Single-pass CSS rule index used by the stylesheet checks (test_*.py).
+
+``load(path)`` parses a stylesheet once - comments, strings, nested
+``@media``/``@supports`` blocks and selector lists included - and caches the
+result by file mtime. The index answers questions like "which declarations
+set ``background`` on ``.filar-card:hover`` in dark mode" or "what does the
+cascade pick for ``.filar-card::before { display }`` in light mode"
+without re-reading or regex-scanning the file:
+
+    sheet = css_index.load('static/styles.css')
+    for selector, decl in sheet.declarations('.filar-card:hover', 'background', theme='dark'):
+        assert sheet.is_opaque(decl.value, theme='dark'), selector.text
+"""
+import os
+import re
+import threading
+from collections import namedtuple
+
+THEMES = ('light', 'dark')
+
+Declaration = namedtuple('Declaration', 'property value important')
+Rule = namedtuple('Rule', 'selectors declarations media line order')
+# theme: 'dark' / 'light' for rules under [data-theme=...], None for both
+Selector = namedtuple('Selector', 'text subject theme specificity')
+
+_GROUP_AT_RULES = ('@media', '@supports', '@layer', '@container', '@document')
+_DECLARATION_AT_RULES = ('@font-face', '@page', '@property')
+_WS_RE = re.compile(r'\s+')
+_THEME_RE = re.compile(r'\[\s*data-theme\s*=\s*["\']?(light|dark)["\']?\s*\]')
+_IMPORTANT_RE = re.compile(r'!\s*important\s*$', re.I)
+_VAR_RE = re.compile(r'var\(\s*(--[\w-]+)\s*(?:,\s*([^()]*(?:\([^()]*\)[^()]*)*))?\)')
+_FUNC_COLOR_RE = re.compile(r'\b(rgba?|hsla?)\(([^()]*)\)', re.I)
+_HEX_RE = re.compile(r'#([0-9a-f]{3,8})\b', re.I)
+_SPEC_ID_RE = re.compile(r'#[\w-]+')
+_SPEC_CLASS_RE = re.compile(r'\.[\w-]+|\[[^\]]*\]|(?<!:):(?!:)[\w-]+')
+_SPEC_TYPE_RE = re.compile(r'(?:^|(?<=[\s>+~(]))[a-zA-Z][\w-]*|::[\w-]+')
+_LEGACY_PSEUDO_ELEMENTS = (':before', ':after', ':first-line', ':first-letter')
+_NESTING_RE = re.compile(r'[()\[\]"\']')
+_SPECIAL_RE = re.compile(r'/\*|[{};"\'()\[\]\\\n]')
+# CSS named colors (all opaque; 'transparent' is handled separately)
+_NAMED_COLORS = frozenset('''
+aliceblue antiquewhite aqua aquamarine azure beige bisque black blanchedalmond blue blueviolet brown
+burlywood cadetblue chartreuse chocolate coral cornflowerblue cornsilk crimson cyan darkblue
+darkcyan darkgoldenrod darkgray darkgreen darkgrey darkkhaki darkmagenta darkolivegreen darkorange
+darkorchid darkred darksalmon darkseagreen darkslateblue darkslategray darkslategrey darkturquoise
+darkviolet deeppink deepskyblue dimgray dimgrey dodgerblue firebrick floralwhite forestgreen fuchsia
+gainsboro ghostwhite gold goldenrod gray green greenyellow grey honeydew hotpink indianred indigo
+ivory khaki lavender lavenderblush lawngreen lemonchiffon lightblue lightcoral lightcyan
+lightgoldenrodyellow lightgray lightgreen lightgrey lightpink lightsalmon lightseagreen lightskyblue
+lightslategray lightslategrey lightsteelblue lightyellow lime limegreen linen magenta maroon
+mediumaquamarine mediumblue mediumorchid mediumpurple mediumseagreen mediumslateblue
+mediumspringgreen mediumturquoise mediumvioletred midnightblue mintcream mistyrose moccasin
+navajowhite navy oldlace olive olivedrab orange orangered orchid palegoldenrod palegreen
+paleturquoise palevioletred papayawhip peachpuff peru pink plum powderblue purple rebeccapurple red
+rosybrown royalblue saddlebrown salmon sandybrown seagreen seashell sienna silver skyblue slateblue
+slategray slategrey snow springgreen steelblue tan teal thistle tomato turquoise violet wheat white
+whitesmoke yellow yellowgreen
+'''.split())
+_WORD_RE = re.compile(r'(?<![\w#.-])[a-z]+(?![\w(-])', re.I)
+_URL_RE = re.compile(r'url\([^()]*\)', re.I)
+
+
+# --- selectors ---
+def _split_top_level(text, sep):
+    """Split on ``sep`` outside (), [] and strings."""
+    if not _NESTING_RE.search(text):
+        return text.split(sep)
+    parts, buf, depth, quote = [], [], 0, None
+    for ch in text:
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in '"\'':
+            quote = ch
+        elif ch in '([':
+            depth += 1
+        elif ch in ')]':
+            depth -= 1
+        elif ch == sep and depth == 0:
+            parts.append(''.join(buf))
+            buf = []
+            continue
+        buf.append(ch)
+    parts.append(''.join(buf))
+    return parts
+
+
+def normalize_selector(text):
+    """Collapse whitespace, space out combinators and use double quotes in attributes."""
+    text = _WS_RE.sub(' ', text.strip())
+    text = re.sub(r'\s*([>+~])\s*(?![^\[]*\])', r' \1 ', text)
+    text = re.sub(r"\[([^\]=]+)=\s*'([^']*)'\s*\]", r'[\1="\2"]', text)
+    text = re.sub(r'\[([^\]="\']+)=([^\]"\']+)\]', r'[\1="\2"]', text)
+    for legacy in _LEGACY_PSEUDO_ELEMENTS:
+        text = re.sub(re.escape(legacy) + r'\b', ':' + legacy, text)
+    return text.replace(':::', '::')
+
+
+def compounds(selector):
+    """Compound selectors of a normalized selector, combinators dropped."""
+    return [part for part in _split_top_level(selector, ' ') if part and part not in '>+~']
+
+
+def specificity(selector):
+    ids = len(_SPEC_ID_RE.findall(selector))
+    stripped = _SPEC_ID_RE.sub('', selector)
+    classes = len(_SPEC_CLASS_RE.findall(stripped))
+    types = len([t for t in _SPEC_TYPE_RE.findall(_SPEC_CLASS_RE.sub(' ', stripped)) if t != '*'])
+    return ids, classes, types
+
+
+def _selector(text):
+    text = normalize_selector(text)
+    parts = compounds(text)
+    subject = parts[-1] if parts else text
+    theme = None
+    for part in parts:
+        match = _THEME_RE.search(part)
+        if match:
+            theme = match.group(1)
+    # the theme attribute is scoping, not part of the element being styled
+    return Selector(text, _subject_key(_THEME_RE.sub('', subject)), theme, specificity(text))
+
+
+def _subject_key(compound):
+    return ':root' if compound in ('', 'html', ':root') else compound
+
+
+# --- declarations ---
+def parse_declarations(block):
+    out = []
+    for chunk in _split_top_level(block, ';'):
+        prop, sep, value = chunk.partition(':')
+        if not sep:
+            continue
+        prop = prop.strip().lower() if not prop.strip().startswith('--') else prop.strip()
+        value = _WS_RE.sub(' ', value.strip())
+        important = bool(_IMPORTANT_RE.search(value))
+        if important:
+            value = _IMPORTANT_RE.sub('', value).strip()
+        if prop:
+            out.append(Declaration(prop, value, important))
+    return tuple(out)
+
+
+# --- parser ---
+class _Parser:
+    def __init__(self, text):
+        self.text = text
+        self.pos = 0
+        self.line = 1
+        self.comments = []
+        self.rules = []
+
+    def _skip_comment(self):
+        end = self.text.find('*/', self.pos + 2)
+        end = len(self.text) if end < 0 else end + 2
+        comment = self.text[self.pos:end]
+        self.comments.append(comment[2:-2].strip())
+        self.line += comment.count('\n')
+        self.pos = end
+
+    def _read_until(self, stops):
+        """Read up to one of ``stops`` at depth 0, skipping comments and strings."""
+        text, buf, depth, quote = self.text, [], 0, None
+        while True:
+            match = _SPECIAL_RE.search(text, self.pos)
+            if match is None:
+                buf.append(text[self.pos:])
+                self.line += text.count('\n', self.pos)
+                self.pos = len(text)
+                return ''.join(buf), None
+            i, ch = match.start(), match.group()
+            buf.append(text[self.pos:i])
+            self.pos = i
+            if ch == '\n':
+                self.line += 1
+            elif quote:
+                if ch == '\\':
+                    buf.append(text[i:i + 2])
+                    self.pos += 2
+                    continue
+                if ch == quote:
+                    quote = None
+            elif ch == '/*':
+                self._skip_comment()
+                continue
+            elif ch in '"\'':
+                quote = ch
+            elif ch in '([':
+                depth += 1
+            elif ch in ')]':
+                depth = max(0, depth - 1)
+            elif depth == 0 and ch in stops:
+                return ''.join(buf), ch
+            buf.append(ch)
+            self.pos += len(ch)
+
+    def _skip_block(self):
+        """Skip to the ``}`` closing the block whose ``{`` was just consumed."""
+        depth = 1
+        while depth:
+            _, stop = self._read_until('{}')
+            if stop is None:
+                return
+            self.pos += 1
+            depth += 1 if stop == '{' else -1
+
+    def _block_body(self):
+        """Declaration text of the current block; nested blocks are skipped."""
+        parts = []
+        while True:
+            chunk, stop = self._read_until('{}')
+            if stop is None:
+                parts.append(chunk)
+                return ''.join(parts)
+            self.pos += 1
+            if stop == '}':
+                parts.append(chunk)
+                return ''.join(parts)
+            # nested rule (CSS nesting) - not indexed; keep the declarations before it
+            head, _, _ = chunk.rpartition(';')
+            parts.append(head + ';')
+            self._skip_block()
+
+    def parse(self, media=()):
+        text = self.text
+        while True:
+            # skip whitespace and comments so ``line`` points at the selector
+            while self.pos < len(text):
+                if text[self.pos].isspace():
+                    self.line += text[self.pos] == '\n'
+                    self.pos += 1
+                elif text.startswith('/*', self.pos):
+                    self._skip_comment()
+                else:
+                    break
+            start_line = self.line
+            prelude, stop = self._read_until('{};')
+            prelude = prelude.strip()
+            if stop is None:
+                return
+            self.pos += 1
+            if stop == '}':
+                return  # end of the enclosing group rule
+            if stop == ';':
+                continue  # @import / @charset / stray semicolon
+            lowered = prelude.lower()
+            if lowered.startswith(_GROUP_AT_RULES):
+                self.parse(media + (_WS_RE.sub(' ', prelude),))
+            elif lowered.startswith('@'):
+                if lowered.startswith(_DECLARATION_AT_RULES):
+                    declarations = parse_declarations(self._block_body())
+                    self.rules.append(Rule((_selector(prelude),), declarations, media, start_line,
+                                           len(self.rules)))
+                else:
+                    self._skip_block()  # @keyframes etc.
+            else:
+                declarations = parse_declarations(self._block_body())
+                selectors = tuple(_selector(s) for s in _split_top_level(prelude, ',') if s.strip())
+                if selectors:
+                    self.rules.append(Rule(selectors, declarations, media, start_line, len(self.rules)))
+
+
+# --- colors ---
+def _alpha(token):
+    token = token.strip()
+    if token.endswith('%'):
+        return float(token[:-1]) / 100
+    return float(token)
+
+
+def color_alphas(value):
+    """Alpha of every color in ``value`` (1.0 for opaque ones)."""
+    alphas = []
+    for func, args in _FUNC_COLOR_RE.findall(value):
+        if '/' in args:
+            alphas.append(_alpha(args.rsplit('/', 1)[1]))
+        else:
+            parts = [a for a in re.split(r'[\s,]+', args.strip()) if a]
+            alphas.append(_alpha(parts[3]) if len(parts) == 4 else 1.0)
+    for digits in _HEX_RE.findall(value):
+        if len(digits) == 4:
+            alphas.append(int(digits[3] * 2, 16) / 255)
+        elif len(digits) == 8:
+            alphas.append(int(digits[6:], 16) / 255)
+        elif len(digits) in (3, 6):
+            alphas.append(1.0)
+    for word in _WORD_RE.findall(_URL_RE.sub(' ', value)):
+        word = word.lower()
+        if word in _NAMED_COLORS:
+            alphas.append(1.0)
+        elif word == 'transparent':
+            alphas.append(0.0)
+    return alphas
+
+
+# --- index ---
+class Stylesheet:
+    def __init__(self, rules, comments):
+        self.rules = rules
+        self.comments = comments
+        self._by_subject = {}
+        self._by_text = {}
+        for rule in rules:
+            for selector in rule.selectors:
+                self._by_subject.setdefault(selector.subject, []).append((selector, rule))
+                self._by_text.setdefault(selector.text, []).append(rule)
+
+    @property
+    def selectors(self):
+        return [selector for rule in self.rules for selector in rule.selectors]
+
+    def has_selector(self, text):
+        return normalize_selector(text) in self._by_text
+
+    def rules_for(self, subject, theme=None, media=False, within=None):
+        """(selector, rule) pairs whose subject compound is ``subject``.
+
+        ``theme`` keeps unscoped rules plus those under that data-theme;
+        ``media=True`` also includes rules inside @media/@supports blocks;
+        ``within`` keeps selectors with that compound among the ancestors
+        (``within='.profile-content'`` for ``.profile-content h1``).
+        """
+        subject = _subject_key(normalize_selector(subject))
+        within = normalize_selector(within) if within else None
+        out = []
+        for selector, rule in self._by_subject.get(subject, ()):
+            if theme is not None and selector.theme not in (None, theme):
+                continue
+            if rule.media and not media:
+                continue
+            if within is not None and within not in compounds(selector.text)[:-1]:
+                continue
+            out.append((selector, rule))
+        return out
+
+    def declarations(self, subject, prop, theme=None, media=False, within=None):
+        """Every (selector, declaration) setting ``prop`` on ``subject``, in source order."""
+        prop = prop.lower()
+        return [(selector, decl)
+                for selector, rule in self.rules_for(subject, theme, media, within)
+                for decl in rule.declarations if decl.property == prop]
+
+    def cascade(self, subject, prop, theme, media=False, within=None):
+        """The (selector, declaration) that wins for ``subject`` in ``theme``, or None.
+
+        Only rules whose subject is exactly ``subject`` compete, so this is
+        the value for an element matched by those selectors' ancestors.
+        """
+        best, best_key = None, None
+        for selector, rule in self.rules_for(subject, theme, media, within):
+            for decl in rule.declarations:
+                if decl.property != prop.lower():
+                    continue
+                key = (decl.important, selector.specificity, rule.order)
+                if best_key is None or key >= best_key:
+                    best, best_key = (selector, decl), key
+        return best
+
+    def variables(self, theme):
+        """Custom properties visible on the root element in ``theme``."""
+        scopes = sorted((selector.specificity, rule.order, rule.declarations)
+                        for selector, rule in self.rules_for(':root', theme))
+        found = {}
+        for _, _, declarations in scopes:
+            for decl in declarations:
+                if decl.property.startswith('--'):
+                    found[decl.property] = decl.value
+        return found
+
+    def resolve(self, value, theme, _depth=0):
+        """Substitute var(--x) with the root value for ``theme`` (fallbacks honoured)."""
+        if 'var(' not in value or _depth > 10:
+            return value
+        variables = self.variables(theme)
+
+        def _sub(match):
+            return variables.get(match.group(1), match.group(2) or '')
+
+        return self.resolve(_VAR_RE.sub(_sub, value), theme, _depth + 1)
+
+    def is_opaque(self, value, theme):
+        """True if every color in ``value`` (after var() resolution) is fully opaque."""
+        value = self.resolve(value, theme)
+        if re.fullmatch(r'\s*(none|transparent|initial|unset|inherit)?\s*', value, re.I):
+            return False
+        alphas = color_alphas(value)
+        return bool(alphas) and min(alphas) >= 1.0
+
+
+def parse(text):
+    parser = _Parser(text)
+    parser.parse()
+    return Stylesheet(parser.rules, parser.comments)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load(path):
+    """Parsed stylesheet for ``path``, re-parsed only when the file changes."""
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    with open(path, 'r', encoding='utf-8') as f:
+        sheet = parse(f.read())
+    with _cache_lock:
+        _cache[path] = (signature, sheet)
+    return sheet
@@ -0,0 +1,226 @@
+"""Thread-safe connection pool used by app.py for PostgreSQL access.
+
+The pool is driver-agnostic: it receives a ``connect`` callable (in app.py this
+is ``get_db_connection``) and manages the returned DB-API connections.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from jsonlog import get_logger
+
+log = get_logger('db')
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection could be checked out within the timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of DB-API connections.
+
+    - keeps between ``min_size`` and ``max_size`` connections,
+    - validates a connection on checkout (``SELECT 1``) and replaces broken ones,
+    - retires connections older than ``max_lifetime`` seconds,
+    - counts checkouts, wait time and how often the pool was exhausted.
+    """
+
+    def __init__(self, connect, min_size=1, max_size=10, timeout=5.0,
+                 max_lifetime=1800.0, health_check=True):
+        if max_size < 1:
+            raise ValueError("max_size must be >= 1")
+        self._connect = connect
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.health_check = health_check
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(conn, created_at), ...] - LIFO
+        self._created_at = {}    # id(conn) -> created_at for checked-out conns
+        self._size = 0           # idle + checked out
+        self._closed = False
+
+        self._stats = {
+            'checkouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'failed_connects': 0,
+            'exhausted': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+        self._prefill()
+
+    # --- internals ---
+    def _prefill(self):
+        for _ in range(self.min_size):
+            conn = self._new_connection()
+            if conn is None:
+                break
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._size += 1
+
+    def _new_connection(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            log.error("Pool connect error", error=e)
+            conn = None
+        with self._cond:
+            if conn is None:
+                self._stats['failed_connects'] += 1
+            else:
+                self._stats['created'] += 1
+        return conn
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, created_at):
+        return bool(self.max_lifetime) and time.monotonic() - created_at > self.max_lifetime
+
+    def _is_healthy(self, conn):
+        if getattr(conn, 'closed', 0):
+            return False
+        if not self.health_check:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute('SELECT 1')
+                cur.fetchone()
+            # SELECT 1 opens an implicit transaction in psycopg2 - end it
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._cond:
+            self._size -= 1
+            self._stats['discarded'] += 1
+            self._cond.notify()
+
+    # --- public API ---
+    def getconn(self):
+        """Check out a healthy connection; raise PoolExhausted on timeout."""
+        start = time.monotonic()
+        deadline = start + self.timeout
+        counted_exhausted = False
+        while True:
+            conn = None
+            created_at = None
+            reserve = False
+            with self._cond:
+                if self._closed:
+                    raise PoolExhausted("pool is closed")
+                while not self._idle and self._size >= self.max_size:
+                    if not counted_exhausted:
+                        self._stats['exhausted'] += 1
+                        counted_exhausted = True
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._record_wait(time.monotonic() - start)
+                        raise PoolExhausted(
+                            f"no connection available within {self.timeout}s")
+                    self._cond.wait(remaining)
+                if self._idle:
+                    conn, created_at = self._idle.pop()
+                else:
+                    # reserve a slot and connect outside the lock
+                    self._size += 1
+                    reserve = True
+
+            if reserve:
+                conn = self._new_connection()
+                if conn is None:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    self._record_wait(time.monotonic() - start)
+                    raise PoolExhausted("could not open a new connection")
+                created_at = time.monotonic()
+            elif self._is_expired(created_at) or not self._is_healthy(conn):
+                self._discard(conn)
+                continue
+
+            with self._cond:
+                self._created_at[id(conn)] = created_at
+                self._stats['checkouts'] += 1
+                self._record_wait(time.monotonic() - start)
+            return conn
+
+    def _record_wait(self, waited):
+        # caller may or may not hold the lock; Condition is re-entrant (RLock)
+        with self._cond:
+            self._stats['wait_time_total'] += waited
+            if waited > self._stats['wait_time_max']:
+                self._stats['wait_time_max'] = waited
+
+    def putconn(self, conn, discard=False):
+        """Return a connection to the pool (or close it if broken/expired)."""
+        with self._cond:
+            created_at = self._created_at.pop(id(conn), None)
+        if created_at is None:
+            # not ours - just close it
+            self._close_quietly(conn)
+            return
+        if not discard:
+            try:
+                # never hand out a connection in the middle of a transaction
+                if not getattr(conn, 'closed', 0):
+                    conn.rollback()
+            except Exception:
+                discard = True
+        if discard or self._closed or getattr(conn, 'closed', 0) or self._is_expired(created_at):
+            self._discard(conn)
+            return
+        with self._cond:
+            self._idle.append((conn, created_at))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager: check out a connection and always give it back."""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = bool(getattr(conn, 'closed', 0))
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def closeall(self):
+        """Close idle connections and refuse new checkouts."""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        """Return a snapshot of pool counters."""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update({
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._size - len(self._idle),
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+            })
+        checkouts = snapshot['checkouts'] or 1
+        snapshot['wait_time_avg'] = snapshot['wait_time_total'] / checkouts
+        return snapshot
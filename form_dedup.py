@@ -0,0 +1,126 @@
+"""Duplicate-submission suppression for the contact and inquiry forms.
+
+Each form render gets a random hidden token (``form_token_field()``). On POST
+``SubmissionGuard.claim()`` derives the keys of the submission:
+
+* ``t:<form>:<token>`` - the token, valid for ``token_ttl`` seconds, catches
+  double clicks and browser retries of the same rendered form;
+* ``h:<form>:<sha256(email, description)>`` - content fallback, valid for
+  ``content_window`` seconds, catches reposts without (or with a new) token.
+
+Keys are checked against a bounded in-memory index first (no I/O for the
+common repeat), then claimed in the ``form_submissions`` table through the
+storage backend (storage.py), whose primary key makes the claim atomic across
+workers. A claim that fails because the database is down is allowed - the
+in-memory index still covers this process.
+"""
+import hashlib
+import re
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from storage import StorageUnavailable
+from jsonlog import get_logger
+
+log = get_logger('db')
+
+TOKEN_FIELD = 'form_token'
+_TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+_WS_RE = re.compile(r'\s+')
+
+
+def new_token():
+    return secrets.token_urlsafe(18)
+
+
+def content_hash(email, description):
+    """Hash of the fields that identify a submission (case/whitespace-insensitive)."""
+    email = (email or '').strip().lower()
+    description = _WS_RE.sub(' ', (description or '').strip()).lower()
+    return hashlib.sha256(f'{email}\0{description}'.encode('utf-8')).hexdigest()
+
+
+def submission_keys(form, token, email, description, token_ttl, content_window):
+    """[(key, window_seconds)] for one submission; malformed tokens are ignored."""
+    keys = []
+    if token and _TOKEN_RE.match(token):
+        keys.append((f't:{form}:{token}', token_ttl))
+    keys.append((f'h:{form}:{content_hash(email, description)}', content_window))
+    return keys
+
+
+class SubmissionGuard:
+    """Bounded TTL index of recent submission keys, backed by form_submissions."""
+
+    def __init__(self, storage=None, token_ttl=86400.0, content_window=600.0,
+                 max_entries=10000, prune_every=500):
+        self.storage = storage
+        self.token_ttl = token_ttl
+        self.content_window = content_window
+        self.max_entries = max(1, max_entries)
+        self.prune_every = prune_every
+        self._lock = threading.Lock()
+        self._seen = OrderedDict()  # key -> expiry (monotonic), oldest first
+        self._db_claims = 0
+        self._stats = {'accepted': 0, 'duplicates': 0, 'db_duplicates': 0, 'db_errors': 0}
+
+    def _evict(self, now):
+        while self._seen:
+            key, expires = next(iter(self._seen.items()))
+            if expires > now and len(self._seen) <= self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+    def _remember(self, keys, now):
+        for key, window in keys:
+            self._seen.pop(key, None)
+            self._seen[key] = now + window
+        self._evict(now)
+
+    def claim(self, form, token, email, description):
+        """True if this is a new submission (and record it), False for a repeat."""
+        keys = submission_keys(form, token, email, description, self.token_ttl, self.content_window)
+        now = time.monotonic()
+        with self._lock:
+            if any(self._seen.get(key, 0) > now for key, _ in keys):
+                self._stats['duplicates'] += 1
+                return False
+            # reserve before the DB round trip so a concurrent repeat here is rejected without I/O
+            self._remember(keys, now)
+
+        if self.storage is not None:
+            try:
+                if not self.storage.claim_submission(keys, form):
+                    with self._lock:
+                        self._stats['duplicates'] += 1
+                        self._stats['db_duplicates'] += 1
+                    return False
+                self._maybe_prune()
+            except StorageUnavailable:
+                with self._lock:
+                    self._stats['db_errors'] += 1
+            except Exception as e:
+                with self._lock:
+                    self._stats['db_errors'] += 1
+                log.error("Submission claim error", error=e)
+
+        with self._lock:
+            self._stats['accepted'] += 1
+        return True
+
+    def _maybe_prune(self):
+        with self._lock:
+            self._db_claims += 1
+            due = self.prune_every and self._db_claims % self.prune_every == 0
+        if due:
+            deleted = self.storage.prune_submissions(max(self.token_ttl, self.content_window))
+            if deleted:
+                log.info("Pruned expired form submission claims", count=deleted)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['entries'] = len(self._seen)
+        return snapshot
@@ -0,0 +1,123 @@
+"""Read-side queries over ``inquiries``: keyset pagination and streaming export.
+
+Pages are ordered by ``(created_at, id)`` descending and continued with an
+opaque cursor, so every page is an index range scan regardless of depth
+(the indexes come from migration 2 in migrations.py). Exports read through
+a named (server-side) cursor and never hold more than ``itersize`` rows in
+memory.
+"""
+import base64
+import csv
+import io
+import json
+from datetime import datetime
+
+EXPORT_COLUMNS = (
+    'id', 'created_at', 'name', 'email', 'company', 'business_needs', 'service_type',
+    'budget_range', 'timeline', 'project_description', 'additional_info', 'client_ip', 'user_agent',
+)
+
+FILTERS = ('service_type', 'budget_range', 'email')
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at, row_id):
+    raw = f'{created_at.isoformat()}|{row_id}'.encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, row_id = base64.urlsafe_b64decode(padded).decode('utf-8').split('|', 1)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise InvalidCursor("invalid cursor")
+
+
+def _where(filters, cursor=None, param='%s', timestamp=None):
+    clauses, params = [], []
+    for key in FILTERS:
+        value = (filters.get(key) or '').strip()
+        if not value:
+            continue
+        if key == 'email':
+            clauses.append(f'lower(email) = lower({param})')
+        else:
+            clauses.append(f'{key} = {param}')
+        params.append(value)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        clauses.append(f'(created_at, id) < ({param}, {param})')
+        params.extend((timestamp(created_at) if timestamp else created_at, row_id))
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+def _to_json(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def page_query(filters, cursor=None, limit=50, param='%s', timestamp=None):
+    """(sql, params) for one page; ``param``/``timestamp`` adapt it to other drivers."""
+    where, params = _where(filters, cursor, param, timestamp)
+    sql = (f"SELECT {', '.join(EXPORT_COLUMNS)} FROM inquiries{where} "
+           f"ORDER BY created_at DESC, id DESC LIMIT {param}")
+    return sql, params + [limit + 1]
+
+
+def export_query(filters, param='%s'):
+    where, params = _where(filters, param=param)
+    sql = (f"SELECT {', '.join(EXPORT_COLUMNS)} FROM inquiries{where} "
+           "ORDER BY created_at DESC, id DESC")
+    return sql, params
+
+
+def page_result(rows, limit):
+    """(items, next_cursor) from the ``limit + 1`` rows fetched by page_query."""
+    more = len(rows) > limit
+    rows = rows[:limit]
+    items = [{col: _to_json(val) for col, val in zip(EXPORT_COLUMNS, row)} for row in rows]
+    next_cursor = encode_cursor(rows[-1][1], rows[-1][0]) if more else None
+    return items, next_cursor
+
+
+def fetch_page(conn, filters, cursor=None, limit=50):
+    """Return (items, next_cursor) for one page."""
+    sql, params = page_query(filters, cursor, limit)
+    with conn, conn.cursor() as cur:
+        cur.execute(sql, params)
+        rows = cur.fetchall()
+    return page_result(rows, limit)
+
+
+def iter_rows(conn, filters, itersize=2000):
+    """Yield rows from a named server-side cursor (constant memory)."""
+    sql, params = export_query(filters)
+    with conn:
+        with conn.cursor(name='inquiries_export') as cur:
+            cur.itersize = itersize
+            cur.execute(sql, params)
+            for row in cur:
+                yield row
+
+
+def iter_csv(rows):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for i, row in enumerate(rows, 1):
+        writer.writerow([_to_json(v) for v in row])
+        if i % 500 == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue()
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps({col: _to_json(val) for col, val in zip(EXPORT_COLUMNS, row)},
+                         ensure_ascii=False) + '\n'
@@ -0,0 +1,213 @@
+"""Write-behind buffer for ``inquiries`` rows.
+
+``InquiryWriter.add(row)`` appends the row to a local append-only journal
+segment and returns. A background thread flushes buffered rows with one
+multi-row INSERT per batch (``storage.insert_inquiries``), when either
+``batch_size`` rows are waiting or ``flush_interval`` seconds have passed. A segment is
+deleted only after its rows are committed. Segments left by a crashed
+process are replayed on startup.
+"""
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except Exception:  # non-POSIX
+    fcntl = None
+
+from metrics import timed
+from jsonlog import get_logger
+
+log = get_logger('db')
+
+INQUIRY_COLUMNS = (
+    'name', 'email', 'company', 'business_needs', 'service_type', 'budget_range',
+    'timeline', 'project_description', 'additional_info', 'client_ip', 'user_agent',
+)
+
+
+class InquiryWriter:
+    """Journaled, batched INSERT INTO inquiries."""
+
+    def __init__(self, storage, journal_dir, batch_size=50, flush_interval=1.0,
+                 fsync=True, max_backoff=60.0):
+        self.storage = storage  # storage.Storage
+        self.journal_dir = journal_dir
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()
+        self._pid = None
+        self._thread = None
+        self._segment = None        # open file of the current segment
+        self._segment_path = None
+        self._segment_rows = []     # rows written to the current segment
+        self._sealed = []           # [(path, rows)] waiting to be flushed
+        self._seq = 0
+        self._stats = {
+            'queued': 0, 'flushed': 0, 'batches': 0, 'failures': 0, 'replayed': 0,
+            'flush_time_total': 0.0, 'flush_time_max': 0.0, 'flush_time_last': None,
+        }
+
+    # --- journal segments ---
+    def _open_segment(self):
+        self._seq += 1
+        name = f'inquiries-{os.getpid()}-{int(time.time() * 1000)}-{self._seq}.jsonl'
+        self._segment_path = os.path.join(self.journal_dir, name)
+        self._segment = open(self._segment_path, 'a', encoding='utf-8')
+        if fcntl is not None:
+            # held for the segment's lifetime so replay in other processes skips it
+            fcntl.flock(self._segment.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        self._segment_rows = []
+
+    def _seal_segment(self):
+        """Move the current segment to the flush list (caller holds the lock)."""
+        if self._segment is None or not self._segment_rows:
+            return
+        self._sealed.append((self._segment_path, self._segment_rows, self._segment))
+        self._segment = None
+        self._segment_path = None
+        self._segment_rows = []
+
+    def _replay(self):
+        """Pick up segments left behind by crashed processes."""
+        try:
+            names = sorted(os.listdir(self.journal_dir))
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.journal_dir, name)
+            if path == self._segment_path:
+                continue
+            try:
+                f = open(path, 'r+', encoding='utf-8')
+            except FileNotFoundError:
+                continue
+            if fcntl is not None:
+                try:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    f.close()  # owned by a live process
+                    continue
+            rows = []
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rows.append(tuple(json.loads(line)))
+                except ValueError:
+                    break  # torn last write
+            if not rows:
+                f.close()
+                os.remove(path)
+                continue
+            with self._lock:
+                self._sealed.append((path, rows, f))
+                self._stats['replayed'] += len(rows)
+            log.info("Replaying journaled inquiries", rows=len(rows), segment=name)
+
+    # --- lifecycle ---
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._segment = None
+            self._segment_path = None
+            self._segment_rows = []
+            self._sealed = []
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self._replay()
+        self._thread = threading.Thread(target=self._run, name='inquiry-writer', daemon=True)
+        self._thread.start()
+
+    def add(self, row):
+        """Journal one row (tuple in INQUIRY_COLUMNS order) and buffer it."""
+        self.start()
+        line = json.dumps(list(row), ensure_ascii=False) + '\n'
+        with self._lock:
+            if self._segment is None:
+                self._open_segment()
+            self._segment.write(line)
+            self._segment.flush()
+            if self.fsync:
+                os.fsync(self._segment.fileno())
+            self._segment_rows.append(tuple(row))
+            self._stats['queued'] += 1
+            if len(self._segment_rows) >= self.batch_size:
+                self._wakeup.notify()
+
+    def flush(self):
+        """Flush everything buffered now (also used at exit)."""
+        with self._lock:
+            self._seal_segment()
+        return self._flush_sealed()
+
+    # --- flushing ---
+    def _run(self):
+        backoff = self.flush_interval
+        while True:
+            with self._lock:
+                self._wakeup.wait(backoff)
+                self._seal_segment()
+                pending = bool(self._sealed)
+            if not pending:
+                backoff = self.flush_interval
+                continue
+            if self._flush_sealed():
+                backoff = self.flush_interval
+            else:
+                backoff = min(self.max_backoff, max(backoff, 0.5) * 2)
+
+    def _flush_sealed(self):
+        with self._flush_lock:
+            with self._lock:
+                sealed = list(self._sealed)
+            if not sealed:
+                return True
+            rows = [row for _, seg_rows, _ in sealed for row in seg_rows]
+            started = time.perf_counter()
+            try:
+                with timed('db_insert'):
+                    self.storage.insert_inquiries(rows)
+            except Exception as e:
+                with self._lock:
+                    self._stats['failures'] += 1
+                log.error("Insert error", error=e, rows=len(rows))
+                return False
+            elapsed = time.perf_counter() - started
+            for path, _, f in sealed:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                try:
+                    f.close()
+                except Exception:
+                    pass
+            with self._lock:
+                del self._sealed[:len(sealed)]
+                self._stats['flushed'] += len(rows)
+                self._stats['batches'] += 1
+                self._stats['flush_time_total'] += elapsed
+                self._stats['flush_time_last'] = elapsed
+                if elapsed > self._stats['flush_time_max']:
+                    self._stats['flush_time_max'] = elapsed
+            return True
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['buffered'] = len(self._segment_rows) + sum(len(r) for _, r, _ in self._sealed)
+        batches = snapshot['batches']
+        snapshot['flush_time_avg'] = snapshot['flush_time_total'] / batches if batches else None
+        return snapshot
@@ -0,0 +1,264 @@
+"""Non-blocking JSON logging.
+
+    log = get_logger('db')
+    log.error("Insert error", error=e, rows=len(rows))
+
+The calling thread only checks the category's level and sample rate and puts a
+tuple on a bounded queue; a background thread redacts, serializes and writes
+one JSON object per line (stdout, or ``LOG_FILE``). A full queue drops records
+instead of blocking, and the drop count is logged once there is room again.
+
+Records carry ``ts``, ``level``, ``category``, ``msg``, ``pid``, the current
+``request_id`` (see ``bind_request_id``) and any keyword fields. Email
+addresses and IP addresses in the message and string fields are replaced with
+``[email]`` / ``[ip]`` unless ``LOG_REDACT=0``.
+
+Configuration (environment, read when the writer starts):
+
+    LOG_LEVEL=info                 default level
+    LOG_LEVELS=ai=debug,db=warning per-category levels
+    LOG_SAMPLE=inquiry=0.1         keep this fraction of a category's records
+                                   (errors are always kept)
+    LOG_QUEUE_SIZE=10000
+"""
+import atexit
+import contextvars
+import ipaddress
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+LEVELS = {'debug': 10, 'info': 20, 'warning': 30, 'error': 40}
+
+_EMAIL_RE = re.compile(r'[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}')
+_IPV4_RE = re.compile(r'(?<![\w.])(?:\d{1,3}\.){3}\d{1,3}(?![\w.])')
+# candidates only; _ipv6() keeps those that parse as IPv6 and look like a real
+# address (a 3-4 digit group or all 8 groups), so 'a::b', '12::' or 12:30:45 stay
+_IPV6_RE = re.compile(r'(?<![\w:])(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4}(?![\w:])')
+_IPV6_GROUP_RE = re.compile(r'[0-9A-Fa-f]{3,4}')
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+
+def _ipv6(match):
+    text = match.group()
+    try:
+        ipaddress.IPv6Address(text)
+    except ValueError:
+        return text
+    return '[ip]' if _IPV6_GROUP_RE.search(text) or text.count(':') == 7 else text
+
+
+def redact(text):
+    text = _EMAIL_RE.sub('[email]', text)
+    text = _IPV4_RE.sub('[ip]', text)
+    return _IPV6_RE.sub(_ipv6, text) if '::' in text or text.count(':') >= 7 else text
+
+
+def _redact_value(value):
+    """Redact strings inside a field value; numbers, keys and structure are left alone."""
+    if isinstance(value, str):
+        return redact(value)
+    if isinstance(value, dict):
+        return {key: _redact_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_redact_value(item) for item in value]
+    return value
+
+
+def _parse_mapping(spec, convert):
+    out = {}
+    for item in (spec or '').split(','):
+        key, _, value = item.partition('=')
+        if key.strip() and value.strip():
+            try:
+                out[key.strip().lower()] = convert(value.strip().lower())
+            except (KeyError, ValueError):
+                continue
+    return out
+
+
+def bind_request_id(incoming=None):
+    """Set the request ID for the current context (reusing a sane incoming one)."""
+    request_id = incoming if incoming and _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+class _Writer:
+    """Process-wide queue + background thread (restarted after fork)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stream = None
+        self.default_level = LEVELS['info']
+        self.levels = {}
+        self.samples = {}
+        self.redact = True
+        self._stats_lock = threading.Lock()
+        self._dropped = 0
+        self._stats = {'queued': 0, 'written': 0, 'dropped': 0, 'sampled_out': 0, 'write_errors': 0}
+
+    def count(self, key, amount=1):
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats)
+
+    def configure(self):
+        self.default_level = LEVELS.get(os.getenv('LOG_LEVEL', 'info').lower(), LEVELS['info'])
+        self.levels = _parse_mapping(os.getenv('LOG_LEVELS'), lambda v: LEVELS[v])
+        self.samples = _parse_mapping(os.getenv('LOG_SAMPLE'), float)
+        self.redact = os.getenv('LOG_REDACT', '1') != '0'
+        path = os.getenv('LOG_FILE')
+        self._stream = open(path, 'a', encoding='utf-8', buffering=1) if path else sys.stdout
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self.configure()
+            self._queue = queue.Queue(maxsize=int(os.getenv('LOG_QUEUE_SIZE', '10000')))
+            self._thread = threading.Thread(target=self._run, name='jsonlog-writer', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def enabled(self, category, level):
+        self.ensure_started()
+        return level >= self.levels.get(category, self.default_level)
+
+    def put(self, record):
+        try:
+            self._queue.put_nowait(record)
+            self.count('queued')
+        except queue.Full:
+            with self._stats_lock:
+                self._stats['dropped'] += 1
+                self._dropped += 1
+
+    # --- background thread ---
+    def _format(self, record):
+        ts, level, category, msg, request_id, fields = record
+        out = {
+            'ts': datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': level,
+            'category': category,
+            'msg': _redact_value(msg) if self.redact else msg,
+            'pid': self._pid,
+        }
+        if request_id:
+            out['request_id'] = request_id
+        for key, value in fields.items():
+            if isinstance(value, BaseException):
+                value = f'{type(value).__name__}: {value}'
+            elif not isinstance(value, (str, int, float, bool, type(None), dict, list, tuple)):
+                value = str(value)
+            out[key] = _redact_value(value) if self.redact else value
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            lines = []
+            for record in batch:
+                try:
+                    lines.append(self._format(record))
+                except Exception as e:
+                    lines.append(json.dumps({'level': 'error', 'category': 'log',
+                                             'msg': f'Unserializable record: {e}'}))
+            with self._stats_lock:
+                dropped, self._dropped = self._dropped, 0
+            if dropped:
+                lines.append(self._format((time.time(), 'warning', 'log', 'Log queue full, records dropped',
+                                           None, {'count': dropped})))
+            try:
+                if lines:
+                    self._stream.write('\n'.join(lines) + '\n')
+                    self._stream.flush()
+                    self.count('written', len(lines))
+            except Exception:
+                self.count('write_errors')
+            for _ in batch:
+                self._queue.task_done()
+
+    def flush(self, timeout=2.0):
+        """Wait (bounded) until queued records are written; used at exit and by CLIs."""
+        if self._pid != os.getpid():
+            return
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+
+_writer = _Writer()
+atexit.register(_writer.flush)
+
+
+class Logger:
+    __slots__ = ('category',)
+
+    def __init__(self, category):
+        self.category = category
+
+    def _log(self, level, msg, fields):
+        if not _writer.enabled(self.category, LEVELS[level]):
+            return
+        rate = _writer.samples.get(self.category)
+        if rate is not None and level != 'error':
+            if random.random() >= rate:
+                _writer.count('sampled_out')
+                return
+            fields['sample_rate'] = rate
+        _writer.put((time.time(), level, self.category, msg, request_id_var.get(), fields))
+
+    def debug(self, msg, **fields):
+        self._log('debug', msg, fields)
+
+    def info(self, msg, **fields):
+        self._log('info', msg, fields)
+
+    def warning(self, msg, **fields):
+        self._log('warning', msg, fields)
+
+    def error(self, msg, **fields):
+        self._log('error', msg, fields)
+
+
+_loggers = {}
+
+
+def get_logger(category):
+    logger = _loggers.get(category)
+    if logger is None:
+        logger = _loggers.setdefault(category, Logger(category))
+    return logger
+
+
+def flush(timeout=2.0):
+    _writer.flush(timeout)
+
+
+def stats():
+    snapshot = _writer.stats()
+    snapshot['pending'] = _writer._queue.qsize() if _writer._queue is not None else 0
+    return snapshot
@@ -0,0 +1,205 @@
+"""Local statement -> response engine used when the AI upstream is unavailable.
+
+Replaces the ChatterBot setup in chatbotr.py, which re-trained on every run.
+Training is incremental: each (statement, response) pair is keyed by a hash
+and only unseen pairs are added. The lookup index (normalized statements,
+token sets and an inverted token index) is precomputed at training time and
+saved to one JSON file, so ``LocalBot.load()`` is a single read and a reply is
+a dict lookup or a small posting-list intersection.
+
+    python3 chatbotr.py [conversations.json]     # or: flask train-local-bot
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from site_index import tokenize
+from chat_cache import normalize_message
+from jsonlog import get_logger
+
+log = get_logger('ai')
+
+INDEX_VERSION = 1
+
+# The conversation chatbotr.py used to train from scratch on every run
+DEFAULT_CONVERSATIONS = [
+    [
+        "Hello",
+        "Hi there!",
+        "How are you doing?",
+        "I'm doing great.",
+        "That is good to hear",
+        "Thank you.",
+        "You're welcome."
+    ],
+]
+
+
+def pair_key(statement, response):
+    raw = f"{normalize_message(statement)}\x00{response.strip()}".encode('utf-8')
+    return hashlib.sha1(raw).hexdigest()
+
+
+def load_conversations(path):
+    """Read conversations from JSON ([[str, ...], ...]) or plain text (blank line between conversations)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith('.json'):
+        data = json.loads(text)
+        if data and all(isinstance(line, str) for line in data):
+            data = [data]  # a single conversation
+        return [[str(line) for line in conv] for conv in data]
+    conversations, current = [], []
+    for line in text.splitlines():
+        line = line.strip()
+        if line:
+            current.append(line)
+        elif current:
+            conversations.append(current)
+            current = []
+    if current:
+        conversations.append(current)
+    return conversations
+
+
+class _Index:
+    """Immutable lookup structures; replaced as a whole after training."""
+
+    def __init__(self, statements=(), responses=(), tokens=(), keys=()):
+        self.statements = list(statements)
+        self.responses = list(responses)
+        self.tokens = [frozenset(t) for t in tokens]
+        self.keys = set(keys)
+        self.exact = {}
+        self.postings = {}
+        for i, statement in enumerate(self.statements):
+            self.exact[normalize_message(statement)] = i  # latest pair wins
+            for tok in self.tokens[i]:
+                self.postings.setdefault(tok, []).append(i)
+
+
+class LocalBot:
+    """Incrementally trained, persisted fallback bot; safe to share between threads."""
+
+    def __init__(self, path, min_similarity=0.5, check_interval=30.0):
+        self.path = path
+        self.min_similarity = min_similarity
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._index = _Index()
+        self._mtime = None
+        self._last_check = 0.0
+        self._stats = {'hits': 0, 'misses': 0}
+
+    # --- persistence ---
+    def load(self):
+        """(Re)load the index file if it changed; returns the number of pairs."""
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except OSError:
+            return len(self._index.statements)
+        if mtime == self._mtime:
+            return len(self._index.statements)
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') != INDEX_VERSION:
+                raise ValueError(f"unsupported index version {data.get('version')}")
+            index = _Index(data['statements'], data['responses'], data['tokens'], data['keys'])
+        except Exception as e:
+            log.error("Local bot load error", error=e)
+            return len(self._index.statements)
+        with self._lock:
+            self._index = index
+            self._mtime = mtime
+        return len(index.statements)
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self.load()
+
+    def save(self):
+        index = self._index
+        data = {
+            'version': INDEX_VERSION,
+            'statements': index.statements,
+            'responses': index.responses,
+            'tokens': [sorted(t) for t in index.tokens],
+            'keys': sorted(index.keys),
+        }
+        tmp = f'{self.path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+        self._mtime = os.stat(self.path).st_mtime
+
+    # --- training ---
+    def train(self, conversation, save=True):
+        """Add each consecutive (statement, response) pair not seen before; returns how many were new."""
+        self.load()
+        with self._lock:
+            old = self._index
+            statements, responses = list(old.statements), list(old.responses)
+            tokens, keys = list(old.tokens), set(old.keys)
+            added = 0
+            for statement, response in zip(conversation, conversation[1:]):
+                statement, response = statement.strip(), response.strip()
+                if not statement or not response:
+                    continue
+                key = pair_key(statement, response)
+                if key in keys:
+                    continue
+                keys.add(key)
+                statements.append(statement)
+                responses.append(response)
+                tokens.append(tokenize(statement))
+                added += 1
+            if added:
+                self._index = _Index(statements, responses, tokens, keys)
+        if added and save:
+            self.save()
+        return added
+
+    # --- lookup ---
+    def get_response(self, text):
+        """Return (similarity, response) for the closest known statement, or None."""
+        index = self._index
+        i = index.exact.get(normalize_message(text))
+        if i is not None:
+            return 1.0, index.responses[i]
+        query = frozenset(tokenize(text))
+        if not query:
+            return None
+        overlap = {}
+        for tok in query:
+            for i in index.postings.get(tok, ()):
+                overlap[i] = overlap.get(i, 0) + 1
+        best, best_score = None, 0.0
+        for i, shared in overlap.items():
+            score = shared / (len(query) + len(index.tokens[i]) - shared)  # Jaccard
+            if score > best_score:
+                best, best_score = i, score
+        if best is None:
+            return None
+        return best_score, index.responses[best]
+
+    def reply(self, text):
+        """Response if it is similar enough to a trained statement, else None."""
+        self._maybe_reload()
+        match = self.get_response(text)
+        hit = match is not None and match[0] >= self.min_similarity
+        with self._lock:
+            self._stats['hits' if hit else 'misses'] += 1
+        return match[1] if hit else None
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot['pairs'] = len(self._index.statements)
+        return snapshot
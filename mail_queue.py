@@ -0,0 +1,338 @@
+"""Background mail dispatcher used by app.py.
+
+``MailDispatcher.submit(msg)`` journals a ``flask_mail.Message`` to a local
+spool directory, puts it on a bounded queue and returns immediately. Worker
+threads drain the queue in batches and send each batch over a single
+``mail.connect()`` SMTP session. A message the server rejects for good (5xx,
+refused recipients) or that cannot be built is moved to ``failed/``; a
+temporary rejection (4xx) retries just that message with exponential backoff,
+and only connection-level errors retry the rest of the batch. ``start()``
+replays whatever was left in the spool by a previous run.
+"""
+import json
+import os
+import queue
+import smtplib
+import threading
+import time
+import uuid
+
+from flask_mail import Message
+
+from metrics import timed
+from jsonlog import get_logger
+
+log = get_logger('mail')
+
+# Message attributes persisted in the journal
+_FIELDS = ('subject', 'sender', 'recipients', 'body', 'html', 'cc', 'bcc',
+           'reply_to', 'charset', 'extra_headers')
+
+
+def message_to_dict(msg):
+    data = {}
+    for field in _FIELDS:
+        value = getattr(msg, field, None)
+        if value is not None:
+            data[field] = list(value) if isinstance(value, tuple) else value
+    return data
+
+
+def message_from_dict(data):
+    kwargs = dict(data)
+    sender = kwargs.get('sender')
+    if isinstance(sender, list):
+        kwargs['sender'] = tuple(sender)  # (name, address)
+    return Message(**kwargs)
+
+
+# Errors that say nothing about the message itself: retry the whole batch
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, smtplib.SMTPHeloError,
+                      smtplib.SMTPAuthenticationError, smtplib.SMTPNotSupportedError, smtplib.SMTPSenderRefused)
+
+
+def classify_error(error):
+    """'connection' (retry the batch), 'temporary' (retry this message) or 'permanent'."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        codes = [code for code, _ in error.recipients.values()]
+        return 'permanent' if codes and all(code >= 500 for code in codes) else 'temporary'
+    if isinstance(error, _CONNECTION_ERRORS):
+        return 'connection'
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 'permanent' if error.smtp_code >= 500 else 'temporary'
+    if isinstance(error, OSError):  # socket errors (smtplib errors are OSErrors too, handled above)
+        return 'connection'
+    return 'permanent'  # malformed message, e.g. recipients=[None]
+
+
+class MailDispatcher:
+    """Queue + worker threads that send mail outside the request thread."""
+
+    def __init__(self, mail, app, spool_dir, queue_size=1000, workers=1,
+                 batch_size=20, max_retries=5, backoff=2.0, max_backoff=300.0,
+                 stale_after=600.0, idle_rescan=30.0):
+        self.mail = mail
+        self.app = app
+        self.spool_dir = spool_dir
+        self.failed_dir = os.path.join(spool_dir, 'failed')
+        self.workers = max(1, workers)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Spool files not owned by this process are picked up only after this
+        # many seconds, so several worker processes can share one spool dir.
+        self.stale_after = stale_after
+        self.idle_rescan = idle_rescan
+
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._owned = set()      # ids journaled/queued by this process
+        self._lock = threading.Lock()
+        self._threads = []
+        self._pid = None
+        self._started_at = None
+        self._stop = threading.Event()
+        self._stats = {
+            'submitted': 0, 'sent': 0, 'retried': 0, 'failed': 0,
+            'overflow': 0, 'recovered': 0, 'batches': 0,
+        }
+
+    # --- journal ---
+    def _path(self, msg_id):
+        return os.path.join(self.spool_dir, f'{msg_id}.json')
+
+    def _journal(self, msg_id, data, attempts=0):
+        path = self._path(msg_id)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'id': msg_id, 'attempts': attempts, 'message': data}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _remove(self, msg_id):
+        try:
+            os.remove(self._path(msg_id))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._owned.discard(msg_id)
+
+    def _mark_failed(self, msg_id):
+        try:
+            os.makedirs(self.failed_dir, exist_ok=True)
+            os.replace(self._path(msg_id), os.path.join(self.failed_dir, f'{msg_id}.json'))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._owned.discard(msg_id)
+
+    def _claim(self, path):
+        """Read a spool entry and refresh its mtime; None if another process got it first."""
+        claimed = f'{path}.{os.getpid()}.claim'
+        try:
+            os.rename(path, claimed)  # atomic: only one process wins
+        except FileNotFoundError:
+            return None
+        try:
+            with open(claimed, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            os.utime(claimed)
+        finally:
+            os.replace(claimed, path)
+        return entry
+
+    def _rescan(self, startup=False):
+        """Queue spooled messages that nobody is working on (e.g. after a crash).
+
+        At startup everything last touched before this process started is
+        replayed; later rescans only take entries idle for ``stale_after``.
+        """
+        try:
+            names = os.listdir(self.spool_dir)
+        except FileNotFoundError:
+            return
+        now = time.time()
+        for name in names:
+            if not name.endswith('.json'):
+                continue
+            msg_id = name[:-5]
+            path = os.path.join(self.spool_dir, name)
+            with self._lock:
+                if msg_id in self._owned:
+                    continue
+            try:
+                mtime = os.path.getmtime(path)
+                if startup and mtime >= self._started_at:
+                    continue  # submitted or claimed by a live process since we started
+                if not startup and now - mtime < self.stale_after:
+                    continue
+                entry = self._claim(path)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                log.error("Spool read error", file=name, error=e)
+                continue
+            if entry is None:
+                continue
+            with self._lock:
+                self._owned.add(msg_id)
+            if not self._put(msg_id, entry.get('attempts', 0)):
+                with self._lock:
+                    self._owned.discard(msg_id)
+                break
+            with self._lock:
+                self._stats['recovered'] += 1
+
+    def _put(self, msg_id, attempts):
+        try:
+            self._queue.put_nowait((msg_id, attempts))
+            return True
+        except queue.Full:
+            return False
+
+    # --- lifecycle ---
+    def start(self):
+        """Start worker threads (again, after a fork) and replay the spool.
+
+        Called at app boot so mail spooled before a restart goes out without
+        waiting for a new submission; ``submit()`` calls it too (no-op when
+        already running in this process).
+        """
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._pid = os.getpid()
+            self._started_at = time.time()
+            self._owned.clear()
+            self._threads = []
+            self._stop.clear()
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f'mail-dispatcher-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        self._rescan(startup=True)
+
+    def stop(self, timeout=5.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def submit(self, msg):
+        """Journal and enqueue a message; returns the spool id immediately."""
+        self.start()
+        msg_id = uuid.uuid4().hex
+        self._journal(msg_id, message_to_dict(msg))
+        with self._lock:
+            self._owned.add(msg_id)
+            self._stats['submitted'] += 1
+        if not self._put(msg_id, 0):
+            # Queue is full: the message stays in the spool and is picked up
+            # by the next idle rescan.
+            with self._lock:
+                self._owned.discard(msg_id)
+                self._stats['overflow'] += 1
+            log.warning("Queue full, message left in spool", msg_id=msg_id)
+        return msg_id
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot['queued'] = self._queue.qsize()
+        return snapshot
+
+    # --- worker ---
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.idle_rescan)
+        except queue.Empty:
+            return []
+        batch = [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if not batch:
+                self._rescan()
+                continue
+            try:
+                self._send_batch(batch)
+            except Exception as e:  # never let the worker die
+                log.error("Dispatcher error", error=e)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _load(self, msg_id):
+        with open(self._path(msg_id), 'r', encoding='utf-8') as f:
+            return json.load(f)['message']
+
+    def _send_batch(self, batch):
+        pending = list(batch)
+        with self._lock:
+            self._stats['batches'] += 1
+        try:
+            with self.app.app_context(), self.mail.connect() as conn:
+                while pending:
+                    msg_id, attempts = pending[0]
+                    try:
+                        msg = message_from_dict(self._load(msg_id))
+                        with timed('mail_send'):
+                            conn.send(msg)
+                    except FileNotFoundError:
+                        pending.pop(0)  # already sent by someone else
+                        continue
+                    except Exception as e:
+                        kind = classify_error(e)
+                        if kind == 'connection':
+                            raise
+                        pending.pop(0)
+                        if kind == 'permanent':
+                            self._fail(msg_id, e)
+                        else:
+                            log.warning("Message deferred", msg_id=msg_id, error=e)
+                            self._retry(msg_id, attempts + 1)
+                        continue
+                    pending.pop(0)
+                    self._remove(msg_id)
+                    with self._lock:
+                        self._stats['sent'] += 1
+        except Exception as e:
+            log.error("Send error", error=e)
+            for msg_id, attempts in pending:
+                self._retry(msg_id, attempts + 1)
+
+    def _fail(self, msg_id, error=None, retries=0):
+        log.error("Giving up on message", msg_id=msg_id, retries=retries, error=error)
+        self._mark_failed(msg_id)
+        with self._lock:
+            self._stats['failed'] += 1
+
+    def _retry(self, msg_id, attempts):
+        if attempts > self.max_retries:
+            self._fail(msg_id, retries=attempts - 1)
+            return
+        try:
+            self._journal(msg_id, self._load(msg_id), attempts)
+        except Exception as e:
+            log.error("Spool update error", msg_id=msg_id, error=e)
+        delay = min(self.max_backoff, self.backoff * (2 ** (attempts - 1)))
+        with self._lock:
+            self._stats['retried'] += 1
+
+        def _requeue():
+            if not self._put(msg_id, attempts):
+                # leave it for the idle rescan
+                with self._lock:
+                    self._owned.discard(msg_id)
+
+        timer = threading.Timer(delay, _requeue)
+        timer.daemon = True
+        timer.start()
@@ -0,0 +1,289 @@
+"""Minimal Prometheus-style metrics with multi-process aggregation.
+
+Histograms and counters live in memory per process. When ``METRICS_DIR`` is
+set, every process also snapshots its values to ``<METRICS_DIR>/<pid>.json``
+(at most every ``flush_interval`` seconds and at exit) and ``render()`` sums
+all snapshots, so any worker can answer a scrape for the whole server.
+Snapshots of processes that no longer exist are removed at scrape time.
+
+    with timed('mail_send'):
+        conn.send(msg)
+
+Components that already keep their own counters (``stats()`` dicts) are
+exported with ``register_stats``; they are read when a snapshot is taken:
+
+    REGISTRY.register_stats('karlab_reply_cache', reply_cache.stats,
+                            counters=('hits', 'misses'), gauges=('entries', 'hit_ratio'),
+                            aggregate={'hit_ratio': 'pid'})
+
+Across processes gauges are summed by default; ``aggregate`` picks ``max``
+(e.g. a worst-case wait) or ``pid`` (one series per process with a ``pid``
+label, for ratios and other values that don't add up).
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from jsonlog import get_logger
+
+log = get_logger('metrics')
+
+GAUGE_AGGREGATIONS = ('sum', 'max', 'pid')
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_HELP = {
+    'karlab_http_request_duration_seconds': ('histogram', 'HTTP request latency by route.'),
+    'karlab_stage_duration_seconds': ('histogram', 'Latency of internal stages (render, DB, mail, AI, ...).'),
+    'karlab_stage_errors_total': ('counter', 'Errors raised by internal stages.'),
+    'karlab_chat_local_answers_total': ('counter', 'Chat replies answered locally (site index, fallback bot).'),
+    'karlab_form_duplicates_total': ('counter', 'Repeated form submissions suppressed before DB/mail work.'),
+    'karlab_compression_bytes_total': ('counter', 'Response bytes before (in) and after (out) compression.'),
+    'karlab_compression_cpu_seconds_total': ('counter', 'Thread CPU time spent compressing responses.'),
+    'karlab_chat_ttft_seconds': ('histogram', 'Time to the first upstream token on /api/chat/stream.'),
+    'karlab_chat_streams_total': ('counter', 'Streaming chat responses started.'),
+}
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    def __init__(self, buckets=DEFAULT_BUCKETS, directory=None, flush_interval=5.0):
+        self.buckets = tuple(buckets)
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        # name -> {label_key: [bucket counts..., sum, count]}
+        self._histograms = {}
+        # name -> {label_key: value}
+        self._counters = {}
+        # [(prefix, stats_fn, counters, gauges, modes, label_key)] read at snapshot time
+        self._sources = []
+        self._last_flush = 0.0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            atexit.register(self.flush)
+
+    # --- recording ---
+    def observe(self, name, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            row = series.get(key)
+            if row is None:
+                row = series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+        self._maybe_flush()
+
+    def inc(self, name, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+        self._maybe_flush()
+
+    def register_stats(self, prefix, stats_fn, counters=(), gauges=(), aggregate=None, help_text=None, **labels):
+        """Export keys of ``stats_fn()`` as ``<prefix>_<key>_total`` counters and ``<prefix>_<key>`` gauges.
+
+        ``counters`` / ``gauges`` are key sequences or {stats key: metric name suffix} dicts;
+        ``aggregate`` maps gauge keys to one of GAUGE_AGGREGATIONS (default ``sum``).
+        """
+        counters = dict(counters) if isinstance(counters, dict) else {k: k for k in counters}
+        gauges = dict(gauges) if isinstance(gauges, dict) else {k: k for k in gauges}
+        modes = {key: (aggregate or {}).get(key, 'sum') for key in gauges}
+        for key, mode in modes.items():
+            if mode not in GAUGE_AGGREGATIONS:
+                raise ValueError(f"unknown aggregation {mode!r} for {prefix} {key}")
+        with self._lock:
+            self._sources.append((prefix, stats_fn, counters, gauges, modes, _label_key(labels)))
+        for key, suffix in counters.items():
+            _HELP.setdefault(f'{prefix}_{suffix}_total', ('counter', f'{help_text or prefix}: {key}.'))
+        for key, suffix in gauges.items():
+            _HELP.setdefault(f'{prefix}_{suffix}', ('gauge', f'{help_text or prefix}: {key}.'))
+
+    def _read_sources(self):
+        """({name: {label_key: value}} counters, gauges, {gauge name: aggregation}) from stats() callables."""
+        with self._lock:
+            sources = list(self._sources)
+        counters, gauges, gauge_modes = {}, {}, {}
+        for prefix, stats_fn, counter_keys, gauge_keys, modes, key in sources:
+            try:
+                stats = stats_fn() or {}
+            except Exception as e:
+                log.debug("Stats source error", prefix=prefix, error=e)
+                continue
+            for name, suffix in counter_keys.items():
+                if isinstance(stats.get(name), (int, float)):
+                    counters.setdefault(f'{prefix}_{suffix}_total', {})[key] = stats[name]
+            for name, suffix in gauge_keys.items():
+                gauge_modes[f'{prefix}_{suffix}'] = modes[name]
+                if isinstance(stats.get(name), (int, float)):
+                    gauges.setdefault(f'{prefix}_{suffix}', {})[key] = float(stats[name])
+        return counters, gauges, gauge_modes
+
+    # --- multi-process snapshots ---
+    def _snapshot(self):
+        source_counters, gauges, gauge_modes = self._read_sources()
+        with self._lock:
+            counters = {n: dict(s) for n, s in self._counters.items()}
+            for name, series in source_counters.items():
+                counters.setdefault(name, {}).update(series)
+            return {
+                'pid': os.getpid(),
+                'buckets': list(self.buckets),
+                'histograms': {n: [[list(map(list, k)), list(v)] for k, v in s.items()]
+                               for n, s in self._histograms.items()},
+                'counters': {n: [[list(map(list, k)), v] for k, v in s.items()]
+                             for n, s in counters.items()},
+                'gauges': {n: [[list(map(list, k)), v] for k, v in s.items()]
+                           for n, s in gauges.items()},
+                'gauge_modes': gauge_modes,
+            }
+
+    def _maybe_flush(self):
+        if self.directory and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if not self.directory:
+            return
+        self._last_flush = time.monotonic()
+        path = os.path.join(self.directory, f'{os.getpid()}.json')
+        tmp = f'{path}.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self._snapshot(), f)
+            os.replace(tmp, path)
+        except Exception as e:
+            log.error("Snapshot error", error=e)
+
+    def _collect(self):
+        """Merged (histograms, counters, gauges) across live processes (or just this one)."""
+        if not self.directory:
+            snapshots = [self._snapshot()]
+        else:
+            self.flush()
+            snapshots = []
+            for name in os.listdir(self.directory):
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(self.directory, name)
+                pid = name[:-len('.json')]
+                if pid.isdigit() and int(pid) != os.getpid() and not _pid_alive(int(pid)):
+                    try:
+                        os.remove(path)  # worker exited; its series would be summed forever
+                    except OSError:
+                        pass
+                    continue
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        snapshots.append(json.load(f))
+                except Exception:
+                    continue
+        histograms, counters, gauges = {}, {}, {}
+        for snap in snapshots:
+            if tuple(snap.get('buckets', ())) != self.buckets:
+                continue
+            for name, series in snap['histograms'].items():
+                merged = histograms.setdefault(name, {})
+                for key, row in series:
+                    key = tuple(map(tuple, key))
+                    acc = merged.get(key)
+                    merged[key] = row if acc is None else [a + b for a, b in zip(acc, row)]
+            for name, series in snap['counters'].items():
+                merged = counters.setdefault(name, {})
+                for key, value in series:
+                    key = tuple(map(tuple, key))
+                    merged[key] = merged.get(key, 0) + value
+            modes = snap.get('gauge_modes', {})
+            for name, series in snap.get('gauges', {}).items():
+                mode = modes.get(name, 'sum')
+                merged = gauges.setdefault(name, {})
+                for key, value in series:
+                    key = tuple(map(tuple, key))
+                    if mode == 'pid':
+                        merged[key + (('pid', str(snap.get('pid', '?'))),)] = value
+                    elif mode == 'max':
+                        merged[key] = max(merged.get(key, value), value)
+                    else:
+                        merged[key] = merged.get(key, 0) + value
+        return histograms, counters, gauges
+
+    # --- exposition ---
+    @staticmethod
+    def _labels(key, extra=None):
+        items = list(key) + (list(extra) if extra else [])
+        if not items:
+            return ''
+        body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                        for k, v in items)
+        return '{' + body + '}'
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        histograms, counters, gauges = self._collect()
+        lines = []
+        for name in sorted(histograms):
+            _, help_text = _HELP.get(name, ('histogram', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            for key, row in sorted(histograms[name].items()):
+                for bound, count in zip(self.buckets, row):
+                    lines.append(f'{name}_bucket{self._labels(key, [("le", repr(float(bound)))])} {count}')
+                lines.append(f'{name}_bucket{self._labels(key, [("le", "+Inf")])} {row[-1]}')
+                lines.append(f'{name}_sum{self._labels(key)} {row[-2]}')
+                lines.append(f'{name}_count{self._labels(key)} {row[-1]}')
+        for kind, series_by_name in (('counter', counters), ('gauge', gauges)):
+            for name in sorted(series_by_name):
+                _, help_text = _HELP.get(name, (kind, name))
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for key, value in sorted(series_by_name[name].items()):
+                    lines.append(f'{name}{self._labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry(directory=os.getenv('METRICS_DIR') or None)
+
+
+def observe_stage(stage, seconds, error=False):
+    REGISTRY.observe('karlab_stage_duration_seconds', seconds, stage=stage)
+    if error:
+        REGISTRY.inc('karlab_stage_errors_total', stage=stage)
+
+
+def stage_error(stage):
+    REGISTRY.inc('karlab_stage_errors_total', stage=stage)
+
+
+@contextmanager
+def timed(stage):
+    """Time a block as ``stage``; exceptions are counted as errors and re-raised."""
+    started = time.perf_counter()
+    error = False
+    try:
+        yield
+    except Exception:
+        error = True
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started, error)
@@ -0,0 +1,115 @@
+"""Versioned schema migrations for the PostgreSQL database.
+
+Run once per deploy:
+
+    flask --app app db-migrate
+
+Applied versions are recorded in ``schema_migrations``. The web app never
+migrates on import; it only checks (once, lazily) that the database is at
+``LATEST_VERSION``. Append new migrations to ``MIGRATIONS`` and never edit
+ones that have already shipped.
+"""
+
+from jsonlog import get_logger
+
+log = get_logger('db')
+
+# (version, description, [statements])
+MIGRATIONS = [
+    (1, 'inquiries and newsletter_subscriptions tables', [
+        """
+        CREATE TABLE IF NOT EXISTS inquiries (
+            id SERIAL PRIMARY KEY,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            company TEXT,
+            business_needs TEXT NOT NULL,
+            service_type TEXT NOT NULL,
+            budget_range TEXT NOT NULL,
+            timeline TEXT,
+            project_description TEXT NOT NULL,
+            additional_info TEXT,
+            client_ip TEXT,
+            user_agent TEXT
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS newsletter_subscriptions (
+            id SERIAL PRIMARY KEY,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+            email TEXT UNIQUE NOT NULL,
+            source_page TEXT,
+            client_ip TEXT,
+            user_agent TEXT
+        )
+        """,
+    ]),
+    (2, 'indexes for the keyset-paginated inquiry API', [
+        "CREATE INDEX IF NOT EXISTS inquiries_created_id_idx ON inquiries (created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS inquiries_service_created_idx "
+        "ON inquiries (service_type, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS inquiries_budget_created_idx "
+        "ON inquiries (budget_range, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS inquiries_email_created_idx "
+        "ON inquiries (lower(email), created_at DESC, id DESC)",
+    ]),
+    (3, 'form_submissions claims for duplicate-submission suppression', [
+        """
+        CREATE TABLE IF NOT EXISTS form_submissions (
+            submission_key TEXT PRIMARY KEY,
+            form TEXT NOT NULL,
+            created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS form_submissions_created_idx ON form_submissions (created_at)",
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Arbitrary constant so concurrent deploys don't run migrations twice
+_ADVISORY_LOCK_ID = 0x4B41524C  # "KARL"
+
+
+def current_version(conn):
+    """Highest applied version, 0 for a fresh database."""
+    with conn, conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('schema_migrations')")
+        if cur.fetchone()[0] is None:
+            return 0
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations")
+        return cur.fetchone()[0]
+
+
+def migrate(conn, target=None):
+    """Apply pending migrations (each in its own transaction). Returns applied versions."""
+    target = LATEST_VERSION if target is None else target
+    applied = []
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+            """
+        )
+    for version, description, statements in MIGRATIONS:
+        if version > target:
+            break
+        with conn, conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (_ADVISORY_LOCK_ID,))
+            cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+            if cur.fetchone():
+                continue
+            for statement in statements:
+                cur.execute(statement)
+            cur.execute(
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+        applied.append(version)
+        log.info("Applied migration", version=version, description=description)
+    return applied
@@ -0,0 +1,106 @@
+"""Newsletter subscription storage: single upsert and bulk CSV import."""
+import csv
+import io
+import re
+
+_EMAIL_RE = re.compile(r'^[^@\s,]+@[^@\s,]+\.[^@\s,]+$')
+
+
+def normalize_email(email):
+    """Strip and lower-case; return None if it doesn't look like an address."""
+    email = (email or '').strip().lower()
+    if len(email) > 254 or not _EMAIL_RE.match(email):
+        return None
+    return email
+
+
+def subscribe(conn, email, source_page=None, client_ip=None, user_agent=None):
+    """Insert a subscription in one round trip. Return True if new, False if duplicate."""
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            """
+            INSERT INTO newsletter_subscriptions (email, source_page, client_ip, user_agent)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id
+            """,
+            (email, source_page, client_ip, user_agent),
+        )
+        return cur.fetchone() is not None
+
+
+class _CopyStream(io.RawIOBase):
+    """File-like object feeding normalized CSV rows to COPY without buffering the file."""
+
+    def __init__(self, rows):
+        self._rows = rows
+        self._buf = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buf) < size:
+            try:
+                email, source = next(self._rows)
+            except StopIteration:
+                break
+            out = io.StringIO()
+            csv.writer(out).writerow((email, source or ''))
+            self._buf += out.getvalue().encode('utf-8')
+        if size < 0:
+            data, self._buf = self._buf, b''
+        else:
+            data, self._buf = self._buf[:size], self._buf[size:]
+        return data
+
+
+def iter_csv_emails(fileobj, source_page, counters):
+    """Yield (email, source_page) from a CSV with an 'email' column (or emails in column 1)."""
+    reader = csv.reader(fileobj)
+    column = 0
+    first = True
+    for row in reader:
+        if not row:
+            continue
+        if first:
+            first = False
+            header = [c.strip().lower() for c in row]
+            if 'email' in header or 'e-mail' in header:
+                column = header.index('email') if 'email' in header else header.index('e-mail')
+                continue
+        counters['read'] += 1
+        email = normalize_email(row[column] if column < len(row) else '')
+        if email is None:
+            counters['invalid'] += 1
+            continue
+        counters['valid'] += 1
+        yield email, source_page
+
+
+def import_csv(conn, fileobj, source_page='import'):
+    """Bulk-load subscriptions: COPY into a temp staging table, then merge.
+
+    Returns counters: read, valid, invalid, inserted, duplicates.
+    """
+    counters = {'read': 0, 'valid': 0, 'invalid': 0, 'inserted': 0, 'duplicates': 0}
+    with conn, conn.cursor() as cur:
+        cur.execute(
+            "CREATE TEMP TABLE newsletter_staging (email TEXT NOT NULL, source_page TEXT) "
+            "ON COMMIT DROP"
+        )
+        cur.copy_expert(
+            "COPY newsletter_staging (email, source_page) FROM STDIN WITH (FORMAT csv)",
+            _CopyStream(iter_csv_emails(fileobj, source_page, counters)),
+        )
+        cur.execute(
+            """
+            INSERT INTO newsletter_subscriptions (email, source_page)
+            SELECT DISTINCT ON (email) email, NULLIF(source_page, '')
+            FROM newsletter_staging
+            ON CONFLICT (email) DO NOTHING
+            """
+        )
+        counters['inserted'] = cur.rowcount
+    counters['duplicates'] = counters['valid'] - counters['inserted']
+    return counters
@@ -0,0 +1,160 @@
+"""Full-response cache for static GET pages (about, references, certs, ...).
+
+Rendered bytes are kept in memory together with pre-compressed gzip/brotli
+variants, a strong ETag and Last-Modified. Entries are dropped when any file
+under the template folder changes. A cache hit does no rendering and no
+compression; conditional requests are answered with 304.
+"""
+import gzip
+import hashlib
+import os
+import threading
+import time
+from email.utils import formatdate
+from functools import wraps
+
+from flask import Response, g, request
+
+try:
+    import brotli  # type: ignore
+except Exception:  # optional dependency
+    brotli = None  # type: ignore
+
+_SUFFIX = {'br': '-br', 'gzip': '-gz', 'identity': ''}
+
+
+class _Entry:
+    __slots__ = ('variants', 'etag', 'last_modified', 'http_date', 'mimetype', 'signature')
+
+    def __init__(self, body, mimetype, last_modified, signature):
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.mimetype = mimetype
+        self.last_modified = int(last_modified)
+        self.http_date = formatdate(self.last_modified, usegmt=True)
+        self.signature = signature
+        self.variants = {'identity': body}
+        self.variants['gzip'] = gzip.compress(body, compresslevel=9, mtime=0)
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=11)
+
+
+class PageCache:
+    """In-memory cache of rendered pages keyed by request path."""
+
+    def __init__(self, app, check_interval=2.0, postprocess=None):
+        self.app = app
+        # bytes -> bytes hook applied once before a page is stored (e.g. dark.css link)
+        self.postprocess = postprocess
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._signature = None
+        self._last_check = 0.0
+        self._stats = {'hits': 0, 'misses': 0, 'not_modified': 0, 'invalidations': 0}
+
+    # --- invalidation ---
+    def _template_signature(self):
+        folder = os.path.join(self.app.root_path, self.app.template_folder or 'templates')
+        newest = 0.0
+        count = 0
+        for root, _dirs, files in os.walk(folder):
+            for name in files:
+                try:
+                    newest = max(newest, os.stat(os.path.join(root, name)).st_mtime)
+                    count += 1
+                except OSError:
+                    continue
+        return newest, count
+
+    def _current_signature(self):
+        now = time.monotonic()
+        if self._signature is not None and now - self._last_check < self.check_interval:
+            return self._signature
+        signature = self._template_signature()
+        with self._lock:
+            if signature != self._signature:
+                if self._signature is not None:
+                    self._stats['invalidations'] += 1
+                self._entries.clear()
+                self._signature = signature
+            self._last_check = now
+        return signature
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # --- request handling ---
+    @staticmethod
+    def _choose_encoding(entry):
+        accepted = request.accept_encodings
+        if 'br' in entry.variants and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return 'identity'
+
+    @staticmethod
+    def _not_modified(entry):
+        if request.if_none_match:
+            return any(request.if_none_match.contains(entry.etag + suffix)
+                       for suffix in _SUFFIX.values())
+        since = request.if_modified_since
+        return since is not None and since.timestamp() >= entry.last_modified
+
+    def _respond(self, entry):
+        # Cached output already contains the dark.css link - skip the fallback hook
+        g._dark_css_in_template = True
+        encoding = self._choose_encoding(entry)
+        headers = {
+            'ETag': f'"{entry.etag}{_SUFFIX[encoding]}"',
+            'Last-Modified': entry.http_date,
+            'Cache-Control': 'public, no-cache',
+            'Vary': 'Accept-Encoding',
+        }
+        if self._not_modified(entry):
+            with self._lock:
+                self._stats['not_modified'] += 1
+            return Response(status=304, headers=headers)
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        return Response(entry.variants[encoding], mimetype=entry.mimetype, headers=headers)
+
+    def cached(self, view):
+        """Decorator for GET views whose output only changes with the templates."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+            signature = self._current_signature()
+            key = request.path
+            with self._lock:
+                entry = self._entries.get(key)
+            if entry is not None:
+                with self._lock:
+                    self._stats['hits'] += 1
+                return self._respond(entry)
+
+            with self._lock:
+                self._stats['misses'] += 1
+            rv = self.app.make_response(view(*args, **kwargs))
+            if rv.status_code != 200 or rv.direct_passthrough or rv.is_streamed:
+                return rv
+            body = rv.get_data()
+            if self.postprocess is not None:
+                body = self.postprocess(body)
+            entry = _Entry(body, rv.mimetype or 'text/html',
+                           signature[0] or time.time(), signature)
+            with self._lock:
+                if self._signature == signature:
+                    self._entries[key] = entry
+            return self._respond(entry)
+        wrapper.page_cached = True
+        return wrapper
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['entries'] = len(self._entries)
+        snapshot['brotli'] = brotli is not None
+        return snapshot
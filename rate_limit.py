@@ -0,0 +1,164 @@
+"""Admission control for /api/chat.
+
+- ``TokenBucketLimiter``: per-client token bucket (``rate`` tokens/s, ``burst``
+  capacity), kept in a bounded in-process LRU or - when ``sqlite_path`` is
+  given - in a SQLite file shared by all workers on the host.
+- ``ConcurrencyGate``: non-blocking cap on simultaneous upstream AI calls, so
+  excess requests are answered immediately instead of queueing.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from jsonlog import get_logger
+
+log = get_logger('ai')
+
+
+def client_ip(request):
+    """Client address used as the rate-limit key.
+
+    X-Forwarded-For is not read here: anyone can send it. Deployments behind
+    proxies set TRUST_PROXY_HOPS, and ``remote_addr`` is resolved from the
+    hops those proxies appended (ProxyFix in app.py, ``forwarded_addr`` for
+    the ASGI chat app).
+    """
+    return request.remote_addr or 'unknown'
+
+
+def forwarded_addr(forwarded_for, remote_addr, trusted_hops):
+    """The address the outermost of ``trusted_hops`` proxies saw (same rule as ProxyFix's x_for)."""
+    if trusted_hops <= 0 or not forwarded_for:
+        return remote_addr
+    hops = [hop.strip() for hop in forwarded_for.split(',') if hop.strip()]
+    if len(hops) < trusted_hops:
+        return remote_addr
+    return hops[-trusted_hops]
+
+
+class TokenBucketLimiter:
+    def __init__(self, rate=0.5, burst=10, max_clients=10000, sqlite_path=None):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_clients = max_clients
+        self.sqlite_path = sqlite_path
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()   # key -> (tokens, updated_at)
+        self._local = threading.local()
+        self._stats = {'allowed': 0, 'limited': 0}
+        self._sqlite_ops = 0
+        if sqlite_path:
+            self._init_sqlite()
+
+    # --- SQLite backend ---
+    def _db(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.sqlite_path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _init_sqlite(self):
+        try:
+            self._db().execute('CREATE TABLE IF NOT EXISTS rate_buckets ('
+                               'key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)')
+        except Exception as e:
+            log.warning("Shared rate limiter disabled", error=e)
+            self.sqlite_path = None
+
+    def _take_sqlite(self, key, now):
+        db = self._db()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute('SELECT tokens, updated_at FROM rate_buckets WHERE key = ?', (key,)).fetchone()
+            tokens, wait = self._refill_and_take(row, now)
+            db.execute('INSERT OR REPLACE INTO rate_buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                       (key, tokens, now))
+            self._sqlite_ops += 1
+            if self._sqlite_ops % 1000 == 0:
+                # drop idle clients - their bucket would be full again anyway
+                db.execute('DELETE FROM rate_buckets WHERE updated_at < ?',
+                           (now - self.burst / max(self.rate, 1e-9),))
+            db.execute('COMMIT')
+            return wait
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+
+    # --- core ---
+    def _refill_and_take(self, state, now):
+        """Return (remaining tokens, retry_after); retry_after == 0 means allowed."""
+        if state is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, state[0] + (now - state[1]) * self.rate)
+        if tokens >= 1.0:
+            return tokens - 1.0, 0.0
+        return tokens, (1.0 - tokens) / self.rate if self.rate > 0 else 60.0
+
+    def check(self, key):
+        """Consume one token for ``key``. Return 0.0 if allowed, else seconds to wait."""
+        now = time.time()
+        wait = None
+        if self.sqlite_path:
+            try:
+                wait = self._take_sqlite(key, now)
+            except Exception as e:
+                log.error("Shared rate limiter error (using local)", error=e)
+        if wait is None:
+            with self._lock:
+                tokens, wait = self._refill_and_take(self._buckets.get(key), now)
+                self._buckets[key] = (tokens, now)
+                self._buckets.move_to_end(key)
+                while len(self._buckets) > self.max_clients:
+                    self._buckets.popitem(last=False)
+        with self._lock:
+            self._stats['limited' if wait else 'allowed'] += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['clients'] = len(self._buckets)
+        return snapshot
+
+
+class ConcurrencyGate:
+    """Non-blocking semaphore around upstream calls."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._sem = threading.BoundedSemaphore(limit) if limit > 0 else None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+
+    @contextmanager
+    def slot(self):
+        """Yield True if a slot was acquired, False if the gate is full."""
+        if self._sem is None:
+            yield True
+            return
+        acquired = self._sem.acquire(blocking=False)
+        with self._lock:
+            if acquired:
+                self._in_flight += 1
+            else:
+                self._rejected += 1
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with self._lock:
+                    self._in_flight -= 1
+                self._sem.release()
+
+    def stats(self):
+        with self._lock:
+            return {'limit': self.limit, 'in_flight': self._in_flight, 'rejected': self._rejected}
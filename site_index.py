@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""Local BM25 retrieval index over the site's static pages.
+
+Build offline (after editing about/projects/references/certs templates):
+
+    python3 site_index.py          # or: flask build-site-index
+
+The indexer strips Jinja syntax and HTML from the templates, splits the text
+into short passages and stores a BM25-weighted inverted index as CSR arrays
+(``indptr`` / ``doc_ids`` / ``weights``) in ``site_index.npz``. ``SiteIndex``
+loads it once per worker. A chat question above the confidence threshold is
+answered straight from the best passage; below it, the top passages are added
+to the prompt as context.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import unicodedata
+from html.parser import HTMLParser
+
+try:
+    import numpy as np  # type: ignore
+except Exception:  # optional dependency
+    np = None  # type: ignore
+
+from jsonlog import get_logger
+
+log = get_logger('ai')
+
+PAGES = ('about.html', 'projects.html', 'references.html', 'certs.html')
+INDEX_FILE = 'site_index.npz'
+
+K1 = 1.2
+B = 0.75
+STEM_LEN = 6          # crude prefix stemming copes with Polish inflection
+PASSAGE_WORDS = 80
+MIN_PASSAGE_WORDS = 6
+
+_JINJA_RE = re.compile(r'{%.*?%}|{{.*?}}|{#.*?#}', re.S)
+_TOKEN_RE = re.compile(r'\w+', re.U)
+_BLOCK_TAGS = {'p', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'td', 'th', 'dt', 'dd',
+               'blockquote', 'section', 'article', 'div', 'br', 'tr'}
+_HEADINGS = {'h1', 'h2', 'h3', 'h4', 'h5', 'h6'}
+_SKIP_TAGS = {'script', 'style', 'nav', 'footer', 'head', 'noscript', 'svg', 'form'}
+_STOPWORDS = {
+    'i', 'w', 'z', 'na', 'do', 'o', 'że', 'się', 'jest', 'to', 'nie', 'jak', 'co', 'a', 'oraz',
+    'dla', 'po', 'od', 'czy', 'jaki', 'jakie', 'the', 'a', 'an', 'of', 'and', 'to', 'in', 'is',
+    'what', 'how', 'do', 'you', 'your', 'are', 'for', 'on', 'with',
+}
+
+
+# --- text processing ---
+def _fold(text):
+    text = unicodedata.normalize('NFKD', text.lower().replace('ł', 'l'))
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return [t[:STEM_LEN] for t in _TOKEN_RE.findall(_fold(text))
+            if t not in _STOPWORDS and len(t) > 1 and not t.isdigit()]
+
+
+class _TextExtractor(HTMLParser):
+    """Collect (heading, text) blocks from rendered-ish HTML."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.blocks = []
+        self._buf = []
+        self._skip = 0
+        self._heading = ''
+        self._in_heading = False
+
+    def _flush(self):
+        text = ' '.join(' '.join(self._buf).split())
+        self._buf = []
+        if not text:
+            return
+        if self._in_heading:
+            self._heading = text
+        else:
+            self.blocks.append((self._heading, text))
+
+    def handle_starttag(self, tag, attrs):
+        if tag in _SKIP_TAGS:
+            self._skip += 1
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+            self._in_heading = tag in _HEADINGS
+
+    def handle_endtag(self, tag):
+        if tag in _SKIP_TAGS:
+            self._skip = max(0, self._skip - 1)
+        elif tag in _BLOCK_TAGS:
+            self._flush()
+            self._in_heading = False
+
+    def handle_data(self, data):
+        if not self._skip:
+            self._buf.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_passages(source, page):
+    """Split a template into passages: [{'page', 'heading', 'text'}]."""
+    parser = _TextExtractor()
+    parser.feed(_JINJA_RE.sub(' ', source))
+    parser.close()
+    passages = []
+    pending_heading, pending = '', []
+    for heading, text in parser.blocks:
+        if heading != pending_heading and pending:
+            passages.extend(_window(page, pending_heading, pending))
+            pending = []
+        pending_heading = heading
+        pending.extend(text.split())
+        if len(pending) >= PASSAGE_WORDS:
+            passages.extend(_window(page, pending_heading, pending))
+            pending = []
+    if pending:
+        passages.extend(_window(page, pending_heading, pending))
+    return passages
+
+
+def _window(page, heading, words):
+    out = []
+    for i in range(0, len(words), PASSAGE_WORDS):
+        chunk = words[i:i + PASSAGE_WORDS]
+        if len(chunk) >= MIN_PASSAGE_WORDS:
+            out.append({'page': page, 'heading': heading, 'text': ' '.join(chunk)})
+    return out
+
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+')
+
+
+def snippet(text, query, max_sentences=2, max_chars=320):
+    """The sentences of a passage that best match the query, in page order."""
+    sentences = [s for s in _SENTENCE_RE.split(text.strip()) if s]
+    if len(sentences) <= 1:
+        picked = sentences
+    else:
+        terms = set(tokenize(query))
+        scored = sorted(range(len(sentences)),
+                        key=lambda i: (-len(terms.intersection(tokenize(sentences[i]))), i))
+        picked = [sentences[i] for i in sorted(scored[:max_sentences])]
+    out = ' '.join(picked)
+    if len(out) > max_chars:
+        out = out[:max_chars].rsplit(' ', 1)[0].rstrip(',;:') + '…'
+    return out
+
+
+# --- build ---
+def build(template_dir, out_path, pages=PAGES):
+    """Index the given templates and write ``out_path`` (.npz)."""
+    if np is None:
+        raise RuntimeError("numpy is required to build the site index")
+    passages = []
+    for page in pages:
+        path = os.path.join(template_dir, page)
+        if not os.path.exists(path):
+            log.warning("Site index: skipping missing page", page=page)
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            passages.extend(extract_passages(f.read(), page))
+
+    docs = [tokenize(f"{p['heading']} {p['text']}") for p in passages]
+    vocab = {}
+    postings = {}
+    for doc_id, tokens in enumerate(docs):
+        counts = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+        for tok, tf in counts.items():
+            vocab.setdefault(tok, len(vocab))
+            postings.setdefault(tok, []).append((doc_id, tf))
+
+    n_docs = max(len(docs), 1)
+    lengths = np.array([len(d) for d in docs] or [0], dtype=np.float32)
+    avg_len = float(lengths.mean()) or 1.0
+    terms = sorted(vocab, key=vocab.get)
+    indptr = np.zeros(len(terms) + 1, dtype=np.int64)
+    doc_ids, weights, idf = [], [], np.zeros(len(terms), dtype=np.float32)
+    for term_id, term in enumerate(terms):
+        plist = postings[term]
+        df = len(plist)
+        idf[term_id] = np.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+        for doc_id, tf in plist:
+            norm = K1 * (1 - B + B * lengths[doc_id] / avg_len)
+            doc_ids.append(doc_id)
+            # idf * saturated tf - the query side only sums these
+            weights.append(idf[term_id] * tf * (K1 + 1) / (tf + norm))
+        indptr[term_id + 1] = len(doc_ids)
+
+    np.savez_compressed(
+        out_path,
+        terms=np.array(json.dumps(terms)),
+        passages=np.array(json.dumps(passages, ensure_ascii=False)),
+        indptr=indptr,
+        doc_ids=np.array(doc_ids, dtype=np.int32),
+        weights=np.array(weights, dtype=np.float32),
+        idf=idf,
+    )
+    log.info("Site index built", passages=len(passages), terms=len(terms), path=out_path)
+    return len(passages)
+
+
+# --- runtime ---
+class SiteIndex:
+    """Lazily loaded BM25 index; safe to share between threads."""
+
+    def __init__(self, path, threshold=0.6, min_terms=2):
+        self.path = path
+        self.threshold = threshold
+        self.min_terms = min_terms
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._data = None
+
+    def _load(self):
+        if self._loaded:
+            return self._data
+        with self._lock:
+            if not self._loaded:
+                data = None
+                if np is not None and os.path.exists(self.path):
+                    try:
+                        raw = np.load(self.path)
+                        terms = json.loads(str(raw['terms']))
+                        data = {
+                            'vocab': {t: i for i, t in enumerate(terms)},
+                            'passages': json.loads(str(raw['passages'])),
+                            'indptr': raw['indptr'],
+                            'doc_ids': raw['doc_ids'],
+                            'weights': raw['weights'],
+                            'idf': raw['idf'],
+                        }
+                    except Exception as e:
+                        log.error("Site index load error", error=e)
+                self._data = data
+                self._loaded = True
+        return self._data
+
+    def reload(self):
+        with self._lock:
+            self._loaded = False
+        return self._load() is not None
+
+    def search(self, query, k=3):
+        """Return [(confidence, passage), ...] best first.
+
+        Confidence is the BM25 score divided by what a passage of average
+        length containing every matched query term once would score (the
+        summed idf), times the share of query terms known to the index,
+        capped at 1.
+        """
+        data = self._load()
+        if data is None:
+            return []
+        term_ids = sorted({data['vocab'][t] for t in tokenize(query) if t in data['vocab']})
+        if not term_ids:
+            return []
+        scores = np.zeros(len(data['passages']), dtype=np.float32)
+        indptr, doc_ids, weights = data['indptr'], data['doc_ids'], data['weights']
+        for t in term_ids:
+            start, end = indptr[t], indptr[t + 1]
+            np.add.at(scores, doc_ids[start:end], weights[start:end])
+        ceiling = float(data['idf'][term_ids].sum()) or 1.0
+        # terms the index has never seen also lower confidence
+        coverage = len(term_ids) / max(len(set(tokenize(query))), 1)
+        top = np.argsort(-scores)[:k]
+        return [(min(1.0, float(scores[i]) / ceiling * coverage), data['passages'][i])
+                for i in top if scores[i] > 0]
+
+    def answer(self, query):
+        """Best passage if it is confident enough to skip the LLM, else None."""
+        if len(set(tokenize(query))) < self.min_terms:
+            return None
+        hits = self.search(query, k=1)
+        if hits and hits[0][0] >= self.threshold:
+            return hits[0][1]
+        return None
+
+    def context(self, query, k=3, min_confidence=0.15):
+        """Compact context block for the prompt, or '' if nothing relevant."""
+        lines = []
+        for confidence, passage in self.search(query, k=k):
+            if confidence < min_confidence:
+                continue
+            heading = f"{passage['heading']}: " if passage['heading'] else ''
+            lines.append(f"[{passage['page']}] {heading}{passage['text']}")
+        return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    here = os.path.dirname(os.path.abspath(__file__))
+    build(os.path.join(here, 'templates'), os.path.join(here, INDEX_FILE), sys.argv[1:] or PAGES)
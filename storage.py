@@ -0,0 +1,381 @@
+"""Storage backends for inquiries, newsletter subscriptions and form claims.
+
+app.py goes through one ``Storage`` object, picked by ``STORAGE_BACKEND``:
+
+    postgres  (default) psycopg2 connection pool; schema via `flask db-migrate`
+    sqlite    embedded database file at ``SQLITE_PATH`` (WAL mode); schema is
+              created on first use, so no server is needed
+
+Both backends implement the same methods. ``StorageUnavailable`` means "no
+database right now" (psycopg2 missing, server down, pool exhausted) and is
+handled by callers the way a ``None`` connection used to be.
+"""
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+try:
+    from psycopg2.extras import execute_values
+except Exception:  # module may be missing in test environment
+    execute_values = None
+
+import inquiry_queries
+import migrations
+import newsletter
+from inquiry_writer import INQUIRY_COLUMNS
+from jsonlog import get_logger
+
+log = get_logger('db')
+
+BACKENDS = ('postgres', 'sqlite')
+
+
+class StorageUnavailable(RuntimeError):
+    pass
+
+
+def _cutoff(seconds):
+    """UTC timestamp ``seconds`` ago, in the text form both backends compare correctly."""
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds)).isoformat(timespec='milliseconds')
+
+
+class Storage:
+    """Operations app.py needs; rows are tuples in INQUIRY_COLUMNS order."""
+
+    name = None
+
+    def migrate(self):
+        """Create/upgrade the schema. Returns the applied versions."""
+        raise NotImplementedError
+
+    def insert_inquiries(self, rows):
+        raise NotImplementedError
+
+    def fetch_inquiries(self, filters, cursor=None, limit=50):
+        """(items, next_cursor), newest first (see inquiry_queries.py)."""
+        raise NotImplementedError
+
+    def iter_inquiries(self, filters):
+        """Yield every matching row in EXPORT_COLUMNS order, newest first."""
+        raise NotImplementedError
+
+    def subscribe(self, email, source_page=None, client_ip=None, user_agent=None):
+        """True if the subscription is new, False for a duplicate."""
+        raise NotImplementedError
+
+    def import_newsletter(self, fileobj, source_page='import'):
+        """Bulk CSV import; returns counters read/valid/invalid/inserted/duplicates."""
+        raise NotImplementedError
+
+    def claim_submission(self, keys, form):
+        """Claim [(key, window_seconds)] atomically; False if any is held within its window."""
+        raise NotImplementedError
+
+    def prune_submissions(self, older_than):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+# --- PostgreSQL ---
+_PG_CLAIM_SQL = """
+    INSERT INTO form_submissions (submission_key, form)
+    VALUES (%s, %s)
+    ON CONFLICT (submission_key) DO UPDATE SET created_at = NOW()
+    WHERE form_submissions.created_at < %s
+    RETURNING submission_key
+"""
+
+
+class PostgresStorage(Storage):
+    """psycopg2 backend; ``connection_factory`` yields a pooled connection or None."""
+
+    name = 'postgres'
+
+    def __init__(self, connection_factory):
+        self.connection_factory = connection_factory
+
+    @contextmanager
+    def _connection(self):
+        with self.connection_factory() as conn:
+            if conn is None:
+                raise StorageUnavailable("no database connection")
+            yield conn
+
+    def migrate(self):
+        with self._connection() as conn:
+            return migrations.migrate(conn)
+
+    def insert_inquiries(self, rows):
+        if execute_values is None:
+            raise StorageUnavailable("psycopg2 not installed")
+        with self._connection() as conn:
+            with conn, conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"INSERT INTO inquiries ({', '.join(INQUIRY_COLUMNS)}) VALUES %s",
+                    rows,
+                    page_size=max(len(rows), 1),
+                )
+
+    def fetch_inquiries(self, filters, cursor=None, limit=50):
+        with self._connection() as conn:
+            return inquiry_queries.fetch_page(conn, filters, cursor=cursor, limit=limit)
+
+    def iter_inquiries(self, filters):
+        with self._connection() as conn:
+            yield from inquiry_queries.iter_rows(conn, filters)
+
+    def subscribe(self, email, source_page=None, client_ip=None, user_agent=None):
+        with self._connection() as conn:
+            return newsletter.subscribe(conn, email, source_page, client_ip, user_agent)
+
+    def import_newsletter(self, fileobj, source_page='import'):
+        with self._connection() as conn:
+            return newsletter.import_csv(conn, fileobj, source_page=source_page)
+
+    def claim_submission(self, keys, form):
+        with self._connection() as conn:
+            with conn, conn.cursor() as cur:
+                for key, window in keys:
+                    cur.execute(_PG_CLAIM_SQL, (key, form, _cutoff(window)))
+                    if cur.fetchone() is None:
+                        conn.rollback()
+                        return False
+        return True
+
+    def prune_submissions(self, older_than):
+        with self._connection() as conn:
+            with conn, conn.cursor() as cur:
+                cur.execute("DELETE FROM form_submissions WHERE created_at < %s", (_cutoff(older_than),))
+                return cur.rowcount
+
+
+# --- SQLite ---
+# Same text format as _cutoff(), so timestamps sort and compare as strings
+_SQLITE_NOW = "strftime('%Y-%m-%dT%H:%M:%f+00:00', 'now')"
+
+# (user_version, [statements]) - mirrors migrations.py for the embedded backend
+SQLITE_SCHEMA = [
+    (1, [
+        f"""
+        CREATE TABLE IF NOT EXISTS inquiries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL DEFAULT ({_SQLITE_NOW}),
+            name TEXT NOT NULL,
+            email TEXT NOT NULL,
+            company TEXT,
+            business_needs TEXT NOT NULL,
+            service_type TEXT NOT NULL,
+            budget_range TEXT NOT NULL,
+            timeline TEXT,
+            project_description TEXT NOT NULL,
+            additional_info TEXT,
+            client_ip TEXT,
+            user_agent TEXT
+        )
+        """,
+        f"""
+        CREATE TABLE IF NOT EXISTS newsletter_subscriptions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL DEFAULT ({_SQLITE_NOW}),
+            email TEXT UNIQUE NOT NULL,
+            source_page TEXT,
+            client_ip TEXT,
+            user_agent TEXT
+        )
+        """,
+    ]),
+    (2, [
+        "CREATE INDEX IF NOT EXISTS inquiries_created_id_idx ON inquiries (created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS inquiries_service_created_idx "
+        "ON inquiries (service_type, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS inquiries_budget_created_idx "
+        "ON inquiries (budget_range, created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS inquiries_email_created_idx "
+        "ON inquiries (lower(email), created_at DESC, id DESC)",
+    ]),
+    (3, [
+        f"""
+        CREATE TABLE IF NOT EXISTS form_submissions (
+            submission_key TEXT PRIMARY KEY,
+            form TEXT NOT NULL,
+            created_at TEXT NOT NULL DEFAULT ({_SQLITE_NOW})
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS form_submissions_created_idx ON form_submissions (created_at)",
+    ]),
+]
+
+# Statements are constants so sqlite3's per-connection statement cache keeps them prepared
+_SQLITE_INSERT_INQUIRY = (f"INSERT INTO inquiries ({', '.join(INQUIRY_COLUMNS)}) "
+                          f"VALUES ({', '.join('?' * len(INQUIRY_COLUMNS))})")
+_SQLITE_SUBSCRIBE = ("INSERT INTO newsletter_subscriptions (email, source_page, client_ip, user_agent) "
+                     "VALUES (?, ?, ?, ?) ON CONFLICT (email) DO NOTHING")
+_SQLITE_CLAIM = f"""
+    INSERT INTO form_submissions (submission_key, form)
+    VALUES (?, ?)
+    ON CONFLICT (submission_key) DO UPDATE SET created_at = {_SQLITE_NOW}
+    WHERE form_submissions.created_at < ?
+    RETURNING submission_key
+"""
+
+
+class _ClaimHeld(Exception):
+    pass
+
+
+def _sqlite_timestamp(value):
+    return value.astimezone(timezone.utc).isoformat(timespec='milliseconds')
+
+
+def _sqlite_row(row):
+    """created_at text -> aware datetime, like psycopg2 returns it."""
+    return (row[0], datetime.fromisoformat(row[1])) + tuple(row[2:])
+
+
+class SQLiteStorage(Storage):
+    """Embedded backend: one connection per thread (and per process after fork)."""
+
+    name = 'sqlite'
+
+    def __init__(self, path, busy_timeout=5.0, cache_mb=32, mmap_mb=128, statement_cache=128):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self.cache_mb = cache_mb
+        self.mmap_mb = mmap_mb
+        self.statement_cache = statement_cache
+        self._local = threading.local()
+        self._migrated = False
+        self._migrate_lock = threading.Lock()
+
+    def _connect(self):
+        if os.path.dirname(self.path):
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # isolation_level=None: no implicit BEGIN, transactions are explicit below
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None,
+                               check_same_thread=False, cached_statements=self.statement_cache)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # durable at checkpoints; no fsync per commit
+        conn.execute(f'PRAGMA busy_timeout={int(self.busy_timeout * 1000)}')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_mb * 1024)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_mb * 1024 * 1024)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        return conn
+
+    def _thread_conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = self._connect()
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _conn(self):
+        if not self._migrated:
+            self.migrate()
+        return self._thread_conn()
+
+    @contextmanager
+    def _transaction(self, conn):
+        # IMMEDIATE takes the write lock up front, so busy_timeout applies instead of
+        # failing with SQLITE_BUSY on the lock upgrade mid-transaction
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+    def migrate(self):
+        with self._migrate_lock:
+            if self._migrated:
+                return []
+            conn = self._thread_conn()
+            applied = []
+            with self._transaction(conn):
+                version = conn.execute('PRAGMA user_version').fetchone()[0]
+                for target, statements in SQLITE_SCHEMA:
+                    if target <= version:
+                        continue
+                    for statement in statements:
+                        conn.execute(statement)
+                    conn.execute(f'PRAGMA user_version={target}')
+                    applied.append(target)
+            for target in applied:
+                log.info("Applied SQLite schema version", version=target)
+            self._migrated = True
+            return applied
+
+    def insert_inquiries(self, rows):
+        conn = self._conn()
+        with self._transaction(conn):
+            conn.executemany(_SQLITE_INSERT_INQUIRY, rows)
+
+    def fetch_inquiries(self, filters, cursor=None, limit=50):
+        sql, params = inquiry_queries.page_query(filters, cursor, limit, param='?',
+                                                 timestamp=_sqlite_timestamp)
+        rows = [_sqlite_row(row) for row in self._conn().execute(sql, params)]
+        return inquiry_queries.page_result(rows, limit)
+
+    def iter_inquiries(self, filters):
+        sql, params = inquiry_queries.export_query(filters, param='?')
+        # a dedicated cursor steps through the result lazily (constant memory)
+        for row in self._conn().execute(sql, params):
+            yield _sqlite_row(row)
+
+    def subscribe(self, email, source_page=None, client_ip=None, user_agent=None):
+        conn = self._conn()
+        with self._transaction(conn):
+            return conn.execute(_SQLITE_SUBSCRIBE, (email, source_page, client_ip, user_agent)).rowcount == 1
+
+    def import_newsletter(self, fileobj, source_page='import'):
+        counters = {'read': 0, 'valid': 0, 'invalid': 0, 'inserted': 0, 'duplicates': 0}
+        conn = self._conn()
+        with self._transaction(conn):
+            before = conn.total_changes
+            conn.executemany(
+                "INSERT INTO newsletter_subscriptions (email, source_page) VALUES (?, NULLIF(?, '')) "
+                "ON CONFLICT (email) DO NOTHING",
+                newsletter.iter_csv_emails(fileobj, source_page, counters),
+            )
+            counters['inserted'] = conn.total_changes - before
+        counters['duplicates'] = counters['valid'] - counters['inserted']
+        return counters
+
+    def claim_submission(self, keys, form):
+        conn = self._conn()
+        try:
+            with self._transaction(conn):
+                for key, window in keys:
+                    if conn.execute(_SQLITE_CLAIM, (key, form, _cutoff(window))).fetchone() is None:
+                        raise _ClaimHeld(key)  # rolls back the keys claimed so far
+        except _ClaimHeld:
+            return False
+        return True
+
+    def prune_submissions(self, older_than):
+        conn = self._conn()
+        with self._transaction(conn):
+            return conn.execute("DELETE FROM form_submissions WHERE created_at < ?",
+                                (_cutoff(older_than),)).rowcount
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def open_storage(backend, connection_factory=None, sqlite_path=None):
+    """Storage for ``backend`` ('postgres' or 'sqlite')."""
+    backend = (backend or 'postgres').lower()
+    if backend == 'postgres':
+        return PostgresStorage(connection_factory)
+    if backend == 'sqlite':
+        return SQLiteStorage(sqlite_path)
+    raise ValueError(f"unknown STORAGE_BACKEND {backend!r} (expected one of {', '.join(BACKENDS)})")
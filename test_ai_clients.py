@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Keep-alive AI upstream clients (ai_clients.py) with fake SDK and requests
+modules: one client set per configuration, the reuse counters, and retiring
+the old set on a configuration change without closing it under a caller
+that still holds it.
+"""
+import threading
+
+import ai_clients
+from ai_clients import UpstreamClients
+
+
+class FakeOpenAI:
+    def __init__(self, api_key, base_url, http_client=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.http_client = http_client
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, num_connections, num_requests):
+        self.num_connections = num_connections
+        self.num_requests = num_requests
+
+
+class FakeAdapter:
+    def __init__(self, pool_connections, pool_maxsize):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.poolmanager = type('PoolManager', (), {'pools': {}})()
+
+
+class FakeSession:
+    def __init__(self):
+        self.adapters = {}
+        self.closed = False
+
+    def mount(self, prefix, adapter):
+        self.adapters[prefix] = adapter
+
+    def close(self):
+        self.closed = True
+
+
+class FakeRequests:
+    Session = FakeSession
+    adapters = type('adapters', (), {'HTTPAdapter': FakeAdapter})
+
+
+def test_clients_are_reused_for_the_same_configuration():
+    clients = UpstreamClients(pool_connections=2, pool_maxsize=8)
+    with clients.openai_client(FakeOpenAI, 'key', 'https://a.invalid/v1', 'm') as first:
+        pass
+    with clients.openai_client(FakeOpenAI, 'key', 'https://a.invalid/v1', 'm') as second:
+        assert second is first and not first.closed
+    with clients.session(FakeRequests, 'key', 'https://a.invalid/v1', 'm') as session:
+        assert session.adapters['https://'] is session.adapters['http://']
+        assert session.adapters['https://'].pool_maxsize == 8
+    with clients.session(FakeRequests, 'key', 'https://a.invalid/v1', 'm') as again:
+        assert again is session
+    stats = clients.stats()
+    assert (stats['rebuilds'], stats['retired'], stats['session_requests']) == (1, 0, 2)
+    clients.close()
+    assert first.closed and session.closed
+
+
+def test_reuse_ratios():
+    clients = UpstreamClients()
+    assert clients.stats()['sdk_reuse_ratio'] is None and clients.stats()['session_reuse_ratio'] is None
+    with clients.session(FakeRequests, 'key', 'https://a.invalid/v1') as session:
+        session.adapters['https://'].poolmanager.pools['a.invalid'] = FakePool(1, 4)
+    # four SDK requests over one TCP + TLS connection
+    for _ in range(4):
+        request = type('Request', (), {'extensions': {}})()
+        clients._on_request(request)
+    request.extensions['trace']('connection.connect_tcp.complete', {})
+    request.extensions['trace']('connection.start_tls.complete', {})
+    stats = clients.stats()
+    assert (stats['session_connections'], stats['session_pool_requests']) == (1, 4)
+    assert stats['session_reuse_ratio'] == stats['sdk_reuse_ratio'] == 0.75
+    assert (stats['sdk_requests'], stats['sdk_connections'], stats['sdk_tls_handshakes']) == (4, 1, 1)
+
+
+def test_config_change_retires_unused_clients_at_once():
+    clients = UpstreamClients()
+    with clients.openai_client(FakeOpenAI, 'old-key', 'https://a.invalid/v1') as old:
+        pass
+    with clients.openai_client(FakeOpenAI, 'new-key', 'https://a.invalid/v1') as new:
+        assert new is not old and new.api_key == 'new-key'
+        assert old.closed and not new.closed
+    stats = clients.stats()
+    assert (stats['rebuilds'], stats['retired'], stats['retired_in_use']) == (2, 1, 0)
+
+
+def test_config_change_waits_for_callers_still_holding_the_old_clients():
+    clients = UpstreamClients()
+    holding, rotated = threading.Event(), threading.Event()
+    seen = {}
+
+    def in_flight():
+        with clients.session(FakeRequests, 'old-key', 'https://a.invalid/v1') as session:
+            seen['old'] = session
+            holding.set()
+            rotated.wait(5)
+            seen['closed_while_held'] = session.closed
+
+    worker = threading.Thread(target=in_flight)
+    worker.start()
+    assert holding.wait(5)
+    with clients.session(FakeRequests, 'new-key', 'https://a.invalid/v1') as session:
+        assert session is not seen['old']
+    rotated.set()
+    worker.join(5)
+    assert seen['closed_while_held'] is False
+    assert seen['old'].closed  # closed by the last user on the way out
+    assert not session.closed
+    stats = clients.stats()
+    assert (stats['rebuilds'], stats['retired'], stats['retired_in_use']) == (2, 1, 1)
+
+
+def test_forked_child_drops_inherited_clients_without_closing(monkeypatch):
+    clients = UpstreamClients()
+    with clients.openai_client(FakeOpenAI, 'key', 'https://a.invalid/v1') as parent:
+        pass
+    monkeypatch.setattr(ai_clients.os, 'getpid', lambda: -1)
+    with clients.openai_client(FakeOpenAI, 'key', 'https://a.invalid/v1') as child:
+        assert child is not parent
+    assert not parent.closed
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Static asset pipeline (assets.py): the CSS minifier, the fingerprinted
+build and its manifest, and serving ``/static/dist/`` with the right
+encoding and cache headers.
+"""
+import gzip
+import json
+import os
+
+import pytest
+
+import assets
+from assets import DIST_DIR, IMMUTABLE, MANIFEST_NAME, build, fingerprint, hashed_name, minify_css
+
+
+@pytest.mark.parametrize('source, expected', [
+    ('/* theme */\np > a , b {\n    margin: 0 auto ;\n}\n', 'p>a,b{margin:0 auto}'),
+    ('a :hover { color: red; }', 'a :hover{color:red}'),
+    ('a:hover{color:red}', 'a:hover{color:red}'),
+    ('a::before { content: " > , ; } /* x */"; }', 'a::before{content:" > , ; } /* x */"}'),
+    (".x { background: url('a, b.png') no-repeat; }", ".x{background:url('a, b.png') no-repeat}"),
+    ('p { content: "say \\"hi ,  you\\"" }', 'p{content:"say \\"hi ,  you\\""}'),
+    ('@media (max-width: 600px) { .a { width: calc(100% - 2px); } }',
+     '@media (max-width:600px){.a{width:calc(100% - 2px)}}'),
+    ('.a{}/* unterminated " in a comment */.b{}', '.a{}.b{}'),
+])
+def test_minify_css(source, expected):
+    assert minify_css(source) == expected
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / 'styles.css').write_text('body {\n    color: black;\n}\n', encoding='utf-8')
+    (tmp_path / 'chatbot.js').write_text('function hi() {\n    return 1;   \n}\n\n', encoding='utf-8')
+    return tmp_path
+
+
+def test_build_writes_fingerprinted_files_and_manifest(static_dir, monkeypatch):
+    monkeypatch.setattr(assets, 'brotli', None)
+    manifest = build(str(static_dir), ('styles.css', 'chatbot.js', 'missing.css'))
+    data = b'body{color:black}'
+    assert manifest['styles.css'] == f'{DIST_DIR}/{hashed_name("styles.css", fingerprint(data))}'
+    assert 'missing.css' not in manifest
+    dist = static_dir / DIST_DIR
+    assert json.loads((dist / MANIFEST_NAME).read_text(encoding='utf-8')) == manifest
+    built = static_dir / manifest['styles.css']
+    assert built.read_bytes() == data
+    assert gzip.decompress((static_dir / (manifest['styles.css'] + '.gz')).read_bytes()) == data
+    assert not os.path.exists(str(built) + '.br')
+
+
+def test_fingerprint_changes_with_content_only(static_dir):
+    first = build(str(static_dir), ('styles.css',))
+    assert build(str(static_dir), ('styles.css',)) == first
+    (static_dir / 'styles.css').write_text('body { color: red; }', encoding='utf-8')
+    assert build(str(static_dir), ('styles.css',))['styles.css'] != first['styles.css']
+
+
+def test_serving_hashed_assets_and_manifest(static_dir, monkeypatch):
+    flask = pytest.importorskip('flask')
+    monkeypatch.setattr(assets, 'brotli', None)
+    build(str(static_dir), ('styles.css',))
+    app = flask.Flask(__name__, static_folder=str(static_dir), static_url_path='/static')
+    manifest = assets.AssetManifest(app)
+    url = manifest.url('styles.css')
+    assert url.startswith('/static/dist/styles.') and manifest.url('other.css') == '/static/other.css'
+    client = app.test_client()
+
+    resp = client.get(url, headers={'Accept-Encoding': 'gzip'})
+    assert resp.status_code == 200
+    assert resp.headers['Content-Encoding'] == 'gzip' and resp.headers['Vary'] == 'Accept-Encoding'
+    assert resp.headers['Cache-Control'] == IMMUTABLE
+    assert gzip.decompress(resp.data) == b'body{color:black}'
+    assert client.get(url, headers={'Accept-Encoding': 'identity'}).data == b'body{color:black}'
+
+    resp = client.get(f'/static/{DIST_DIR}/{MANIFEST_NAME}')
+    assert resp.status_code == 200 and resp.headers['Cache-Control'] == 'no-cache'
+    assert client.get(f'/static/{DIST_DIR}/nope.css').status_code == 404
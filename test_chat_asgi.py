@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Async /api/chat (chat_asgi.py) driven as a plain ASGI callable with a fake
+upstream client: a normal reply, malformed upstream bodies, the 413 body
+limit, and the same JSON as the Flask ``api_chat`` view.
+"""
+import asyncio
+import json
+import os
+import tempfile
+
+import pytest
+
+pytest.importorskip('flask')
+pytest.importorskip('flask_mail')
+
+os.environ.setdefault('MAIL_PORT', '587')
+# keep test sessions out of the checkout's chat_store.sqlite3
+os.environ.setdefault('CHAT_STORE_DB', os.path.join(tempfile.mkdtemp(), 'chat_store.sqlite3'))
+
+import app as app_module  # noqa: E402
+import chat_asgi  # noqa: E402
+import jsonlog  # noqa: E402
+from chat_asgi import ChatASGI  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class FakeAsyncClient:
+    def __init__(self, payload):
+        self.payload = payload
+        self.requests = []
+
+    async def post(self, url, headers=None, json=None):
+        self.requests.append((url, json))
+        return FakeResponse(self.payload)
+
+    async def aclose(self):
+        pass
+
+
+def _reply(content):
+    return {'choices': [{'message': {'role': 'assistant', 'content': content}}]}
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    monkeypatch.setattr(app_module, 'start_background_workers', lambda: None)
+    monkeypatch.setattr(app_module.chat_limiter, 'check', lambda ip: 0)
+    monkeypatch.setattr(app_module, 'reply_cache', None)
+    monkeypatch.setattr(app_module, 'site_answer', lambda message: None)
+    monkeypatch.setattr(app_module, 'fallback_reply', lambda message: 'fallback')
+    monkeypatch.setenv('AIMLAPI_API_KEY', 'test-key')
+    monkeypatch.setenv('AIMLAPI_BASE_URL', 'https://upstream.invalid/v1')
+    # Flask test requests bind a request ID in this thread's context; don't leak it
+    token = jsonlog.request_id_var.set(None)
+    yield ChatASGI()
+    jsonlog.request_id_var.reset(token)
+
+
+def call(asgi, body, method='POST', headers=()):
+    """Run one request through ``asgi``; returns (status, headers, parsed JSON)."""
+    if isinstance(body, dict):
+        body = json.dumps(body).encode('utf-8')
+    scope = {'type': 'http', 'method': method, 'path': '/api/chat', 'client': ('127.0.0.1', 5000),
+             'headers': [(b'content-type', b'application/json')] + list(headers)}
+    events = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return events.pop(0) if events else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi(scope, receive, send))
+    start, payload = sent[0], b''.join(m.get('body', b'') for m in sent[1:])
+    return start['status'], dict(start['headers']), json.loads(payload)
+
+
+def test_upstream_reply(chat):
+    chat.upstream._client = FakeAsyncClient(_reply('  Cześć!  '))
+    status, headers, data = call(chat, {'message': 'hej'})
+    assert status == 200
+    assert headers[b'content-type'] == b'application/json'
+    assert data['ok'] is True and data['reply'] == 'Cześć!'
+    assert data['history'][-2:] == [['user', 'hej'], ['assistant', 'Cześć!']]
+    url, request_json = chat.upstream._client.requests[0]
+    assert url == 'https://upstream.invalid/v1/chat/completions'
+    assert request_json['messages'][-1] == {'role': 'user', 'content': 'hej'}
+
+
+@pytest.mark.parametrize('payload', [None, [], 'oops', {'choices': []}, {'choices': ['x']},
+                                     {'choices': [{'message': {'content': None}}]}])
+def test_malformed_upstream_body_uses_fallback(chat, payload):
+    chat.upstream._client = FakeAsyncClient(payload)
+    status, _, data = call(chat, {'message': 'hej'})
+    assert (status, data['ok'], data['reply']) == (200, True, 'fallback')
+
+
+def test_oversized_body_is_rejected(chat):
+    body = json.dumps({'message': 'x' * (chat_asgi.MAX_BODY + 1)}).encode('utf-8')
+    status, _, data = call(chat, body)
+    assert status == 413 and data['ok'] is False
+    declared = [(b'content-length', str(chat_asgi.MAX_BODY + 1).encode())]
+    assert call(chat, b'{}', headers=declared)[0] == 413
+
+
+def test_other_methods_and_paths(chat):
+    assert call(chat, b'', method='GET')[0] == 405
+    assert call(chat, {'message': '  '})[0] == 400
+    assert call(chat, b'not json')[0] == 400
+
+
+def test_same_json_as_flask_view(chat, monkeypatch):
+    # no API key: both stacks answer with the fallback and record the turn
+    monkeypatch.delenv('AIMLAPI_API_KEY')
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    client = app_module.app.test_client()
+    for body in ({'message': 'jaki jest cennik?'}, {'message': ''}, {'message': 'hej', 'session_id': 'bad id'}):
+        flask_resp = client.post('/api/chat', json=body)
+        status, _, data = call(chat, body)
+        expected = flask_resp.get_json()
+        assert status == flask_resp.status_code
+        assert data.keys() == expected.keys()
+        if status == 200:
+            assert data['reply'] == expected['reply']
+            assert data['session_id'] != body.get('session_id')
+            assert data['history'] == [['user', body['message']], ['assistant', data['reply']]]
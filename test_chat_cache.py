@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Chatbot reply cache (chat_cache.py): key normalization, TTL expiry, LRU
+eviction, single-flight deduplication and the shared SQLite tier.
+"""
+import threading
+import time
+
+import chat_cache
+from chat_cache import ReplyCache, make_key, normalize_message
+
+
+def test_key_ignores_case_whitespace_and_trailing_punctuation():
+    assert normalize_message('  Jaki   jest CENNIK?! ') == 'jaki jest cennik'
+    history = [{'role': 'system', 'content': 'prompt'}]
+    a = make_key(history + [{'role': 'user', 'content': 'Cennik?'}], 'model-a')
+    b = make_key(history + [{'role': 'user', 'content': ' cennik '}], 'model-a')
+    assert a == b
+    assert make_key(history + [{'role': 'user', 'content': 'cennik'}], 'model-b') != a
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(chat_cache.time, 'time', lambda: now[0])
+    cache = ReplyCache(ttl=10)
+    cache.put('k', 'reply')
+    now[0] += 9
+    assert cache.get('k') == 'reply'
+    now[0] += 2
+    assert cache.get('k') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_lru_evicts_least_recently_used():
+    cache = ReplyCache(max_entries=2)
+    cache.put('a', 'A')
+    cache.put('b', 'B')
+    assert cache.get('a') == 'A'    # 'b' is now the oldest
+    cache.put('c', 'C')
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == ('A', 'C')
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['entries'] == 2
+
+
+def test_empty_replies_and_disabled_cache_store_nothing():
+    cache = ReplyCache()
+    cache.put('k', '')
+    assert cache.get('k') is None
+    disabled = ReplyCache(max_entries=0)
+    disabled.put('k', 'reply')
+    assert disabled.get('k') is None
+
+
+def test_concurrent_callers_share_one_computation():
+    cache = ReplyCache()
+    gate, calls = threading.Event(), []
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return 'answer'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('k', compute)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()['coalesced'] < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    coalesced = cache.stats()['coalesced']
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+    assert coalesced == 3, 'callers were not coalesced within 5s'
+    assert calls == [1]
+    assert results == ['answer'] * 4
+
+
+def test_sqlite_tier_is_shared_and_purged_on_prompt_change(tmp_path):
+    path = str(tmp_path / 'reply_cache.sqlite3')
+    worker_a = ReplyCache(sqlite_path=path, fingerprint='prompt-1')
+    worker_a.put('k', 'reply')
+    worker_b = ReplyCache(sqlite_path=path, fingerprint='prompt-1')
+    assert worker_b.get('k') == 'reply'
+    assert worker_b.stats()['sqlite_hits'] == 1
+    worker_c = ReplyCache(sqlite_path=path, fingerprint='prompt-2')
+    assert worker_c.get('k') is None
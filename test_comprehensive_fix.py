@@ -1,107 +1,46 @@
 #!/usr/bin/env python3
 """
-Test script to verify the comprehensive background layering fix.
-This script checks if all conflicts have been resolved and clean hover effects are in place.
+Comprehensive background layering fix: ::before layers and the card overlay
+are switched off for .filar-card and a single clean hover background wins.
 """
+import pytest
 
-import re
-import os
+from css_index import THEMES
+
+
+@pytest.mark.parametrize('theme', THEMES)
+def test_before_pseudo_element_disabled(css, theme):
+    winner = css.cascade('.filar-card::before', 'display', theme)
+    assert winner is not None, ".filar-card::before display rule not found"
+    selector, decl = winner
+    assert decl.value == 'none' and decl.important, f"{selector.text} {{ display: {decl.value} }}"
+
+
+def test_card_overlay_disabled(css):
+    assert any(decl.value == '0' and decl.important
+               for _, decl in css.declarations('.card-overlay', 'opacity', within='.filar-card')), \
+        ".filar-card .card-overlay { opacity: 0 !important } not found"
+
+
+def test_fix_section_present(css):
+    assert any('COMPREHENSIVE FIX FOR BACKGROUND LAYERING ISSUE' in c for c in css.comments)
+
+
+def test_high_specificity_selectors(css):
+    assert any(s.text.startswith('html body .filar-card') for s in css.selectors)
+
+
+@pytest.mark.parametrize('theme', THEMES)
+def test_clean_hover_background(css, theme):
+    winner = css.cascade('.filar-card:hover', 'background', theme)
+    assert winner is not None, ".filar-card:hover background not found"
+    selector, decl = winner
+    assert 'linear-gradient' in decl.value and decl.important, f"{selector.text} {{ background: {decl.value} }}"
+
+
+def test_dark_mode_styles_preserved(css):
+    assert any(s.theme == 'dark' and s.subject.startswith('.filar-card') for s in css.selectors)
 
-def test_comprehensive_fix():
-    """Test that the comprehensive fix resolves all issues."""
-    
-    css_file_path = '/KARLAB-SOFTWARE/static/styles.css'
-    
-    if not os.path.exists(css_file_path):
-        print("❌ CSS file not found!")
-        return False
-    
-    with open(css_file_path, 'r', encoding='utf-8') as file:
-        css_content = file.read()
-    
-    print("🔍 TESTING COMPREHENSIVE BACKGROUND LAYERING FIX")
-    print("=" * 60)
-    
-    # Test 1: Check if ::before pseudo-elements are disabled
-    before_disabled_pattern = r'\.filar-card::before\s*\{[^}]*display:\s*none\s*!important'
-    if re.search(before_disabled_pattern, css_content):
-        print("✅ Test 1 PASSED: ::before pseudo-elements are disabled")
-        test1_passed = True
-    else:
-        print("❌ Test 1 FAILED: ::before pseudo-elements not properly disabled")
-        test1_passed = False
-    
-    # Test 2: Check if card overlay is disabled for filar-card
-    overlay_disabled_pattern = r'\.filar-card\s+\.card-overlay[^}]*opacity:\s*0\s*!important'
-    if re.search(overlay_disabled_pattern, css_content):
-        print("✅ Test 2 PASSED: Card overlay disabled for filar-card")
-        test2_passed = True
-    else:
-        print("❌ Test 2 FAILED: Card overlay not properly disabled")
-        test2_passed = False
-    
-    # Test 3: Check if comprehensive override rules exist
-    comprehensive_pattern = r'COMPREHENSIVE FIX FOR BACKGROUND LAYERING ISSUE'
-    if comprehensive_pattern in css_content:
-        print("✅ Test 3 PASSED: Comprehensive fix section exists")
-        test3_passed = True
-    else:
-        print("❌ Test 3 FAILED: Comprehensive fix section not found")
-        test3_passed = False
-    
-    # Test 4: Check if high-specificity selectors are used
-    high_specificity_pattern = r'html\s+body\s+\.filar-card'
-    if re.search(high_specificity_pattern, css_content):
-        print("✅ Test 4 PASSED: High-specificity selectors found")
-        test4_passed = True
-    else:
-        print("❌ Test 4 FAILED: High-specificity selectors not found")
-        test4_passed = False
-    
-    # Test 5: Check if clean hover background is defined
-    clean_hover_pattern = r'\.filar-card:hover[^}]*background:[^;}]*linear-gradient[^;}]*!important'
-    if re.search(clean_hover_pattern, css_content):
-        print("✅ Test 5 PASSED: Clean hover background defined")
-        test5_passed = True
-    else:
-        print("❌ Test 5 FAILED: Clean hover background not found")
-        test5_passed = False
-    
-    # Test 6: Check if dark mode styles are preserved
-    dark_mode_pattern = r'html\[data-theme="dark"\]\s+\.filar-card'
-    if re.search(dark_mode_pattern, css_content):
-        print("✅ Test 6 PASSED: Dark mode styles preserved")
-        test6_passed = True
-    else:
-        print("❌ Test 6 FAILED: Dark mode styles not found")
-        test6_passed = False
-    
-    all_tests = [test1_passed, test2_passed, test3_passed, test4_passed, test5_passed, test6_passed]
-    passed_tests = sum(all_tests)
-    
-    print(f"\n📊 COMPREHENSIVE FIX TEST RESULTS: {passed_tests}/6 tests passed")
-    
-    if passed_tests == 6:
-        print("🎉 ALL TESTS PASSED! Background layering issue should be completely resolved.")
-        print("\n✨ Expected behavior:")
-        print("- No dark overlay on hover")
-        print("- Clean single background on normal state")
-        print("- Smooth transition to lighter background on hover")
-        print("- No multiple backgrounds layering")
-        return True
-    else:
-        print("⚠️  Some tests failed. The fix may need adjustments.")
-        return False
 
 if __name__ == "__main__":
-    success = test_comprehensive_fix()
-    
-    if success:
-        print("\n🚀 SOLUTION READY FOR TESTING")
-        print("The comprehensive fix should resolve:")
-        print("1. ❌ Old background + new background layering")
-        print("2. ❌ Dark bar (card-overlay) appearing on hover") 
-        print("3. ❌ Multiple conflicting CSS rules")
-        print("\n✅ Clean hover effect with single background transition")
-    else:
-        print("\n🔧 Additional work needed to complete the fix.")
\ No newline at end of file
+    raise SystemExit(pytest.main([__file__, '-q']))
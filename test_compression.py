@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Response compression (compression.py): Accept-Encoding negotiation,
+COMPRESS_LEVELS parsing, and bodies encoded outside Flask (chat_asgi).
+"""
+import gzip
+import zlib
+
+import pytest
+
+pytest.importorskip('flask')
+
+from compression import Compression, is_compressible, negotiate, parse_levels  # noqa: E402
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip;q=1.0, br;q=0.5', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('BR', 'br'),
+    ('*', 'br'),
+    ('*;q=0.1, br;q=0', 'gzip'),
+    ('identity', None),
+    ('gzip;q=abc', None),
+    ('', None),
+    (None, None),
+])
+def test_negotiate(header, expected):
+    assert negotiate(header, ('br', 'gzip')) == expected
+
+
+def test_negotiate_only_offers_available_encodings():
+    assert negotiate('br', ('gzip',)) is None
+    assert negotiate('br, gzip;q=0.5', ('gzip',)) == 'gzip'
+
+
+def test_parse_levels():
+    assert parse_levels('text/html=6:5, Application/JSON=5,bad,text/csv=x:1,=') == {
+        'text/html': (6, 5),
+        'application/json': (5, 5),
+    }
+    assert parse_levels(None) == {}
+
+
+def test_is_compressible():
+    assert is_compressible('text/html')
+    assert is_compressible('application/ld+json')
+    assert not is_compressible('image/png')
+    assert not is_compressible(None)
+
+
+def test_encode_outside_flask():
+    compression = Compression(min_size=10)
+    compression.encodings = ('gzip',)
+    body = b'{"reply": "' + b'a' * 200 + b'"}'
+    data, headers = compression.encode(body, 'application/json', 'gzip')
+    assert gzip.decompress(data) == body
+    assert headers == [('Content-Encoding', 'gzip'), ('Vary', 'Accept-Encoding')]
+    assert compression.encode(body, 'application/json', None) == (body, [('Vary', 'Accept-Encoding')])
+    assert compression.encode(b'short', 'application/json', 'gzip') == (b'short', [])
+    assert compression.encode(body, 'image/png', 'gzip') == (body, [])
+
+
+def test_stream_chunks_are_flushed_immediately():
+    compression = Compression()
+    decoder = zlib.decompressobj(31)
+    stream = compression.compress_stream(iter([b'{"t": "a"}\n', '', '{"t": "b"}\n']), 'gzip',
+                                         'application/x-ndjson')
+    assert decoder.decompress(next(stream)) == b'{"t": "a"}\n'
+    assert decoder.decompress(next(stream)) == b'{"t": "b"}\n'
+    decoder.decompress(next(stream))
+    assert decoder.eof
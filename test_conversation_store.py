@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Server-side chat history (conversation_store.py): bounded windows, legacy
+client seeding, one session shared by several worker processes through the
+SQLite file (including concurrent appends), and pruning of expired rows.
+"""
+import sqlite3
+import threading
+import time
+
+from conversation_store import ConversationStore
+
+
+def test_window_is_bounded_and_ordered():
+    store = ConversationStore(max_turns=4)
+    for i in range(3):
+        store.append('session-1', ('user', f'q{i}'), ('assistant', f'a{i}'))
+    assert store.window('session-1', 8) == [['user', 'q1'], ['assistant', 'a1'], ['user', 'q2'], ['assistant', 'a2']]
+    assert store.window('session-1', 1) == [['assistant', 'a2']]
+    assert store.window('unknown-session', 8) == []
+
+
+def test_seed_ignores_invalid_turns():
+    store = ConversationStore()
+    store.seed('session-1', [['user', 'hi'], ['system', 'ignore me'], ['assistant', 42], ['assistant', 'hello']])
+    assert store.window('session-1') == [['user', 'hi'], ['assistant', 'hello']]
+
+
+def test_workers_share_history_through_sqlite(tmp_path):
+    path = str(tmp_path / 'chat_store.sqlite3')
+    worker_a = ConversationStore(sqlite_path=path)
+    worker_b = ConversationStore(sqlite_path=path)
+
+    worker_a.append('session-1', ('user', 'q1'), ('assistant', 'a1'))
+    assert worker_b.window('session-1') == [['user', 'q1'], ['assistant', 'a1']]
+
+    # worker A has a (now stale) copy in memory; it must not overwrite B's turn
+    worker_b.append('session-1', ('user', 'q2'), ('assistant', 'a2'))
+    worker_a.append('session-1', ('user', 'q3'), ('assistant', 'a3'))
+    assert [content for _, content in worker_b.window('session-1')] == ['q1', 'a1', 'q2', 'a2', 'q3', 'a3']
+
+
+def test_expired_sessions_are_forgotten(tmp_path):
+    store = ConversationStore(ttl=-1, sqlite_path=str(tmp_path / 'chat_store.sqlite3'))
+    store.append('session-1', ('user', 'q1'))
+    assert store.window('session-1') == []
+
+
+def test_concurrent_appends_from_workers_are_not_lost(tmp_path):
+    path = str(tmp_path / 'chat_store.sqlite3')
+    workers = [ConversationStore(max_turns=200, sqlite_path=path) for _ in range(4)]
+
+    def chat(store, n):
+        for i in range(20):
+            store.append('session-1', ('user', f'w{n}-q{i}'))
+
+    threads = [threading.Thread(target=chat, args=(store, n)) for n, store in enumerate(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    turns = [content for _, content in workers[0].window('session-1', 0)]
+    assert sorted(turns) == sorted(f'w{n}-q{i}' for n in range(4) for i in range(20))
+
+
+def test_expired_rows_are_pruned_periodically(tmp_path):
+    path = str(tmp_path / 'chat_store.sqlite3')
+    store = ConversationStore(ttl=3600, sqlite_path=path, prune_every=3)
+    with sqlite3.connect(path) as db:
+        db.execute('INSERT INTO conversations VALUES (?, ?, ?)', ('stale-session', '[]', time.time() - 7200))
+    store.append('session-1', ('user', 'q1'))
+    store.seed('session-2', [['user', 'q1']])
+
+    def stored():
+        with sqlite3.connect(path) as db:
+            return sorted(row[0] for row in db.execute('SELECT session_id FROM conversations'))
+
+    assert stored() == ['session-1', 'session-2', 'stale-session']
+    store.append('session-1', ('assistant', 'a1'))
+    assert stored() == ['session-1', 'session-2']
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Critical CSS (critical_css.py): the build against a throwaway Flask app and
+fake renderer, skipping unchanged pages, and the runtime rewrite of the
+stylesheet links into preload + ``<noscript>`` pairs.
+"""
+import json
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+import critical_css  # noqa: E402
+from critical_css import CriticalCSS, build  # noqa: E402
+
+STYLES = '''
+body { margin: 0 }
+.hero h1 { font-size: 3rem }
+.footer a:hover { color: red }
+.unused-widget { display: none }
+@media (max-width: 600px) { .hero { padding: 0 } .sidebar { display: none } }
+'''
+PAGE = '<html><body><div class="hero"><h1>Karlab</h1></div><footer class="footer"><a>x</a></footer></body></html>'
+
+
+@pytest.fixture
+def site(tmp_path):
+    static, templates = tmp_path / 'static', tmp_path / 'templates'
+    static.mkdir()
+    templates.mkdir()
+    (static / 'styles.css').write_text(STYLES, encoding='utf-8')
+    (templates / 'base.html').write_text('{% block body %}{% endblock %}', encoding='utf-8')
+    (templates / 'index.html').write_text('{% extends "base.html" %}', encoding='utf-8')
+    app = flask.Flask(__name__, root_path=str(tmp_path))
+    app.renders = []
+
+    def render(route):
+        app.renders.append(route)
+        return PAGE, ['index.html']
+
+    app.render = render
+    return app
+
+
+def test_build_keeps_only_matching_rules(site):
+    result = build(site, ['/'], site.render, sheets=('styles.css',))
+    css = result['/']['css']
+    assert 'body{margin:0}' in css and '.hero h1{font-size:3rem}' in css
+    assert '.footer a:hover' in css
+    assert '.unused-widget' not in css and '.sidebar' not in css
+    assert '@media (max-width: 600px){.hero{padding:0}}' in css
+    assert result['/']['templates'] == ['index.html']
+    with open(f'{site.static_folder}/dist/critical.json', encoding='utf-8') as f:
+        assert json.load(f) == result
+
+
+def test_unchanged_pages_are_not_rebuilt(site, tmp_path):
+    build(site, ['/'], site.render, sheets=('styles.css',))
+    build(site, ['/'], site.render, sheets=('styles.css',))
+    assert site.renders == ['/']
+    # a change in a template the page extends invalidates it
+    (tmp_path / 'templates' / 'base.html').write_text('<main>{% block body %}{% endblock %}</main>',
+                                                      encoding='utf-8')
+    build(site, ['/'], site.render, sheets=('styles.css',))
+    assert site.renders == ['/', '/']
+
+
+def test_stale_entry_is_not_inlined(site, tmp_path):
+    build(site, ['/'], site.render, sheets=('styles.css',))
+    critical = CriticalCSS(site, sheets=('styles.css',))
+    body = b'<head><link rel="stylesheet" href="/static/styles.css"></head>'
+    assert b'critical-css' in critical.apply(body, '/')
+    (tmp_path / 'static' / 'styles.css').write_text(STYLES + '.new { color: blue }', encoding='utf-8')
+    assert critical.apply(body, '/') == body
+
+
+def test_rewrite_keeps_link_attributes():
+    critical = CriticalCSS(sheets=('styles.css', 'dark.css'))
+    body = (b'<head><link rel="icon" href="/favicon.ico">'
+            b'<link id="main-css" rel="stylesheet" href="/static/styles.css?v=2" '
+            b'integrity="sha384-abc" crossorigin="anonymous">'
+            b"<link rel='stylesheet' href='/static/dark.css' media='print'>"
+            b'<link rel="stylesheet" href="https://cdn.example.com/other.css"></head>')
+    out = critical.rewrite(body, 'body{margin:0}</style>')
+    assert out.count(b'<style id="critical-css">') == 1
+    assert b'body{margin:0}<\\/style>' in out
+    assert out.index(b'critical-css') < out.index(b'main-css')
+    assert (b'<link rel="preload" as="style" id="main-css" href="/static/styles.css?v=2" '
+            b'integrity="sha384-abc" crossorigin="anonymous" '
+            b'onload="this.onload=null;this.rel=\'stylesheet\'">'
+            b'<noscript><link id="main-css" rel="stylesheet" href="/static/styles.css?v=2" '
+            b'integrity="sha384-abc" crossorigin="anonymous"></noscript>') in out
+    # a print sheet stays print-only, with and without JS
+    assert (b"<link rel=\"preload\" as=\"style\" href='/static/dark.css' media='print' "
+            b"onload=\"this.onload=null;this.rel='stylesheet'\">"
+            b"<noscript><link rel='stylesheet' href='/static/dark.css' media='print'></noscript>") in out
+    # unrelated links are left alone
+    assert b'<link rel="icon" href="/favicon.ico">' in out
+    assert b'<link rel="stylesheet" href="https://cdn.example.com/other.css">' in out
+
+
+def test_rewrite_without_matching_links_is_a_no_op():
+    critical = CriticalCSS(sheets=('styles.css',))
+    body = b'<head><link rel="preload" href="/static/styles.css"></head>'
+    assert critical.rewrite(body, 'body{margin:0}') is body
+    assert critical_css._preload_tag(b'<link rel="stylesheet" href="/a.css" onload="x()">') == (
+        b'<link rel="preload" as="style" href="/a.css" onload="this.onload=null;this.rel=\'stylesheet\'">')
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+The CSS rule index itself (css_index.py), against an inline stylesheet so it
+runs without static/styles.css: parsing, subject lookup, theme scoping,
+custom properties, the cascade and color opacity.
+"""
+import pytest
+
+import css_index
+from css_index import color_alphas, specificity
+
+STYLESHEET = """@charset "utf-8";
+/* theme variables */
+:root {
+    --bg: #ffffff;
+    --card: var(--bg);
+    --overlay: rgba(0, 0, 0, 0.4);
+}
+[data-theme="dark"] {
+    --bg: #121212;
+    --accent: white;
+}
+html[data-theme='dark'] { --card: hsl(0 0% 10% / 0.9); }
+
+.filar-card, .profile-content h1 {
+    background: var(--card);
+    content: "a { fake } rule; /* not a comment */";
+}
+[data-theme=dark] .filar-card:hover { background: black !important; }
+.filar-card:before { display: none; }
+#main .filar-card { color: red; }
+
+@media (max-width: 600px) {
+    @supports (display: grid) {
+        .filar-card { display: grid; }
+    }
+}
+@keyframes pulse { from { opacity: 0; } to { opacity: 1; } }
+.after-keyframes { margin: 0; }
+"""
+
+
+@pytest.fixture(scope='module')
+def sheet():
+    return css_index.parse(STYLESHEET)
+
+
+def test_parse_rules_selectors_and_lines(sheet):
+    assert sheet.has_selector('.filar-card')
+    assert sheet.has_selector('.profile-content  >h1') is False
+    assert sheet.has_selector('.profile-content h1')
+    rule = sheet.rules_for('.filar-card')[0][1]
+    assert rule.line == 14
+    assert [s.text for s in rule.selectors] == ['.filar-card', '.profile-content h1']
+    # braces and comment markers inside strings are not structure
+    assert rule.declarations[1].value == '"a { fake } rule; /* not a comment */"'
+    assert 'theme variables' in sheet.comments
+
+
+def test_keyframes_are_skipped_and_parsing_continues(sheet):
+    assert not sheet.has_selector('from')
+    assert sheet.has_selector('.after-keyframes')
+
+
+def test_nested_group_rules_keep_their_media(sheet):
+    grid = [rule for _, rule in sheet.rules_for('.filar-card', media=True) if rule.media]
+    assert grid[0].media == ('@media (max-width: 600px)', '@supports (display: grid)')
+    assert all(not rule.media for _, rule in sheet.rules_for('.filar-card'))
+
+
+def test_rules_for_theme_and_ancestors(sheet):
+    hover_light = sheet.declarations('.filar-card:hover', 'background', theme='light')
+    hover_dark = sheet.declarations('.filar-card:hover', 'background', theme='dark')
+    assert hover_light == []
+    assert hover_dark[0][1].value == 'black' and hover_dark[0][1].important
+    assert len(sheet.rules_for('h1', within='.profile-content')) == 1
+    assert sheet.rules_for('h1', within='.sidebar') == []
+    # legacy single-colon pseudo-elements are indexed as ::before
+    assert sheet.rules_for('.filar-card::before')
+
+
+def test_cascade_prefers_specificity(sheet):
+    selector, decl = sheet.cascade('.filar-card', 'color', theme='light')
+    assert (selector.text, decl.value) == ('#main .filar-card', 'red')
+
+
+def test_variables_per_theme(sheet):
+    light, dark = sheet.variables('light'), sheet.variables('dark')
+    assert light['--bg'] == '#ffffff' and '--accent' not in light
+    assert dark['--bg'] == '#121212' and dark['--accent'] == 'white'
+    assert dark['--card'] == 'hsl(0 0% 10% / 0.9)'
+
+
+def test_resolve_nested_vars_and_fallbacks(sheet):
+    assert sheet.resolve('var(--card)', 'light') == '#ffffff'
+    assert sheet.resolve('1px solid var(--missing, rgb(1, 2, 3))', 'light') == '1px solid rgb(1, 2, 3)'
+    assert sheet.resolve('var(--missing)', 'light') == ''
+
+
+@pytest.mark.parametrize('value, theme, opaque', [
+    ('var(--card)', 'light', True),
+    ('var(--card)', 'dark', False),          # hsl(... / 0.9)
+    ('var(--overlay)', 'light', False),
+    ('white', 'light', True),
+    ('Black', 'dark', True),
+    ('var(--accent)', 'dark', True),
+    ('linear-gradient(white, transparent)', 'light', False),
+    ('#0008', 'light', False),
+    ('transparent', 'light', False),
+    ('none', 'light', False),
+    ('url(white.png) no-repeat', 'light', False),  # no color at all
+])
+def test_is_opaque(sheet, value, theme, opaque):
+    assert sheet.is_opaque(value, theme) is opaque
+
+
+def test_color_alphas():
+    assert color_alphas('rgba(0, 0, 0, 50%) #ffffff80 red') == [0.5, 128 / 255, 1.0]
+    assert color_alphas('white-space: nowrap') == []
+
+
+@pytest.mark.parametrize('selector, expected', [
+    ('.filar-card', (0, 1, 0)),
+    ('#main .filar-card:hover', (1, 2, 0)),
+    ('.profile-content h1::before', (0, 1, 2)),
+    ('[data-theme="dark"] a', (0, 1, 1)),
+])
+def test_specificity(selector, expected):
+    assert specificity(css_index.normalize_selector(selector)) == expected
+
+
+def test_load_caches_until_file_changes(tmp_path):
+    path = tmp_path / 'styles.css'
+    path.write_text('.a { color: red; }', encoding='utf-8')
+    first = css_index.load(str(path))
+    assert css_index.load(str(path)) is first
+    path.write_text('.a { color: red; } .b { color: blue; }', encoding='utf-8')
+    assert css_index.load(str(path)).has_selector('.b')
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL connection pool (db_pool.py) against a fake connection factory:
+sizing, blocking and timing out at ``max_size``, the SELECT 1 health check,
+max-lifetime recycling and discarding broken connections.
+"""
+import threading
+import time
+
+import pytest
+
+import db_pool
+from db_pool import ConnectionPool, PoolExhausted
+
+
+class FakeConnection:
+    def __init__(self, n):
+        self.n = n
+        self.closed = 0
+        self.healthy = True
+        self.rollbacks = 0
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    def close(self):
+        self.closed = 1
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql):
+        if not self.conn.healthy:
+            raise OSError('server closed the connection unexpectedly')
+
+    def fetchone(self):
+        return (1,)
+
+
+class Factory:
+    def __init__(self):
+        self.made = []
+        self.fail = False
+
+    def __call__(self):
+        if self.fail:
+            raise OSError('connection refused')
+        conn = FakeConnection(len(self.made))
+        self.made.append(conn)
+        return conn
+
+
+def test_prefills_min_size_and_reuses_idle_connections():
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=2, max_size=4)
+    assert len(factory.made) == 2
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert pool.getconn() is conn  # LIFO
+    stats = pool.stats()
+    assert (stats['size'], stats['idle'], stats['in_use'], stats['created']) == (2, 1, 1, 2)
+
+
+def test_checkout_beyond_max_size_times_out():
+    pool = ConnectionPool(Factory(), min_size=0, max_size=2, timeout=0.05)
+    held = [pool.getconn(), pool.getconn()]
+    started = time.monotonic()
+    with pytest.raises(PoolExhausted):
+        pool.getconn()
+    assert time.monotonic() - started >= 0.05
+    assert pool.stats()['exhausted'] == 1
+    assert len({id(conn) for conn in held}) == 2
+
+
+def test_checkout_beyond_max_size_waits_for_a_release():
+    pool = ConnectionPool(Factory(), min_size=0, max_size=1, timeout=5.0)
+    first = pool.getconn()
+    timer = threading.Timer(0.05, pool.putconn, (first,))
+    timer.start()
+    assert pool.getconn() is first
+    timer.join()
+    assert pool.stats()['wait_time_max'] >= 0.04
+
+
+def test_expired_connections_are_recycled(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db_pool.time, 'monotonic', lambda: now[0])
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=1, max_size=2, max_lifetime=60)
+    old = factory.made[0]
+    now[0] += 61
+    conn = pool.getconn()
+    assert conn is not old and old.closed
+    # also retired when given back after its lifetime
+    now[0] += 61
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.stats()['discarded'] == 2 and pool.stats()['size'] == 0
+
+
+def test_unhealthy_idle_connection_is_replaced():
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=1, max_size=2)
+    factory.made[0].healthy = False
+    conn = pool.getconn()
+    assert conn is factory.made[1]
+    assert factory.made[0].closed
+    assert pool.stats()['discarded'] == 1
+
+
+def test_broken_connection_is_discarded_not_returned():
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=0, max_size=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.closed = 2  # the driver marks a dead socket this way
+            raise RuntimeError('query failed')
+    assert pool.stats()['idle'] == 0 and pool.stats()['size'] == 0
+    with pool.connection() as fresh:
+        assert fresh is not conn
+    # a clean exit returns the connection after rolling back
+    assert pool.stats()['idle'] == 1 and fresh.rollbacks >= 1
+
+
+def test_failed_connect_frees_the_slot():
+    factory = Factory()
+    pool = ConnectionPool(factory, min_size=0, max_size=1, timeout=0.05)
+    factory.fail = True
+    with pytest.raises(PoolExhausted):
+        pool.getconn()
+    factory.fail = False
+    assert pool.getconn() is factory.made[0]
+    assert pool.stats()['failed_connects'] == 1
+
+
+def test_closeall_refuses_checkouts():
+    pool = ConnectionPool(Factory(), min_size=1, max_size=1)
+    pool.closeall()
+    with pytest.raises(PoolExhausted):
+        pool.getconn()
+    with pytest.raises(ValueError):
+        ConnectionPool(Factory(), max_size=0)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Duplicate-submission suppression (form_dedup.py): token and content keys,
+the in-memory index, claims through the SQLite backend shared by several
+workers, and failing open when the database is unavailable.
+"""
+import form_dedup
+from form_dedup import SubmissionGuard, content_hash, new_token, submission_keys
+from storage import SQLiteStorage, StorageUnavailable
+
+DESCRIPTION = 'Potrzebuję  sklepu internetowego'
+
+
+def test_keys_use_valid_tokens_and_normalized_content():
+    token = new_token()
+    keys = submission_keys('inquiry', token, 'Anna@Example.com ', DESCRIPTION, 86400, 600)
+    assert keys == [(f't:inquiry:{token}', 86400),
+                    (f'h:inquiry:{content_hash("anna@example.com", "potrzebuję sklepu internetowego")}', 600)]
+    assert [key for key, _ in submission_keys('inquiry', 'bad token!', 'a@b.pl', 'x', 1, 1)] == \
+        [f'h:inquiry:{content_hash("a@b.pl", "x")}']
+
+
+def test_repeat_is_rejected_in_memory():
+    guard = SubmissionGuard()
+    token = new_token()
+    assert guard.claim('inquiry', token, 'anna@example.com', DESCRIPTION) is True
+    # same rendered form, edited text: caught by the token
+    assert guard.claim('inquiry', token, 'anna@example.com', 'inna treść') is False
+    # fresh token, same content: caught by the content hash
+    assert guard.claim('inquiry', new_token(), 'ANNA@example.com', DESCRIPTION.upper()) is False
+    # other form, same content
+    assert guard.claim('contact', new_token(), 'anna@example.com', DESCRIPTION) is True
+    assert guard.stats() == {'accepted': 2, 'duplicates': 2, 'db_duplicates': 0, 'db_errors': 0,
+                             'entries': 4}
+
+
+def test_content_window_expires(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(form_dedup.time, 'monotonic', lambda: now[0])
+    guard = SubmissionGuard(content_window=60)
+    assert guard.claim('inquiry', None, 'anna@example.com', DESCRIPTION) is True
+    now[0] += 61
+    assert guard.claim('inquiry', None, 'anna@example.com', DESCRIPTION) is True
+
+
+def test_index_is_bounded():
+    guard = SubmissionGuard(max_entries=3)
+    for i in range(10):
+        guard.claim('inquiry', None, f'user{i}@example.com', DESCRIPTION)
+    assert guard.stats()['entries'] == 3
+
+
+def test_workers_share_claims_through_storage(tmp_path):
+    path = str(tmp_path / 'app.sqlite3')
+    worker_a = SubmissionGuard(SQLiteStorage(path))
+    worker_b = SubmissionGuard(SQLiteStorage(path))
+    token = new_token()
+    assert worker_a.claim('inquiry', token, 'anna@example.com', DESCRIPTION) is True
+    assert worker_b.claim('inquiry', token, 'anna@example.com', DESCRIPTION) is False
+    assert worker_b.stats()['db_duplicates'] == 1
+
+
+class DownStorage:
+    def claim_submission(self, keys, form):
+        raise StorageUnavailable('no database')
+
+
+def test_unavailable_storage_fails_open():
+    guard = SubmissionGuard(DownStorage())
+    assert guard.claim('inquiry', None, 'anna@example.com', DESCRIPTION) is True
+    assert guard.claim('inquiry', None, 'anna@example.com', DESCRIPTION) is False
+    assert guard.stats()['db_errors'] == 1
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Write-behind inquiry buffer (inquiry_writer.py): rows are journaled before
+they are acknowledged, a segment is removed only after its INSERT commits,
+and segments left by a crashed process are replayed on startup.
+"""
+import json
+import os
+
+import pytest
+
+import inquiry_writer
+from inquiry_writer import INQUIRY_COLUMNS, InquiryWriter
+
+
+class RecordingStorage:
+    def __init__(self):
+        self.batches = []
+        self.fail = False
+
+    def insert_inquiries(self, rows):
+        if self.fail:
+            raise RuntimeError('database is down')
+        self.batches.append(list(rows))
+
+
+def make_row(name):
+    return (name, f'{name}@example.com') + ('',) * (len(INQUIRY_COLUMNS) - 2)
+
+
+def make_writer(storage, journal_dir):
+    # nothing reaches the batch size or the interval, so only flush() writes
+    return InquiryWriter(storage, str(journal_dir), batch_size=1000, flush_interval=3600, fsync=False)
+
+
+def segments(journal_dir):
+    return sorted(name for name in os.listdir(journal_dir) if name.endswith('.jsonl'))
+
+
+def test_rows_stay_journaled_until_insert_commits(tmp_path):
+    storage = RecordingStorage()
+    writer = make_writer(storage, tmp_path)
+    writer.add(make_row('anna'))
+    writer.add(make_row('jan'))
+    assert len(segments(tmp_path)) == 1
+
+    storage.fail = True
+    assert writer.flush() is False
+    assert len(segments(tmp_path)) == 1
+    assert writer.stats()['failures'] == 1 and writer.stats()['buffered'] == 2
+
+    storage.fail = False
+    assert writer.flush() is True
+    assert storage.batches == [[make_row('anna'), make_row('jan')]]
+    assert segments(tmp_path) == []
+    assert writer.stats()['flushed'] == 2
+
+
+def test_crashed_segment_is_replayed_on_start(tmp_path):
+    lines = [json.dumps(list(make_row('anna'))), json.dumps(list(make_row('jan'))), '["torn']
+    (tmp_path / 'inquiries-1-1700000000000-1.jsonl').write_text('\n'.join(lines), encoding='utf-8')
+    (tmp_path / 'inquiries-1-1700000000000-2.jsonl').write_text('', encoding='utf-8')
+
+    storage = RecordingStorage()
+    writer = make_writer(storage, tmp_path)
+    writer.start()
+    assert writer.stats()['replayed'] == 2
+    assert writer.flush() is True
+    assert storage.batches == [[make_row('anna'), make_row('jan')]]
+    assert segments(tmp_path) == []
+
+
+@pytest.mark.skipif(inquiry_writer.fcntl is None, reason='segment locks need fcntl')
+def test_live_segment_is_not_replayed_by_another_writer(tmp_path):
+    owner = make_writer(RecordingStorage(), tmp_path)
+    owner.add(make_row('anna'))
+
+    storage = RecordingStorage()
+    other = make_writer(storage, tmp_path)
+    other._replay()
+    assert other.stats()['replayed'] == 0
+    assert other.flush() is True and storage.batches == []
+    assert len(segments(tmp_path)) == 1
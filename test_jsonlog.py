@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Queued JSON logger (jsonlog.py): redaction of emails/IPs in values only,
+levels and sampling, and drop accounting when the queue is full.
+"""
+import json
+import threading
+
+import pytest
+
+import jsonlog
+from jsonlog import redact
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('from jan.kowalski@example.com', 'from [email]'),
+    ('client 192.168.1.10 connected', 'client [ip] connected'),
+    ('peer 2001:db8::1 and fe80::1ff:fe23:4567:890a', 'peer [ip] and [ip]'),
+    ('1:2:3:4:5:6:7:8', '[ip]'),
+    ('at 12:30:45', 'at 12:30:45'),
+    ('a::b', 'a::b'),
+    ('12::', '12::'),
+    ('std::vector and Class::method', 'std::vector and Class::method'),
+    ('version 1.2.3', 'version 1.2.3'),
+])
+def test_redact(text, expected):
+    assert redact(text) == expected
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    path = tmp_path / 'app.log'
+    monkeypatch.setenv('LOG_FILE', str(path))
+    monkeypatch.setenv('LOG_LEVELS', 'db=warning')
+    monkeypatch.setenv('LOG_SAMPLE', 'inquiry=0')
+    fresh = jsonlog._Writer()
+    monkeypatch.setattr(jsonlog, '_writer', fresh)
+
+    def records():
+        fresh.flush()
+        return [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+
+    fresh.records = records
+    return fresh
+
+
+def test_fields_are_redacted_but_json_is_intact(writer):
+    jsonlog.get_logger('mail').error("Send error to ops@example.com", error=ValueError('bad 10.0.0.1'),
+                                     route='/api/a::b', recipients=['x@example.com'], count=3)
+    record = writer.records()[0]
+    assert record['msg'] == 'Send error to [email]'
+    assert record['error'] == 'ValueError: bad [ip]'
+    assert record['route'] == '/api/a::b'
+    assert record['recipients'] == ['[email]']
+    assert record['count'] == 3
+    assert (record['level'], record['category']) == ('error', 'mail')
+
+
+def test_levels_and_sampling(writer):
+    jsonlog.get_logger('db').info("hidden")
+    jsonlog.get_logger('db').warning("shown")
+    jsonlog.get_logger('inquiry').info("sampled out")
+    jsonlog.get_logger('inquiry').error("errors are never sampled")
+    assert [r['msg'] for r in writer.records()] == ['shown', 'errors are never sampled']
+    assert writer.stats()['sampled_out'] == 1
+
+
+def test_request_id_is_attached(writer):
+    def handle():
+        jsonlog.bind_request_id('req-123')
+        jsonlog.get_logger('http').info("handled")
+
+    thread = threading.Thread(target=handle)
+    thread.start()
+    thread.join()
+    jsonlog.get_logger('http').info("outside a request")
+    records = writer.records()
+    assert records[0]['request_id'] == 'req-123'
+    assert 'request_id' not in records[1]
+    assert jsonlog.bind_request_id('bad id with spaces') != 'bad id with spaces'
+
+
+def test_full_queue_drops_and_reports(writer, monkeypatch):
+    monkeypatch.setenv('LOG_QUEUE_SIZE', '1')
+    writer.ensure_started()
+    gate = threading.Event()
+    original = writer._format
+
+    def slow_format(record):
+        gate.wait(5)
+        return original(record)
+
+    monkeypatch.setattr(writer, '_format', slow_format)
+    log = jsonlog.get_logger('ai')
+    log.info("first")       # taken by the writer thread, blocked in _format
+    while writer._queue.qsize():
+        pass
+    log.info("second")      # fills the queue
+    log.info("third")       # dropped
+    gate.set()
+    records = writer.records()
+    assert writer.stats()['dropped'] >= 1
+    notice = [r for r in records if r['category'] == 'log']
+    assert notice and notice[0]['count'] >= 1
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Mail dispatcher: spool replay after a restart and per-message error handling
+inside a batch (mail_queue.py), against an in-process fake SMTP connection.
+"""
+import contextlib
+import json
+import os
+import smtplib
+import time
+
+import pytest
+
+pytest.importorskip('flask_mail')
+
+from flask import Flask
+from flask_mail import Message
+
+from mail_queue import MailDispatcher, classify_error, message_to_dict
+
+
+class FakeConnection:
+    def __init__(self, errors):
+        self.errors = errors
+        self.sent = []
+
+    def send(self, msg):
+        error = self.errors.get(msg.subject)
+        if error is not None:
+            raise error
+        self.sent.append(msg.subject)
+
+
+class FakeMail:
+    def __init__(self, errors=None):
+        self.conn = FakeConnection(errors or {})
+
+    @contextlib.contextmanager
+    def connect(self):
+        yield self.conn
+
+
+def _dispatcher(tmp_path, errors=None):
+    # long backoff: retried messages stay in the spool for the assertions
+    return MailDispatcher(FakeMail(errors), Flask(__name__), str(tmp_path / 'spool'),
+                          batch_size=10, backoff=3600.0, idle_rescan=3600.0)
+
+
+def _message(subject):
+    return Message(subject=subject, sender='noreply@example.com', recipients=['client@example.com'],
+                   body='hello')
+
+
+def _spool(dispatcher, msg_id, subject, attempts=0):
+    os.makedirs(dispatcher.spool_dir, exist_ok=True)
+    dispatcher._journal(msg_id, message_to_dict(_message(subject)), attempts)
+    past = time.time() - 60
+    os.utime(dispatcher._path(msg_id), (past, past))
+
+
+def test_start_replays_spool_from_previous_run(tmp_path):
+    dispatcher = _dispatcher(tmp_path)
+    _spool(dispatcher, 'a' * 32, 'left over')
+    dispatcher.start()
+    dispatcher._queue.join()
+    dispatcher.stop(timeout=0)
+    assert dispatcher.mail.conn.sent == ['left over']
+    assert dispatcher.stats()['recovered'] == 1
+    assert not os.path.exists(dispatcher._path('a' * 32))
+
+
+def test_startup_skips_entries_touched_after_start(tmp_path):
+    dispatcher = _dispatcher(tmp_path)
+    dispatcher._started_at = time.time() - 120
+    _spool(dispatcher, 'b' * 32, 'live peer')
+    os.utime(dispatcher._path('b' * 32))  # e.g. just submitted by another worker
+    dispatcher._rescan(startup=True)
+    assert dispatcher._queue.qsize() == 0
+
+
+def _send(dispatcher, subjects):
+    batch = []
+    for i, subject in enumerate(subjects):
+        msg_id = f'{i:032x}'
+        _spool(dispatcher, msg_id, subject)
+        batch.append((msg_id, 0))
+    dispatcher._send_batch(batch)
+    return [msg_id for msg_id, _ in batch]
+
+
+def test_refused_recipient_fails_only_that_message(tmp_path):
+    refused = smtplib.SMTPRecipientsRefused({'bad@example.com': (550, b'No such user')})
+    dispatcher = _dispatcher(tmp_path, {'second': refused})
+    ids = _send(dispatcher, ['first', 'second', 'third'])
+    assert dispatcher.mail.conn.sent == ['first', 'third']
+    stats = dispatcher.stats()
+    assert (stats['sent'], stats['failed'], stats['retried']) == (2, 1, 0)
+    assert os.path.exists(os.path.join(dispatcher.failed_dir, f'{ids[1]}.json'))
+
+
+def test_malformed_message_is_not_retried(tmp_path):
+    dispatcher = _dispatcher(tmp_path, {'broken': TypeError('recipients=[None]')})
+    _send(dispatcher, ['broken', 'fine'])
+    assert dispatcher.mail.conn.sent == ['fine']
+    assert dispatcher.stats()['failed'] == 1
+    assert dispatcher.stats()['retried'] == 0
+
+
+def test_temporary_rejection_retries_only_that_message(tmp_path):
+    busy = smtplib.SMTPDataError(451, b'Try again later')
+    dispatcher = _dispatcher(tmp_path, {'second': busy})
+    ids = _send(dispatcher, ['first', 'second', 'third'])
+    assert dispatcher.mail.conn.sent == ['first', 'third']
+    assert dispatcher.stats()['retried'] == 1
+    with open(dispatcher._path(ids[1]), encoding='utf-8') as f:
+        assert json.load(f)['attempts'] == 1
+
+
+def test_connection_error_retries_rest_of_batch(tmp_path):
+    dropped = smtplib.SMTPServerDisconnected('Connection unexpectedly closed')
+    dispatcher = _dispatcher(tmp_path, {'second': dropped})
+    _send(dispatcher, ['first', 'second', 'third'])
+    assert dispatcher.mail.conn.sent == ['first']
+    stats = dispatcher.stats()
+    assert (stats['sent'], stats['failed'], stats['retried']) == (1, 0, 2)
+
+
+@pytest.mark.parametrize('error, kind', [
+    (smtplib.SMTPRecipientsRefused({'a@example.com': (550, b'')}), 'permanent'),
+    (smtplib.SMTPRecipientsRefused({'a@example.com': (450, b'')}), 'temporary'),
+    (smtplib.SMTPDataError(554, b'Rejected'), 'permanent'),
+    (smtplib.SMTPDataError(421, b'Busy'), 'temporary'),
+    (smtplib.SMTPAuthenticationError(535, b'Bad login'), 'connection'),
+    (ConnectionResetError(), 'connection'),
+    (ValueError('bad header'), 'permanent'),
+])
+def test_classify_error(error, kind):
+    assert classify_error(error) == kind
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Prometheus exposition (metrics.py): histograms, counters, stats() sources
+exported as counters/gauges, and per-process snapshot aggregation.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from metrics import Registry
+
+
+def _samples(text):
+    return dict(line.rsplit(' ', 1) for line in text.splitlines() if line and not line.startswith('#'))
+
+
+def test_histogram_and_counter():
+    registry = Registry(buckets=(0.1, 1.0))
+    registry.observe('karlab_stage_duration_seconds', 0.05, stage='db')
+    registry.observe('karlab_stage_duration_seconds', 0.5, stage='db')
+    registry.inc('karlab_form_duplicates_total', form='contact')
+    samples = _samples(registry.render())
+    assert samples['karlab_stage_duration_seconds_bucket{stage="db",le="0.1"}'] == '1'
+    assert samples['karlab_stage_duration_seconds_bucket{stage="db",le="+Inf"}'] == '2'
+    assert samples['karlab_form_duplicates_total{form="contact"}'] == '1'
+
+
+def test_registered_stats_are_exported():
+    stats = {'hits': 3, 'misses': 1, 'entries': 2, 'hit_ratio': None, 'wait_time_total': 0.25}
+    registry = Registry()
+    registry.register_stats('karlab_cache', lambda: stats, counters={'hits': 'hits', 'wait_time_total': 'wait_seconds'},
+                            gauges=('entries', 'hit_ratio'))
+    text = registry.render()
+    samples = _samples(text)
+    assert samples['karlab_cache_hits_total'] == '3'
+    assert samples['karlab_cache_wait_seconds_total'] == '0.25'
+    assert samples['karlab_cache_entries'] == '2.0'
+    assert 'karlab_cache_hit_ratio' not in samples  # None is skipped
+    assert '# TYPE karlab_cache_entries gauge' in text
+    stats['hits'] = 5
+    assert _samples(registry.render())['karlab_cache_hits_total'] == '5'
+
+
+def test_failing_stats_source_is_skipped():
+    registry = Registry()
+    registry.register_stats('karlab_broken', lambda: 1 / 0, counters=('x',))
+    registry.inc('karlab_ok_total')
+    assert _samples(registry.render()) == {'karlab_ok_total': '1'}
+
+
+def _dead_pid():
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    return proc.pid
+
+
+def test_snapshots_are_summed_and_dead_workers_dropped(tmp_path):
+    registry = Registry(directory=str(tmp_path))
+    registry.inc('karlab_form_duplicates_total', form='contact')
+    peer = {'buckets': list(registry.buckets), 'histograms': {},
+            'counters': {'karlab_form_duplicates_total': [[[['form', 'contact']], 2]]},
+            'gauges': {'karlab_mail_queued': [[[], 4.0]]}}
+    # the parent pytest process stands in for a live worker
+    with open(tmp_path / f'{os.getppid()}.json', 'w', encoding='utf-8') as f:
+        json.dump(peer, f)
+    dead = tmp_path / f'{_dead_pid()}.json'
+    with open(dead, 'w', encoding='utf-8') as f:
+        json.dump(peer, f)
+
+    samples = _samples(registry.render())
+    assert samples['karlab_form_duplicates_total{form="contact"}'] == '3'
+    assert samples['karlab_mail_queued'] == '4.0'
+    assert not dead.exists()
+
+
+def test_gauges_are_aggregated_per_mode(tmp_path):
+    stats = {'entries': 3, 'hit_ratio': 0.9, 'wait_time_max': 0.5}
+    registry = Registry(directory=str(tmp_path))
+    registry.register_stats('karlab_cache', lambda: stats, gauges={'entries': 'entries', 'hit_ratio': 'hit_ratio',
+                                                                   'wait_time_max': 'wait_seconds_max'},
+                            aggregate={'hit_ratio': 'pid', 'wait_time_max': 'max'})
+    peer_pid = os.getppid()
+    peer = {'pid': peer_pid, 'buckets': list(registry.buckets), 'histograms': {}, 'counters': {},
+            'gauges': {'karlab_cache_entries': [[[], 4.0]], 'karlab_cache_hit_ratio': [[[], 0.9]],
+                       'karlab_cache_wait_seconds_max': [[[], 2.0]]},
+            'gauge_modes': {'karlab_cache_entries': 'sum', 'karlab_cache_hit_ratio': 'pid',
+                            'karlab_cache_wait_seconds_max': 'max'}}
+    with open(tmp_path / f'{peer_pid}.json', 'w', encoding='utf-8') as f:
+        json.dump(peer, f)
+
+    samples = _samples(registry.render())
+    assert samples['karlab_cache_entries'] == '7.0'
+    assert samples['karlab_cache_wait_seconds_max'] == '2.0'
+    assert samples[f'karlab_cache_hit_ratio{{pid="{os.getpid()}"}}'] == '0.9'
+    assert samples[f'karlab_cache_hit_ratio{{pid="{peer_pid}"}}'] == '0.9'
+    assert 'karlab_cache_hit_ratio' not in samples
+
+
+def test_unknown_aggregation_is_rejected():
+    with pytest.raises(ValueError):
+        Registry().register_stats('karlab_x', dict, gauges=('a',), aggregate={'a': 'avg'})
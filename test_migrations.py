@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Schema migrations (migrations.py) against a recording stand-in for a
+psycopg2 connection: ordering, skipping applied versions, ``target`` and
+one locked transaction per migration.
+"""
+import migrations
+from migrations import LATEST_VERSION, MIGRATIONS, current_version, migrate
+
+
+class FakeConnection:
+    """Just enough of a psycopg2 connection: ``with conn`` is a transaction."""
+
+    def __init__(self, applied=(), has_table=True):
+        self.applied = set(applied)
+        self.has_table = has_table
+        self.executed = []
+        self.transactions = 0
+
+    def __enter__(self):
+        self.transactions += 1
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self._result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=()):
+        conn = self.conn
+        sql = ' '.join(sql.split())
+        conn.executed.append((sql, params))
+        self._result = None
+        if sql.startswith("SELECT to_regclass"):
+            self._result = ('schema_migrations' if conn.has_table else None,)
+        elif sql.startswith('CREATE TABLE IF NOT EXISTS schema_migrations'):
+            conn.has_table = True
+        elif sql.startswith('SELECT COALESCE(MAX(version)'):
+            self._result = (max(conn.applied, default=0),)
+        elif sql.startswith('SELECT 1 FROM schema_migrations'):
+            self._result = (1,) if params[0] in conn.applied else None
+        elif sql.startswith('INSERT INTO schema_migrations'):
+            conn.applied.add(params[0])
+
+    def fetchone(self):
+        return self._result
+
+
+def test_versions_are_strictly_increasing():
+    versions = [version for version, _, _ in MIGRATIONS]
+    assert versions == sorted(set(versions))
+    assert LATEST_VERSION == versions[-1]
+
+
+def test_fresh_database_applies_everything_in_order():
+    conn = FakeConnection(has_table=False)
+    assert current_version(conn) == 0
+    assert migrate(conn) == [version for version, _, _ in MIGRATIONS]
+    assert conn.applied == {version for version, _, _ in MIGRATIONS}
+    # current_version, the bookkeeping table, then one transaction per migration
+    assert conn.transactions == 2 + len(MIGRATIONS)
+    locks = [params for sql, params in conn.executed if 'pg_advisory_xact_lock' in sql]
+    assert locks == [(migrations._ADVISORY_LOCK_ID,)] * len(MIGRATIONS)
+
+
+def test_applied_versions_are_skipped_and_target_is_respected():
+    conn = FakeConnection(applied={1})
+    assert migrate(conn, target=2) == [2]
+    assert current_version(conn) == 2
+    assert not any('form_submissions' in sql for sql, _ in conn.executed)
+    assert migrate(conn) == [3]
+    assert migrate(conn) == []
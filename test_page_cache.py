@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Rendered-page cache (page_cache.py) on a throwaway Flask app: conditional
+requests answered with 304, encoding-specific ETags with ``Vary``, and a
+cache miss after a template changes.
+"""
+import gzip
+import os
+
+import pytest
+
+flask = pytest.importorskip('flask')
+
+import page_cache  # noqa: E402
+from page_cache import PageCache  # noqa: E402
+
+
+@pytest.fixture
+def site(tmp_path):
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'about.html').write_text('<html><head></head><body>' + 'O nas. ' * 100 + '</body></html>',
+                                          encoding='utf-8')
+    app = flask.Flask(__name__, root_path=str(tmp_path))
+    app.config['TEMPLATES_AUTO_RELOAD'] = True
+    cache = PageCache(app, check_interval=0)
+    calls = []
+
+    @app.route('/about.html')
+    @cache.cached
+    def about():
+        calls.append(1)
+        return flask.render_template('about.html')
+
+    app.cache, app.calls, app.templates = cache, calls, templates
+    return app
+
+
+def test_second_request_is_served_from_cache(site):
+    client = site.test_client()
+    first = client.get('/about.html', headers={'Accept-Encoding': 'identity'})
+    second = client.get('/about.html', headers={'Accept-Encoding': 'identity'})
+    assert first.status_code == second.status_code == 200
+    assert first.data == second.data and b'O nas.' in first.data
+    assert len(site.calls) == 1
+    assert first.headers['Last-Modified'] and first.headers['Cache-Control'] == 'public, no-cache'
+    assert site.cache.stats()['hits'] == 1
+
+
+def test_if_none_match_returns_304(site):
+    client = site.test_client()
+    first = client.get('/about.html')
+    etag, last_modified = first.headers['ETag'], first.headers['Last-Modified']
+    resp = client.get('/about.html', headers={'If-None-Match': etag})
+    assert resp.status_code == 304 and resp.data == b''
+    assert resp.headers['ETag'] == etag
+    assert client.get('/about.html', headers={'If-None-Match': '"other"'}).status_code == 200
+    assert client.get('/about.html', headers={'If-Modified-Since': last_modified}).status_code == 304
+    assert site.cache.stats()['not_modified'] == 2
+
+
+def test_etag_depends_on_encoding(site, monkeypatch):
+    monkeypatch.setattr(page_cache, 'brotli', None)
+    client = site.test_client()
+    plain = client.get('/about.html', headers={'Accept-Encoding': 'identity'})
+    zipped = client.get('/about.html', headers={'Accept-Encoding': 'gzip, br'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Content-Encoding' not in plain.headers
+    assert plain.headers['Vary'] == zipped.headers['Vary'] == 'Accept-Encoding'
+    assert zipped.headers['ETag'] == plain.headers['ETag'][:-1] + '-gz"'
+    assert gzip.decompress(zipped.data) == plain.data
+    # a validator of either variant revalidates the page
+    resp = client.get('/about.html', headers={'Accept-Encoding': 'gzip', 'If-None-Match': plain.headers['ETag']})
+    assert resp.status_code == 304 and resp.headers['ETag'] == zipped.headers['ETag']
+
+
+def test_template_change_invalidates(site):
+    client = site.test_client()
+    before = client.get('/about.html', headers={'Accept-Encoding': 'identity'})
+    path = site.templates / 'about.html'
+    path.write_text('<html><head></head><body>Nowa treść</body></html>', encoding='utf-8')
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+    after = client.get('/about.html', headers={'Accept-Encoding': 'identity'})
+    assert len(site.calls) == 2
+    assert 'Nowa treść' in after.get_data(as_text=True)
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert site.cache.stats()['invalidations'] == 1
+
+
+def test_non_get_and_errors_are_not_cached(site):
+    @site.route('/missing.html')
+    @site.cache.cached
+    def missing():
+        site.calls.append(1)
+        return 'gone', 404
+
+    client = site.test_client()
+    assert client.get('/missing.html').status_code == 404
+    assert client.get('/missing.html').status_code == 404
+    assert len(site.calls) == 2
+    assert site.cache.stats()['entries'] == 0
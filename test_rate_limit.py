@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Chat admission control (rate_limit.py): token buckets in memory and in a
+shared SQLite file, the concurrency gate, and which address is used as the key.
+"""
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import rate_limit
+from rate_limit import ConcurrencyGate, TokenBucketLimiter, client_ip, forwarded_addr
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(rate_limit.time, 'time', clock.time)
+    return clock
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def limiter(request, tmp_path, clock):
+    sqlite_path = str(tmp_path / 'buckets.sqlite3') if request.param == 'sqlite' else None
+    return TokenBucketLimiter(rate=0.5, burst=3, sqlite_path=sqlite_path)
+
+
+def test_burst_then_limited(limiter):
+    assert [limiter.check('1.2.3.4') for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.check('1.2.3.4') == pytest.approx(2.0)
+    assert limiter.stats()['limited'] == 1
+
+
+def test_refills_over_time(limiter, clock):
+    for _ in range(3):
+        limiter.check('1.2.3.4')
+    clock.now += 2.0  # one token at 0.5/s
+    assert limiter.check('1.2.3.4') == 0.0
+    assert limiter.check('1.2.3.4') > 0
+
+
+def test_clients_have_separate_buckets(limiter):
+    for _ in range(3):
+        limiter.check('1.2.3.4')
+    assert limiter.check('5.6.7.8') == 0.0
+
+
+def test_sqlite_buckets_are_shared(tmp_path, clock):
+    path = str(tmp_path / 'buckets.sqlite3')
+    first = TokenBucketLimiter(rate=0.5, burst=2, sqlite_path=path)
+    second = TokenBucketLimiter(rate=0.5, burst=2, sqlite_path=path)
+    assert first.check('ip') == 0.0
+    assert second.check('ip') == 0.0
+    assert first.check('ip') > 0
+
+
+def test_memory_buckets_are_bounded(clock):
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_clients=2)
+    for key in ('a', 'b', 'c'):
+        limiter.check(key)
+    assert limiter.stats()['clients'] == 2
+
+
+def test_gate_rejects_when_full():
+    gate = ConcurrencyGate(1)
+    with gate.slot() as first:
+        with gate.slot() as second:
+            assert (first, second) == (True, False)
+    assert gate.stats() == {'limit': 1, 'in_flight': 0, 'rejected': 1}
+
+
+def test_gate_counts_concurrent_holders():
+    gate = ConcurrencyGate(2)
+    inside, release = threading.Barrier(3), threading.Event()
+
+    def hold():
+        with gate.slot():
+            inside.wait()
+            release.wait()
+
+    threads = [threading.Thread(target=hold) for _ in range(2)]
+    for t in threads:
+        t.start()
+    inside.wait()
+    assert gate.stats()['in_flight'] == 2
+    release.set()
+    for t in threads:
+        t.join()
+
+
+def test_client_ip_ignores_spoofed_forwarded_for():
+    request = SimpleNamespace(remote_addr='10.0.0.9', headers={'X-Forwarded-For': '6.6.6.6'})
+    assert client_ip(request) == '10.0.0.9'
+
+
+@pytest.mark.parametrize('header, hops, expected', [
+    ('6.6.6.6, 203.0.113.7', 1, '203.0.113.7'),       # client-sent entry is ignored
+    ('6.6.6.6, 203.0.113.7, 10.0.0.2', 2, '203.0.113.7'),
+    ('203.0.113.7', 0, '10.0.0.9'),                   # no trusted proxies
+    ('203.0.113.7', 2, '10.0.0.9'),                   # fewer hops than proxies: don't guess
+    (None, 1, '10.0.0.9'),
+])
+def test_forwarded_addr_takes_trusted_hop(header, hops, expected):
+    assert forwarded_addr(header, '10.0.0.9', hops) == expected
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Site index used by the chatbot: BM25 retrieval over the page templates and
+the sentence-level snippet quoted in local answers (site_index.py).
+"""
+import pytest
+
+from site_index import SiteIndex, build, snippet
+
+ABOUT = """{% extends "base.html" %}
+{% block content %}
+<h2>O nas</h2>
+<p>KarLab tworzy oprogramowanie na zamówienie dla małych i średnich firm.
+Specjalizujemy się w aplikacjach webowych oraz automatyzacji procesów biznesowych.
+Pracujemy zdalnie z klientami z całej Europy.</p>
+{% endblock %}
+"""
+PROJECTS = """<h2>Projekty</h2>
+<p>Zbudowaliśmy system rezerwacji wizyt dla sieci gabinetów weterynaryjnych,
+z przypomnieniami SMS i panelem administracyjnym dla recepcji.</p>
+"""
+
+
+@pytest.fixture
+def index(tmp_path):
+    pytest.importorskip('numpy')
+    templates = tmp_path / 'templates'
+    templates.mkdir()
+    (templates / 'about.html').write_text(ABOUT, encoding='utf-8')
+    (templates / 'projects.html').write_text(PROJECTS, encoding='utf-8')
+    path = str(tmp_path / 'site_index.npz')
+    assert build(str(templates), path, ('about.html', 'projects.html')) == 2
+    return SiteIndex(path, threshold=0.5)
+
+
+def test_search_ranks_matching_page_first(index):
+    hits = index.search('system rezerwacji wizyt weterynaryjnych')
+    assert hits[0][1]['page'] == 'projects.html'
+
+
+def test_answer_needs_confidence(index):
+    assert index.answer('rezerwacji wizyt gabinetów weterynaryjnych') is not None
+    assert index.answer('pogoda jutro w krakowie') is None
+
+
+def test_snippet_picks_matching_sentences_in_order():
+    text = ("KarLab tworzy oprogramowanie na zamówienie. "
+            "Specjalizujemy się w aplikacjach webowych. "
+            "Pracujemy zdalnie z klientami z całej Europy.")
+    assert snippet(text, 'aplikacje webowe zdalnie', max_sentences=2) == (
+        "Specjalizujemy się w aplikacjach webowych. Pracujemy zdalnie z klientami z całej Europy.")
+
+
+def test_snippet_caps_length_on_a_word_boundary():
+    out = snippet('słowo ' * 200, 'słowo', max_chars=50)
+    assert len(out) <= 51 and out.endswith('…') and 'słow…' not in out
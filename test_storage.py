@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Embedded storage backend (storage.SQLiteStorage): schema creation, batched
+inquiry inserts, keyset pagination and export, newsletter subscriptions and
+imports, and atomic form-submission claims.
+"""
+import io
+import threading
+from datetime import datetime
+
+import pytest
+
+import storage
+from inquiry_writer import INQUIRY_COLUMNS
+from storage import SQLITE_SCHEMA, SQLiteStorage, open_storage
+
+
+def make_row(i, service='web', email=None):
+    values = dict.fromkeys(INQUIRY_COLUMNS, '')
+    values.update(name=f'user{i}', email=email or f'user{i}@example.com', business_needs='shop',
+                  service_type=service, budget_range='small', project_description=f'project {i}')
+    return tuple(values[column] for column in INQUIRY_COLUMNS)
+
+
+@pytest.fixture
+def db(tmp_path):
+    backend = SQLiteStorage(str(tmp_path / 'data' / 'app.sqlite3'))
+    yield backend
+    backend.close()
+
+
+def test_migrate_is_idempotent(tmp_path):
+    path = str(tmp_path / 'app.sqlite3')
+    assert SQLiteStorage(path).migrate() == [version for version, _ in SQLITE_SCHEMA]
+    assert SQLiteStorage(path).migrate() == []
+
+
+def test_pages_follow_the_cursor_newest_first(db):
+    db.insert_inquiries([make_row(i, service='web' if i % 2 else 'seo') for i in range(7)])
+    names, cursor = [], None
+    while True:
+        items, cursor = db.fetch_inquiries({}, cursor=cursor, limit=3)
+        names.extend(item['name'] for item in items)
+        if cursor is None:
+            break
+    assert names == [f'user{i}' for i in reversed(range(7))]
+    assert isinstance(datetime.fromisoformat(items[0]['created_at']), datetime)
+
+    items, _ = db.fetch_inquiries({'service_type': 'seo'})
+    assert [item['name'] for item in items] == ['user6', 'user4', 'user2', 'user0']
+    exported = list(db.iter_inquiries({'email': 'USER3@example.com'}))
+    assert [row[2] for row in exported] == ['user3']
+    assert exported[0][1].tzinfo is not None
+
+
+def test_subscribe_and_import_count_duplicates(db):
+    assert db.subscribe('anna@example.com', source_page='/') is True
+    assert db.subscribe('anna@example.com') is False
+    csv_file = io.StringIO('email\nanna@example.com\njan@example.com\nnot-an-email\njan@example.com\n')
+    assert db.import_newsletter(csv_file) == {'read': 4, 'valid': 3, 'invalid': 1, 'inserted': 1,
+                                              'duplicates': 2}
+
+
+def test_claims_are_atomic_and_windowed(db):
+    keys = [('t:inquiry:token', 3600), ('h:inquiry:hash', 600)]
+    assert db.claim_submission(keys, 'inquiry') is True
+    assert db.claim_submission(keys, 'inquiry') is False
+    # one held key rolls back the whole claim
+    assert db.claim_submission([('t:inquiry:other', 3600), ('h:inquiry:hash', 600)], 'inquiry') is False
+    assert db.claim_submission([('t:inquiry:other', 3600)], 'inquiry') is True
+    # once the window has passed the key can be claimed again
+    assert db.claim_submission([('h:inquiry:hash', -1)], 'inquiry') is True
+    assert db.prune_submissions(3600) == 0
+    assert db.prune_submissions(-1) == 3
+
+
+def test_concurrent_claims_have_one_winner(tmp_path):
+    path = str(tmp_path / 'app.sqlite3')
+    SQLiteStorage(path).migrate()
+    results, barrier = [], threading.Barrier(8)
+
+    def claim():
+        backend = SQLiteStorage(path)
+        barrier.wait()
+        results.append(backend.claim_submission([('t:contact:token', 3600)], 'contact'))
+        backend.close()
+
+    threads = [threading.Thread(target=claim) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [False] * 7 + [True]
+
+
+def test_open_storage_picks_backend(tmp_path):
+    assert isinstance(open_storage('SQLite', sqlite_path=str(tmp_path / 'x.sqlite3')), SQLiteStorage)
+    assert isinstance(open_storage(None), storage.PostgresStorage)
+    with pytest.raises(ValueError):
+        open_storage('mysql')